@@ -6,43 +6,25 @@ Adapté à la tarification BCS complète
 
 import anthropic
 from config import Config
+from http_pool import make_client
+from pricing_engine import current_tables
 import json
+import math
+import threading
+import time
 
-client = anthropic.Anthropic(api_key=Config.ANTHROPIC_API_KEY) if Config.ANTHROPIC_API_KEY else None
+client = anthropic.Anthropic(
+    api_key=Config.ANTHROPIC_API_KEY,
+    http_client=make_client(timeout=120.0)
+) if Config.ANTHROPIC_API_KEY else None
 
-SYSTEM_PROMPT = """Tu es un assistant Bien Chez Soi (BCS) qui extrait les informations de soumission à partir d'une demande vocale transcrite.
+_PROMPT_INTRO = """Tu es un assistant Bien Chez Soi (BCS) qui extrait les informations de soumission à partir d'une demande vocale transcrite.
 
 BIEN CHEZ SOI offre des services de soins à domicile, animation et compagnie dans la région de Brossard et environs (Québec).
 
-TYPES DE SERVICE:
-1. Régulier (sans contrat) — Un seul payeur:
-   - 1h = 65$, 2h = 120$, 3h = 150$, 4h = 180$, 4h+ = 180$ + 45$/h additionnel
-
-2. À la carte (Animation & Compagnie) — Base 50$/h, minimum 2h:
-   - Visite de compagnie (jeux, cartes, discussion) — 2h min = 100$
-   - Bingo / jeux de société / activités cognitives — 2h min = 100$
-   - Promenade / sortie divertissement — 2h min = 100$
-   - Animation thématique (musique, bricolage, atelier) — 2h min = 100$
-   - Accompagnement événement / sortie spéciale — 3h min = 150$
-
-3. Groupe Soins & Hygiène RPA — 50$/h, base 4h = 200$, 5-20 personnes
-   Formule: heures = 0.4 × personnes + 2
-
-4. Groupe Animation RPA — Même tarification que Soins
-
-5. Service partagé voisins RPA — 4h × 50$/h = 200$ ÷ 4 voisins = 50$ chacun
-
-6. Contrat corporatif:
-   - Hebdomadaire: 4h/sem, 45$/h = 180$/sem
-   - Mensuel: 16h/mois, 43$/h = 688$/mois
-   - Annuel: 16h/mois × 12, 40$/h = 7680$/an
-
-7. Forfait récurrent individuel:
-   - Essentiel: 1x/sem, 8h/mois = 360$/mois (45$/h)
-   - Confort: 2x/sem, 16h/mois = 680$/mois (42.50$/h)
-   - Premium: 3x/sem, 24h/mois = 960$/mois (40$/h)
+"""
 
-CATÉGORIES:
+_PROMPT_CATEGORIES = """CATÉGORIES:
 - Soins & Hygiène
 - Animation & Compagnie
 - Visite de compagnie
@@ -54,14 +36,9 @@ CATÉGORIES:
 - Soins de confort
 - Autre
 
-SUPPLÉMENTS (Add-ons):
-- Urgence même jour (+15$)
-- Hors horaire avant 7h / après 20h (+10$)
-- Fin de semaine / jour férié (+10$)
-- Déplacement hors zone (+15$)
-- Matériel / fournitures spéciales (+10$)
+"""
 
-RÈGLES D'EXTRACTION:
+_PROMPT_RULES = """RÈGLES D'EXTRACTION:
 1. Extrais les informations explicitement mentionnées
 2. Déduis le type de service selon le contexte:
    - "RPA", "résidence", "groupe" = Groupe RPA
@@ -103,127 +80,729 @@ Retourne UNIQUEMENT un JSON valide avec cette structure exacte:
 """
 
 
+
+def _money(value):
+    """65.0 -> '65', 42.5 -> '42.50'"""
+    return f"{value:.0f}" if float(value).is_integer() else f"{value:.2f}"
+
+
+def _pricing_prompt(card):
+    """Sections TYPES DE SERVICE et SUPPLÉMENTS générées depuis la grille tarifaire"""
+    paliers = sorted(card.TARIF_REGULIER.values(), key=lambda p: p['heures'])
+    base_heures = paliers[-1]['heures']
+    regulier = ', '.join(f"{p['heures']}h = {_money(p['prix'])}$" for p in paliers)
+    regulier += (f", {base_heures}h+ = {_money(card.TARIF_BASE_4H)}$ + "
+                 f"{_money(card.TARIF_HEURE_ADDITIONNEL)}$/h additionnel")
+
+    carte_min = min(s['duree_min'] for s in card.SERVICES_CARTE.values())
+    carte = '\n'.join(
+        f"   - {nom} — {s['duree_min']}h min = {_money(s['tarif'])}$"
+        for nom, s in card.SERVICES_CARTE.items()
+    )
+
+    contrats = []
+    for nom, c in card.CONTRATS.items():
+        if 'min_heures_sem' in c:
+            detail = f"{c['min_heures_sem']}h/sem, {_money(c['taux'])}$/h = {_money(c['total_min'])}$/sem"
+        elif 'total_annuel' in c:
+            detail = (f"{c['min_heures_mois']}h/mois × 12, {_money(c['taux'])}$/h = "
+                      f"{_money(c['total_annuel'])}$/an")
+        else:
+            detail = f"{c['min_heures_mois']}h/mois, {_money(c['taux'])}$/h = {_money(c['total_min'])}$/mois"
+        contrats.append(f"   - {nom.capitalize()}: {detail}")
+
+    forfaits = '\n'.join(
+        f"   - {nom}: {f['frequence'].replace('semaine', 'sem')}, {f['heures_mois']}h/mois = "
+        f"{_money(f['prix_mois'])}$/mois ({_money(f['taux'])}$/h)"
+        for nom, f in card.FORFAITS_RECURRENTS.items()
+    )
+
+    partage_part = card.PARTAGE_BLOC_PRIX / card.PARTAGE_MAX_VOISINS
+    addons = '\n'.join(f"- {a['nom']} (+{_money(a['prix'])}$)" for a in card.ADDONS.values())
+
+    return f"""TYPES DE SERVICE:
+1. Régulier (sans contrat) — Un seul payeur:
+   - {regulier}
+
+2. À la carte (Animation & Compagnie) — Base {_money(card.TARIF_AFFICHE)}$/h, minimum {carte_min}h:
+{carte}
+
+3. Groupe Soins & Hygiène RPA — {_money(card.GROUPE_TAUX_HORAIRE)}$/h, base {card.GROUPE_BASE_HEURES}h = {_money(card.GROUPE_BASE_PRIX)}$, {card.GROUPE_MIN_PERSONNES}-{card.GROUPE_MAX_PERSONNES} personnes
+   Formule: heures = 0.4 × personnes + 2
+
+4. Groupe Animation RPA — Même tarification que Soins
+
+5. Service partagé voisins RPA — {card.PARTAGE_BLOC_HEURES}h × {_money(card.GROUPE_TAUX_HORAIRE)}$/h = {_money(card.PARTAGE_BLOC_PRIX)}$ ÷ {card.PARTAGE_MAX_VOISINS} voisins = {_money(partage_part)}$ chacun
+
+6. Contrat corporatif:
+{chr(10).join(contrats)}
+
+7. Forfait récurrent individuel:
+{forfaits}
+
+""", f"""SUPPLÉMENTS (Add-ons):
+{addons}
+
+"""
+
+
+_system_prompts = {}
+
+
+def system_prompt(tables=None):
+    """
+    Prompt système pour la grille active (ou donnée). Les prix sont générés
+    depuis la grille: le texte ne change qu'avec la version, ce qui préserve
+    le cache de prompt entre les appels.
+    """
+    tables = tables or current_tables()
+    prompt = _system_prompts.get(tables.version)
+    if prompt is None:
+        types_section, supplements_section = _pricing_prompt(tables.source)
+        prompt = _PROMPT_INTRO + types_section + _PROMPT_CATEGORIES + supplements_section + _PROMPT_RULES
+        _system_prompts[tables.version] = prompt
+    return prompt
+
+
+# En-tête requis par l'API pour activer le prompt caching
+PROMPT_CACHE_HEADERS = {"anthropic-beta": "prompt-caching-2024-07-31"}
+
+# Statistiques d'appels (latence, tokens en cache) par type d'appel et mode de cache
+_stats = {}
+_tier_stats = {}
+_stats_lock = threading.Lock()
+
+# Tiers de modèles: le rapide d'abord pour les demandes simples, le fort en secours
+MODEL_TIERS = {
+    'fast': Config.PARSER_MODEL_FAST,
+    'strong': Config.PARSER_MODEL,
+}
+
+# Mots-clés des tarifications complexes (groupes, contrats, forfaits): toujours le modèle fort
+COMPLEX_KEYWORDS = (
+    'rpa', 'résidence', 'groupe', 'voisin', 'partagé',
+    'contrat', 'corporatif', 'forfait', 'récurrent', 'mensuel',
+)
+
+
+def _system_param():
+    """
+    Retourne le paramètre `system` pour l'API.
+    Avec le cache actif, le prompt système est un bloc marqué `cache_control`:
+    les appels suivants relisent le préfixe depuis le cache au lieu de le retraiter.
+    """
+    prompt = system_prompt()
+    if not Config.PARSER_PROMPT_CACHE:
+        return prompt
+    return [
+        {
+            "type": "text",
+            "text": prompt,
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
+
+def _record_call(kind, usage, ttft, latency):
+    """Enregistre la latence et l'usage de tokens d'un appel Claude"""
+    key = f"{kind}:{'cache' if Config.PARSER_PROMPT_CACHE else 'no_cache'}"
+    with _stats_lock:
+        s = _stats.setdefault(key, {
+            'calls': 0,
+            'ttft_total': 0.0,
+            'latency_total': 0.0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'cache_read_input_tokens': 0,
+            'cache_creation_input_tokens': 0,
+        })
+        s['calls'] += 1
+        s['ttft_total'] += ttft or 0.0
+        s['latency_total'] += latency
+        for field in ('input_tokens', 'output_tokens',
+                      'cache_read_input_tokens', 'cache_creation_input_tokens'):
+            s[field] += getattr(usage, field, None) or 0
+
+
+def _record_tier(tier, accepted, latency):
+    """Enregistre le résultat d'une tentative de parsing sur un tier"""
+    with _stats_lock:
+        s = _tier_stats.setdefault(tier, {'calls': 0, 'accepted': 0, 'latency_total': 0.0})
+        s['calls'] += 1
+        s['accepted'] += 1 if accepted else 0
+        s['latency_total'] += latency
+
+
+def get_parser_stats():
+    """
+    Résumé des appels au parser:
+    - calls: TTFT et latence moyens (ms), tokens en cache, par type d'appel;
+      les suffixes `:cache` / `:no_cache` permettent de comparer avant/après
+    - tiers: taux de réussite (sortie valide) et latence moyenne par tier de modèle
+    """
+    with _stats_lock:
+        calls_summary = {}
+        for key, s in _stats.items():
+            calls = s['calls'] or 1
+            calls_summary[key] = {
+                'calls': s['calls'],
+                'ttft_ms_avg': round(s['ttft_total'] / calls * 1000, 1),
+                'latency_ms_avg': round(s['latency_total'] / calls * 1000, 1),
+                'input_tokens': s['input_tokens'],
+                'output_tokens': s['output_tokens'],
+                'cache_read_input_tokens': s['cache_read_input_tokens'],
+                'cache_creation_input_tokens': s['cache_creation_input_tokens'],
+            }
+
+        tiers_summary = {}
+        for tier, s in _tier_stats.items():
+            calls = s['calls'] or 1
+            tiers_summary[tier] = {
+                'model': MODEL_TIERS.get(tier),
+                'calls': s['calls'],
+                'accepted': s['accepted'],
+                'hit_rate': round(s['accepted'] / calls, 3),
+                'latency_ms_avg': round(s['latency_total'] / calls * 1000, 1),
+            }
+
+        return {'calls': calls_summary, 'tiers': tiers_summary}
+
+
+def _stream_claude(kind, messages, max_tokens=1500, model=None):
+    """
+    Appelle Claude en streaming: produit les fragments de texte au fil de l'eau,
+    mesure le time-to-first-token et retourne le message final (valeur de StopIteration).
+    """
+    started = time.perf_counter()
+    ttft = None
+    with client.messages.stream(
+        model=model or Config.PARSER_MODEL,
+        max_tokens=max_tokens,
+        system=_system_param(),
+        messages=messages,
+        extra_headers=PROMPT_CACHE_HEADERS if Config.PARSER_PROMPT_CACHE else None,
+    ) as stream:
+        for text in stream.text_stream:
+            if ttft is None:
+                ttft = time.perf_counter() - started
+            yield text
+        message = stream.get_final_message()
+
+    _record_call(kind, message.usage, ttft, time.perf_counter() - started)
+    return message
+
+
+def _call_claude(kind, messages, max_tokens=1500, model=None):
+    """Appelle Claude et retourne le message final complet"""
+    chunks = _stream_claude(kind, messages, max_tokens, model)
+    while True:
+        try:
+            next(chunks)
+        except StopIteration as stop:
+            return stop.value
+
+
+class IncrementalFieldParser:
+    """
+    Parser JSON incrémental: reçoit la réponse morceau par morceau et retourne
+    chaque champ de premier niveau de l'objet dès que sa valeur est fermée.
+    Le texte avant la première accolade est ignoré.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self.done = False
+
+    def feed(self, chunk):
+        """Ajoute un fragment et retourne la liste des (champ, valeur) complétés"""
+        self._buffer += chunk
+        fields = []
+        buf = self._buffer
+
+        for i in range(self._pos, len(buf)):
+            if self.done:
+                break
+            ch = buf[i]
+            if self._depth == 0:
+                if ch == '{':
+                    self._depth = 1
+                    self._member_start = i + 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 1:
+                    fields.extend(self._close_member(i))
+                    self.done = True
+                self._depth -= 1
+            elif ch == ',' and self._depth == 1:
+                fields.extend(self._close_member(i))
+                self._member_start = i + 1
+
+        self._pos = len(buf)
+        return fields
+
+    def _close_member(self, end):
+        member = self._buffer[self._member_start:end].strip()
+        if not member:
+            return []
+        try:
+            return list(json.loads('{' + member + '}').items())
+        except json.JSONDecodeError:
+            return []
+
+
+# ============================================================
+# SCHÉMA DE LA SOUMISSION (validation des champs)
+# ============================================================
+
+STRING_FIELDS = (
+    'client_nom', 'client_telephone', 'client_email', 'adresse_service',
+    'description_service', 'date_service', 'heure_service', 'notes',
+)
+NUMBER_FIELDS = ('nombre_heures', 'nombre_personnes')
+# La liste des add-ons ne change pas sans redémarrage (refusé par load_rate_card)
+ADDON_FIELDS = tuple(f'addon_{key}' for key in Config.ADDONS)
+ENUM_FIELDS = {
+    'categorie': Config.CATEGORIES,
+    'type_service': Config.TYPES_SERVICE,
+    'langue_client': ['fr', 'en'],
+}
+# Listes lues dans la grille active à chaque validation (rechargée à chaud): attribut de PricingTables
+TABLE_ENUM_FIELDS = {
+    'forfait_recurrent': 'forfaits',
+    'type_contrat': 'contrats',
+}
+SOUMISSION_FIELDS = STRING_FIELDS + NUMBER_FIELDS + ADDON_FIELDS + tuple(ENUM_FIELDS) + tuple(TABLE_ENUM_FIELDS)
+# Champs qui influencent le prix (les autres ne changent jamais les totaux)
+PRICING_FIELDS = ('type_service', 'nombre_heures', 'nombre_personnes',
+                  'forfait_recurrent', 'type_contrat') + ADDON_FIELDS
+
+
+def _nombre_positif(value):
+    """Nombre positif ou nul, fini et représentable en float (sans quoi le calcul des totaux échoue)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return 0 <= float(value) < math.inf
+    except OverflowError:
+        return False
+
+
+def _validate_field(field, value):
+    """
+    Valide une valeur pour un champ du schéma.
+
+    Returns:
+        tuple: (True, valeur normalisée) ou (False, message d'erreur)
+    """
+    if field not in SOUMISSION_FIELDS:
+        return False, f'champ inconnu: {field}'
+
+    if field in ADDON_FIELDS:
+        if value is None:
+            return True, False
+        if not isinstance(value, bool):
+            return False, f'{field}: booléen attendu'
+        return True, value
+
+    if value is None:
+        return True, None
+
+    if field in NUMBER_FIELDS:
+        if not _nombre_positif(value):
+            return False, f'{field}: nombre positif attendu'
+        return True, value
+
+    if field in ENUM_FIELDS:
+        if value not in ENUM_FIELDS[field]:
+            return False, f'{field}: valeur hors liste ({value})'
+        return True, value
+
+    if field in TABLE_ENUM_FIELDS:
+        if not isinstance(value, str) or value not in getattr(current_tables(), TABLE_ENUM_FIELDS[field]):
+            return False, f'{field}: valeur hors grille ({value})'
+        return True, value
+
+    if not isinstance(value, str):
+        return False, f'{field}: texte attendu'
+    return True, value
+
+
+def validate_fields(data, fields=SOUMISSION_FIELDS):
+    """
+    Valide les champs présents dans data parmi fields (ex. PRICING_FIELDS avant
+    calculate_totals sur des données reçues ou partielles). Les autres clés sont ignorées.
+
+    Returns:
+        tuple: (dict des champs valides normalisés, list des messages d'erreur)
+    """
+    valides, errors = {}, []
+    if not isinstance(data, dict):
+        return valides, ['objet JSON attendu']
+    for field in fields:
+        if field in data:
+            ok, result = _validate_field(field, data[field])
+            if ok:
+                valides[field] = result
+            else:
+                errors.append(result)
+    return valides, errors
+
+
+def validate_soumission(data):
+    """
+    Valide une sortie du parser contre le schéma et les listes de tarification.
+
+    Returns:
+        list: Messages d'erreur (vide si la sortie est valide)
+    """
+    if not isinstance(data, dict):
+        return ['objet JSON attendu']
+
+    errors = []
+    for field in SOUMISSION_FIELDS:
+        if field in data:
+            ok, result = _validate_field(field, data[field])
+            if not ok:
+                errors.append(result)
+
+    if not data.get('type_service'):
+        errors.append('type_service manquant')
+    return errors
+
+
+def _select_tiers(transcription):
+    """
+    Tiers de modèles à essayer, dans l'ordre.
+    Une demande courte sans tarification complexe passe d'abord par le modèle rapide.
+    """
+    if not Config.PARSER_MODEL_FAST:
+        return ['strong']
+
+    text = transcription.lower()
+    if len(text.split()) > Config.PARSER_FAST_MAX_WORDS:
+        return ['strong']
+    if any(keyword in text for keyword in COMPLEX_KEYWORDS):
+        return ['strong']
+    return ['fast', 'strong']
+
+
+def _apply_defaults(data, transcription):
+    """Validation et défauts des champs extraits"""
+    if 'description_service' not in data or not data['description_service']:
+        data['description_service'] = transcription
+
+    if 'categorie' not in data or not data['categorie']:
+        data['categorie'] = 'Autre'
+
+    if 'type_service' not in data or not data['type_service']:
+        data['type_service'] = 'Régulier (sans contrat)'
+
+    if 'nombre_heures' not in data or data['nombre_heures'] is None:
+        data['nombre_heures'] = 2  # Défaut 2h
+
+    if 'langue_client' not in data:
+        data['langue_client'] = 'fr'
+
+    # S'assurer que les booleans existent
+    for addon in ['addon_urgence', 'addon_hors_horaire', 'addon_fin_semaine',
+                   'addon_deplacement_extra', 'addon_materiel']:
+        if addon not in data:
+            data[addon] = False
+
+    return data
+
+
+def _parse_messages(transcription):
+    return [
+        {
+            "role": "user",
+            "content": f"Transcription de la demande:\n\n{transcription}"
+        }
+    ]
+
+
+def _parse_once(tier, transcription):
+    """
+    Un appel de parsing sur un tier de modèle.
+
+    Returns:
+        tuple: (données brutes, None) ou (None, message d'erreur)
+    """
+    message = _call_claude(f'parse:{tier}', _parse_messages(transcription), model=MODEL_TIERS[tier])
+    return _extract_json(message.content[0].text)
+
+
+def _extract_json(response_text):
+    """
+    Extrait l'objet JSON d'une réponse du modèle.
+
+    Returns:
+        tuple: (données, None) ou (None, message d'erreur)
+    """
+    start = response_text.find('{')
+    end = response_text.rfind('}') + 1
+
+    if start == -1 or end == 0:
+        return None, 'Aucun JSON trouvé dans la réponse IA'
+
+    json_str = response_text[start:end]
+    return json.loads(json_str), None
+
+
+def build_parse_params(transcription, model=None):
+    """Paramètres d'une requête de parsing (utilisés tels quels par le mode lot)"""
+    return {
+        'model': model or Config.PARSER_MODEL,
+        'max_tokens': 1500,
+        'system': _system_param(),
+        'messages': _parse_messages(transcription),
+    }
+
+
+def parse_response_text(response_text, transcription):
+    """
+    Post-traite une réponse brute du modèle: extraction JSON, validation, défauts.
+
+    Returns:
+        dict: {'success': True, 'data': dict, 'validation': list} ou {'success': False, 'error': str}
+    """
+    try:
+        data, error = _extract_json(response_text)
+    except json.JSONDecodeError as e:
+        return {'success': False, 'error': f'Erreur parsing JSON: {str(e)}'}
+    if data is None:
+        return {'success': False, 'error': error}
+
+    problems = validate_soumission(data)
+    return {
+        'success': True,
+        'data': _apply_defaults(data, transcription),
+        'validation': problems
+    }
+
+
 def parse_voice_input(transcription):
     """
-    Parse une transcription vocale en données structurées BCS
+    Parse une transcription vocale en données structurées BCS.
+    Les demandes simples passent d'abord par le modèle rapide; une sortie
+    invalide (JSON, schéma ou listes de tarification) déclenche l'escalade
+    vers le modèle fort.
 
     Args:
         transcription: Texte transcrit de l'audio
 
     Returns:
-        dict: {'success': bool, 'data': dict} ou {'success': False, 'error': str}
+        dict: {'success': bool, 'data': dict, 'model_tier': str} ou {'success': False, 'error': str}
     """
     if not client:
         return {'success': False, 'error': 'ANTHROPIC_API_KEY non configurée. Ajoutez-la dans .env pour l\'analyse du texte.'}
-    try:
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1500,
-            system=SYSTEM_PROMPT,
-            messages=[
-                {
-                    "role": "user",
-                    "content": f"Transcription de la demande:\n\n{transcription}"
-                }
-            ]
-        )
 
-        response_text = message.content[0].text
-
-        # Extraire le JSON
-        start = response_text.find('{')
-        end = response_text.rfind('}') + 1
-
-        if start == -1 or end == 0:
+    tiers = _select_tiers(transcription)
+    error = None
+    for tier in tiers:
+        started = time.perf_counter()
+        data = None
+        try:
+            data, error = _parse_once(tier, transcription)
+        except json.JSONDecodeError as e:
+            error = f'Erreur parsing JSON: {str(e)}'
+        except Exception as e:
+            error = str(e)
+
+        problems = validate_soumission(data) if data is not None else None
+        _record_tier(tier, data is not None and not problems, time.perf_counter() - started)
+
+        # Le dernier tier est accepté dès que son JSON est lisible
+        if data is not None and (not problems or tier == tiers[-1]):
             return {
-                'success': False,
-                'error': 'Aucun JSON trouvé dans la réponse IA'
+                'success': True,
+                'data': _apply_defaults(data, transcription),
+                'model_tier': tier
             }
 
-        json_str = response_text[start:end]
-        data = json.loads(json_str)
+    return {
+        'success': False,
+        'error': error or 'Sortie IA invalide'
+    }
 
-        # Validation et défauts
-        if 'description_service' not in data or not data['description_service']:
-            data['description_service'] = transcription
 
-        if 'categorie' not in data or not data['categorie']:
-            data['categorie'] = 'Autre'
+def parse_voice_input_stream(transcription):
+    """
+    Variante streaming de parse_voice_input: émet chaque champ dès qu'il est
+    complet dans la réponse de Claude, puis le résultat final.
 
-        if 'type_service' not in data or not data['type_service']:
-            data['type_service'] = 'Régulier (sans contrat)'
+    Args:
+        transcription: Texte transcrit de l'audio
 
-        if 'nombre_heures' not in data or data['nombre_heures'] is None:
-            data['nombre_heures'] = 2  # Défaut 2h
+    Yields:
+        tuple: ('field', champ, valeur) pour chaque champ complété, puis
+               ('done', résultat) au même format que parse_voice_input
+    """
+    if not client:
+        yield ('done', {'success': False, 'error': 'ANTHROPIC_API_KEY non configurée. Ajoutez-la dans .env pour l\'analyse du texte.'})
+        return
+
+    tiers = _select_tiers(transcription)
+    error = None
+    for tier in tiers:
+        started = time.perf_counter()
+        parser = IncrementalFieldParser()
+        data = {}
+        try:
+            # En cas d'escalade, le modèle fort ré-émet les champs qui remplacent les précédents
+            for text in _stream_claude(f'parse_stream:{tier}', _parse_messages(transcription),
+                                       model=MODEL_TIERS[tier]):
+                for key, value in parser.feed(text):
+                    data[key] = value
+                    yield ('field', key, value)
+        except Exception as e:
+            error = str(e)
+            _record_tier(tier, False, time.perf_counter() - started)
+            continue
+
+        if not parser.done:
+            error = 'Aucun JSON trouvé dans la réponse IA'
+            _record_tier(tier, False, time.perf_counter() - started)
+            continue
+
+        problems = validate_soumission(data)
+        _record_tier(tier, not problems, time.perf_counter() - started)
+        if not problems or tier == tiers[-1]:
+            yield ('done', {
+                'success': True,
+                'data': _apply_defaults(data, transcription),
+                'model_tier': tier
+            })
+            return
+
+    yield ('done', {'success': False, 'error': error or 'Sortie IA invalide'})
+
+
+def _compact_soumission(data):
+    """Représentation compacte: champs du schéma non nuls, sans indentation"""
+    # Tests d'identité: 0 == False, un 0 réel (nombre de personnes, montant) doit rester
+    compact = {}
+    for k in SOUMISSION_FIELDS:
+        v = data.get(k)
+        if not (v is None or v is False or v == ''):
+            compact[k] = v
+    return json.dumps(compact, ensure_ascii=False, separators=(',', ':'))
+
+
+def apply_soumission_patch(data, operations):
+    """
+    Applique une liste d'opérations de type JSON Patch sur les champs de la soumission.
+    Seuls `replace`, `add` et `remove` sur un champ de premier niveau sont acceptés;
+    chaque opération invalide est rejetée sans bloquer les autres.
 
-        if 'langue_client' not in data:
-            data['langue_client'] = 'fr'
+    Returns:
+        dict: {'data': dict mis à jour, 'applied': list, 'rejected': list}
+    """
+    updated = dict(data)
+    applied, rejected = [], []
 
-        # S'assurer que les booleans existent
-        for addon in ['addon_urgence', 'addon_hors_horaire', 'addon_fin_semaine',
-                       'addon_deplacement_extra', 'addon_materiel']:
-            if addon not in data:
-                data[addon] = False
+    for op in operations if isinstance(operations, list) else []:
+        if not isinstance(op, dict):
+            rejected.append({'op': op, 'error': 'opération invalide'})
+            continue
 
-        return {
-            'success': True,
-            'data': data
-        }
+        kind = op.get('op')
+        path = op.get('path') or ''
+        field = path[1:] if path.startswith('/') else ''
+        if kind not in ('replace', 'add', 'remove') or not field or '/' in field:
+            rejected.append({'op': op, 'error': 'opération ou chemin non supporté'})
+            continue
 
-    except json.JSONDecodeError as e:
-        return {
-            'success': False,
-            'error': f'Erreur parsing JSON: {str(e)}'
-        }
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+        ok, result = _validate_field(field, None if kind == 'remove' else op.get('value'))
+        if not ok:
+            rejected.append({'op': op, 'error': result})
+            continue
+
+        updated[field] = result
+        applied.append(op)
+
+    return {'data': updated, 'applied': applied, 'rejected': rejected}
 
 
 def complete_soumission_data(partial_data, follow_up_text):
     """
-    Complète les données manquantes avec des informations additionnelles
+    Complète les données avec des informations additionnelles.
+    Le modèle reçoit la soumission en JSON compact et ne retourne que les
+    champs modifiés (JSON Patch); le patch est validé puis appliqué ici.
 
     Args:
         partial_data: Données partielles existantes
         follow_up_text: Texte additionnel du client
 
     Returns:
-        dict: Données mises à jour
+        dict: {'success': bool, 'data': dict, 'patch': list, 'rejected': list}
     """
-    prompt = f"""Données actuelles de la soumission Bien Chez Soi:
-{json.dumps(partial_data, indent=2, ensure_ascii=False)}
+    prompt = f"""Soumission actuelle (JSON compact, champs absents = null ou false):
+{_compact_soumission(partial_data)}
 
 Information additionnelle du client:
 {follow_up_text}
 
-Mets à jour le JSON avec les nouvelles informations.
-Retourne UNIQUEMENT le JSON complet mis à jour, même structure que ci-dessus."""
+Retourne UNIQUEMENT un tableau JSON Patch (RFC 6902) des champs à modifier, par exemple:
+[{{"op":"replace","path":"/nombre_heures","value":3}},{{"op":"replace","path":"/addon_fin_semaine","value":true}}]
+Opérations permises: replace, remove. Retourne [] si rien ne change."""
 
     if not client:
         return {'success': False, 'error': 'ANTHROPIC_API_KEY non configurée. Ajoutez-la dans .env.'}
     try:
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1500,
-            system=SYSTEM_PROMPT,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+        message = _call_claude('complete', [
+            {"role": "user", "content": prompt}
+        ], max_tokens=400)
 
         response_text = message.content[0].text
-        start = response_text.find('{')
-        end = response_text.rfind('}') + 1
-        json_str = response_text[start:end]
+        start = response_text.find('[')
+        end = response_text.rfind(']') + 1
+
+        if start == -1 or end == 0:
+            # Le modèle a retourné l'objet complet: le convertir en patch
+            obj_start = response_text.find('{')
+            obj_end = response_text.rfind('}') + 1
+            if obj_start == -1 or obj_end == 0:
+                return {'success': False, 'error': 'Aucun JSON trouvé dans la réponse IA'}
+            full = json.loads(response_text[obj_start:obj_end])
+            operations = [
+                {'op': 'replace', 'path': f'/{k}', 'value': v}
+                for k, v in full.items()
+                if k in SOUMISSION_FIELDS and partial_data.get(k) != v
+            ]
+        else:
+            operations = json.loads(response_text[start:end])
+
+        result = apply_soumission_patch(partial_data, operations)
 
         return {
             'success': True,
-            'data': json.loads(json_str)
+            'data': result['data'],
+            'patch': result['applied'],
+            'rejected': result['rejected'],
         }
 
+    except json.JSONDecodeError as e:
+        return {
+            'success': False,
+            'error': f'Erreur parsing JSON: {str(e)}'
+        }
     except Exception as e:
         return {
             'success': False,
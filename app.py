@@ -8,23 +8,35 @@ Usage:
 L'application sera disponible sur http://localhost:5000
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+from werkzeug.utils import secure_filename
 from datetime import datetime
 import os
 import secrets
-import tempfile
-import base64
+import json
 
 from config import Config, CONFIG_LOADED_FROM
 from voice_processor import transcribe_audio
-from ai_parser import parse_voice_input, complete_soumission_data
-from pdf_generator import generate_soumission_pdf, calculate_totals
+from ai_parser import (
+    parse_voice_input, parse_voice_input_stream, complete_soumission_data,
+    get_parser_stats, validate_fields, PRICING_FIELDS
+)
+from pdf_generator import calculate_totals, generate_soumission_html
+from pdf_cache import discard as discard_pdf, get_pdf
+from pdf_export import FORMATS as EXPORT_FORMATS, export_stream
+from resident_fanout import fan_out, prepare_residents
+from pdf_prerender import cancel as cancel_prerender, get_stats as get_prerender_stats, schedule as schedule_prerender
+from signature import prepare_signature
+from pricing_engine import client_rules, current_tables, get_tables
+from pricing_optimizer import cheapest_options
 from notion_service import (
     create_soumission, get_or_create_contact,
-    update_soumission_status, get_recent_soumissions, search_soumissions
+    update_soumission_status, get_recent_soumissions, search_soumissions,
+    iter_soumissions
 )
 from email_service import send_soumission_email
+from http_pool import warm_up
 
 app = Flask(__name__)
 CORS(app)
@@ -44,6 +56,12 @@ def index():
         return f.read()
 
 
+@app.route('/pricing.js')
+def pricing_js():
+    """Évaluateur de prix côté navigateur (mêmes règles que pricing_engine)"""
+    return send_file(os.path.join(os.path.dirname(__file__), 'pricing.js'), mimetype='text/javascript')
+
+
 # ============================================================
 # ROUTES — API
 # ============================================================
@@ -97,6 +115,21 @@ def parse():
     return jsonify(result)
 
 
+def _numero():
+    return f"BCS-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+
+def _prerender(session_id):
+    """
+    Rendu spéculatif du PDF de la session en arrière-plan. Le numéro est fixé
+    dès maintenant pour que /api/generate-pdf demande le même document.
+    """
+    session = sessions[session_id]
+    session['data'].setdefault('numero', _numero())
+    data = dict(session['data'], date=datetime.now().strftime('%Y-%m-%d'))
+    schedule_prerender(session_id, data, session['totals'])
+
+
 @app.route('/api/create-from-text', methods=['POST'])
 def create_from_text():
     """
@@ -119,8 +152,10 @@ def create_from_text():
         'transcription': text,
         'data': parsed['data'],
         'totals': totals,
+        'pricing_version': totals['pricing_version'],
         'created_at': datetime.now().isoformat()
     }
+    _prerender(session_id)
     return jsonify({
         'success': True,
         'session_id': session_id,
@@ -130,6 +165,74 @@ def create_from_text():
     })
 
 
+def _sse(event, payload):
+    """Formate un événement Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/create-from-text/stream', methods=['POST'])
+def create_from_text_stream():
+    """
+    Variante streaming de create-from-text (Server-Sent Events).
+    Entrée: {"text": "chaîne"}
+    Événements: field {key, value} dès qu'un champ est extrait,
+    totals dès qu'un champ de prix arrive, puis done (même contenu que
+    create-from-text) ou error.
+    """
+    data = request.json
+    text = (data or {}).get('text', '').strip()
+    if not text:
+        return jsonify({'success': False, 'error': 'Texte manquant'}), 400
+
+    def events():
+        partial, last_totals = {}, None
+        for event in parse_voice_input_stream(text):
+            if event[0] == 'field':
+                _, key, value = event
+                # Valeur hors schéma (ex. texte pour un nombre): ignorée ici, la sortie
+                # complète est validée (et corrigée par le modèle fort) avant done
+                valides, _ = validate_fields({key: value})
+                if key not in valides:
+                    continue
+                value = partial[key] = valides[key]
+                yield _sse('field', {'key': key, 'value': value})
+                if key in PRICING_FIELDS and 'type_service' in partial:
+                    totals = calculate_totals(partial)
+                    if totals != last_totals:
+                        yield _sse('totals', totals)
+                        last_totals = totals
+                continue
+
+            parsed = event[1]
+            if not parsed['success']:
+                yield _sse('error', parsed)
+                return
+
+            totals = calculate_totals(parsed['data'])
+            session_id = secrets.token_urlsafe(16)
+            sessions[session_id] = {
+                'transcription': text,
+                'data': parsed['data'],
+                'totals': totals,
+                'pricing_version': totals['pricing_version'],
+                'created_at': datetime.now().isoformat()
+            }
+            _prerender(session_id)
+            yield _sse('done', {
+                'success': True,
+                'session_id': session_id,
+                'transcription': text,
+                'data': parsed['data'],
+                'totals': totals
+            })
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/process-voice', methods=['POST'])
 def process_voice():
     """
@@ -161,8 +264,10 @@ def process_voice():
         'transcription': transcription['text'],
         'data': parsed['data'],
         'totals': totals,
+        'pricing_version': totals['pricing_version'],
         'created_at': datetime.now().isoformat()
     }
+    _prerender(session_id)
 
     return jsonify({
         'success': True,
@@ -189,19 +294,24 @@ def update_session():
         for key, value in data['updates'].items():
             session['data'][key] = value
 
-    # Ou mise à jour par texte additionnel (parsing IA)
+    # Ou mise à jour par texte additionnel (parsing IA, patch des champs modifiés)
+    patch = None
     if 'additional_text' in data and data['additional_text']:
         result = complete_soumission_data(session['data'], data['additional_text'])
         if result['success']:
             session['data'] = result['data']
+            patch = result['patch']
 
-    # Recalculer totaux
-    session['totals'] = calculate_totals(session['data'])
+    # Recalculer totaux (sur la grille de la soumission si elle est encore chargée)
+    session['totals'] = calculate_totals(session['data'], get_tables(session.get('pricing_version')))
+    session['pricing_version'] = session['totals']['pricing_version']
+    _prerender(session_id)
 
     return jsonify({
         'success': True,
         'data': session['data'],
-        'totals': session['totals']
+        'totals': session['totals'],
+        'patch': patch
     })
 
 
@@ -213,12 +323,74 @@ def calculate():
     return jsonify({'success': True, 'totals': totals})
 
 
+@app.route('/api/preview', methods=['POST'])
+def preview():
+    """
+    Aperçu HTML de la soumission (même document que le PDF), pour l'édition en direct
+    Input: {session_id, updates (optionnel, modifications du formulaire non enregistrées)} ou {data}
+    Réponse: fragment HTML, ETag = empreinte du document (304 si inchangé)
+    """
+    data = request.json or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Objet JSON attendu'}), 400
+    session_id = data.get('session_id')
+    updates = data.get('updates') or {}
+    en_session = bool(session_id) and session_id in sessions
+
+    # Champs non enregistrés: prix et affichage vérifiés avant calculate_totals et le rendu
+    _, errors = validate_fields(updates if en_session else data.get('data') or {})
+    if errors:
+        return jsonify({'success': False, 'error': 'Données invalides', 'errors': errors}), 400
+
+    if en_session:
+        session = sessions[session_id]
+        # Même numéro que le PDF de la session
+        session['data'].setdefault('numero', _numero())
+        soumission_data = dict(session['data'], **updates)
+        totals = (calculate_totals(soumission_data, get_tables(session.get('pricing_version')))
+                  if updates else session['totals'])
+    else:
+        soumission_data = dict(data.get('data', {}))
+        soumission_data.setdefault('numero', _numero())
+        totals = calculate_totals(soumission_data)
+    soumission_data['date'] = datetime.now().strftime('%Y-%m-%d')
+
+    result = generate_soumission_html(soumission_data, totals)
+    if not result['success']:
+        return jsonify(result), 500
+
+    # Document inchangé depuis le dernier aperçu affiché: rien à renvoyer
+    unchanged = request.if_none_match.contains(result['key'])
+    response = Response(None if unchanged else result['html'], status=304 if unchanged else 200, mimetype='text/html')
+    response.set_etag(result['key'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _pdf_error(result):
+    """
+    Réponse d'erreur de rendu: 400 si la signature est invalide, 413 si elle est
+    trop lourde, 503 si le pool est saturé, 504 si délai dépassé
+    """
+    if result.get('too_large'):
+        return jsonify(result), 413
+    if result.get('invalid'):
+        return jsonify(result), 400
+    if result.get('busy'):
+        response = jsonify(result)
+        response.headers['Retry-After'] = '2'
+        return response, 503
+    return jsonify(result), (504 if result.get('timeout') else 500)
+
+
 @app.route('/api/generate-pdf', methods=['POST'])
 def generate_pdf():
     """Génère et télécharge le PDF de soumission"""
     data = request.json
     session_id = data.get('session_id')
-    signature_data = data.get('signature')  # Base64 PNG de la signature
+    signature = prepare_signature(data.get('signature'))  # Traits vectoriels (ou PNG base64)
+    if not signature['success']:
+        return _pdf_error(signature)
 
     # Récupérer les données
     if session_id and session_id in sessions:
@@ -229,51 +401,25 @@ def generate_pdf():
         soumission_data = data.get('data', {})
         totals = calculate_totals(soumission_data)
 
-    # Numéro et date
-    numero = f"BCS-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    # Numéro (gardé pour la session: même soumission, même document) et date
+    numero = soumission_data.get('numero') or _numero()
     soumission_data['numero'] = numero
     soumission_data['date'] = datetime.now().strftime('%Y-%m-%d')
 
-    # Sauvegarder la signature si fournie
-    signature_path = None
-    if signature_data:
-        try:
-            # Retirer le préfixe data:image/png;base64,
-            if ',' in signature_data:
-                signature_data = signature_data.split(',')[1]
-            sig_bytes = base64.b64decode(signature_data)
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_sig:
-                tmp_sig.write(sig_bytes)
-                signature_path = tmp_sig.name
-        except Exception:
-            signature_path = None
-
-    # Générer PDF
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-        pdf_path = tmp.name
-
-    result = generate_soumission_pdf(soumission_data, pdf_path, signature_path)
-
-    # Nettoyer la signature temporaire
-    if signature_path and os.path.exists(signature_path):
-        try:
-            os.unlink(signature_path)
-        except Exception:
-            pass
+    if session_id and session_id in sessions:
+        sessions[session_id]['data']['numero'] = numero
 
-    if result['success']:
-        if session_id and session_id in sessions:
-            sessions[session_id]['pdf_path'] = pdf_path
-            sessions[session_id]['data']['numero'] = numero
-
-        return send_file(
-            pdf_path,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=f"soumission-bcs-{numero}.pdf"
-        )
+    # PDF relu du cache ou rendu (pool de processus, hors du thread de la requête)
+    result = get_pdf(soumission_data, totals, signature['signature'])
+    if not result['success']:
+        return _pdf_error(result)
 
-    return jsonify(result), 500
+    return send_file(
+        result['path'],
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f"soumission-bcs-{numero}.pdf"
+    )
 
 
 @app.route('/api/submit', methods=['POST'])
@@ -282,53 +428,49 @@ def submit():
     Soumet la soumission complète:
     - Sauvegarde dans Notion
     - Envoie par courriel si email fourni
+    - Service partagé ou de groupe avec 'residents' (liste de {client_nom, client_email,
+      client_telephone, langue_client}): une soumission par résident (sa part, PDF
+      et courriel) au lieu du courriel unique
     """
     data = request.json
     session_id = data.get('session_id')
-    signature_data = data.get('signature')
+    signature = prepare_signature(data.get('signature'))
 
     if not session_id or session_id not in sessions:
         return jsonify({'success': False, 'error': 'Session invalide ou expirée'}), 400
+    if not signature['success']:
+        return _pdf_error(signature)
 
     session = sessions[session_id]
-    soumission_data = session['data']
+    # Copie: la session reste intacte si l'envoi échoue en cours de route
+    soumission_data = dict(session['data'])
     totals = session['totals']
-    pdf_path = session.get('pdf_path')
     lang = soumission_data.get('langue_client', 'fr')
 
-    results = {'notion': None, 'email': None, 'contact': None}
+    residents = None
+    if data.get('residents'):
+        tables = get_tables(session.get('pricing_version'))
+        checked = prepare_residents(data['residents'], soumission_data.get('type_service'), tables)
+        if not checked['success']:
+            return jsonify(checked), 400
+        residents = checked['residents']
+        # Service commun tarifé pour le nombre de résidents de la liste
+        soumission_data['nombre_personnes'] = len(residents)
+        totals = calculate_totals(soumission_data, tables)
 
-    # 1. Générer PDF si pas déjà fait
-    if not pdf_path or not os.path.exists(pdf_path):
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            pdf_path = tmp.name
+    results = {'notion': None, 'email': None, 'contact': None}
 
-        soumission_data['numero'] = soumission_data.get(
-            'numero', f"BCS-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        )
+    # 1. PDF: celui déjà téléchargé (même contenu, même signature) est relu du cache
+    soumission_data['numero'] = soumission_data.get('numero') or _numero()
+    soumission_data['date'] = datetime.now().strftime('%Y-%m-%d')
 
-        # Signature
-        signature_path = None
-        if signature_data:
-            try:
-                if ',' in signature_data:
-                    signature_data = signature_data.split(',')[1]
-                sig_bytes = base64.b64decode(signature_data)
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_sig:
-                    tmp_sig.write(sig_bytes)
-                    signature_path = tmp_sig.name
-            except Exception:
-                pass
-
-        generate_soumission_pdf(soumission_data, pdf_path, signature_path)
-
-        if signature_path and os.path.exists(signature_path):
-            try:
-                os.unlink(signature_path)
-            except Exception:
-                pass
-
-        session['pdf_path'] = pdf_path
+    result = get_pdf(soumission_data, totals, signature['signature'])
+    if result['success']:
+        pdf_path = result['path']
+    else:
+        # Soumission enregistrée et envoyée quand même, sans pièce jointe
+        pdf_path = None
+        results['pdf'] = result['error']
 
     # 2. Créer/trouver contact dans Notion
     contact_result = get_or_create_contact(soumission_data)
@@ -338,8 +480,15 @@ def submit():
     notion_result = create_soumission(soumission_data, totals, pdf_path)
     results['notion'] = notion_result
 
-    # 4. Envoyer courriel si email disponible
-    if soumission_data.get('client_email'):
+    # 4. Une soumission par résident (parts, PDF et courriels en parallèle)
+    if residents:
+        results['residents'] = fan_out(soumission_data, totals, residents, tables)['residents']
+        sent = any((r['email'] or {}).get('success') for r in results['residents'])
+        if sent and notion_result.get('notion_id'):
+            update_soumission_status(notion_result['notion_id'], 'Envoyée')
+
+    # Sinon, envoyer courriel si email disponible
+    elif soumission_data.get('client_email'):
         email_result = send_soumission_email(
             soumission_data['client_email'],
             soumission_data, totals, pdf_path, lang
@@ -349,13 +498,11 @@ def submit():
         if email_result.get('success') and notion_result.get('notion_id'):
             update_soumission_status(notion_result['notion_id'], 'Envoyée')
 
-    # 5. Nettoyer
-    if pdf_path and os.path.exists(pdf_path):
-        try:
-            os.unlink(pdf_path)
-        except Exception:
-            pass
+    # 5. Nettoyer (le document envoyé ne sera plus demandé)
+    if pdf_path:
+        discard_pdf(result['key'])
 
+    cancel_prerender(session_id)
     del sessions[session_id]
 
     return jsonify({'success': True, 'results': results})
@@ -384,27 +531,79 @@ def search():
     return jsonify({'success': True, 'results': results})
 
 
+@app.route('/api/export')
+def export():
+    """
+    Export en lot des soumissions d'un client ou d'une période, diffusé pendant le rendu
+    Query: client (texte du titre), du / au (AAAA-MM-JJ, inclus), format = zip | pdf
+    """
+    fmt = request.args.get('format', 'zip')
+    client = request.args.get('client', '').strip()
+    du, au = request.args.get('du', ''), request.args.get('au', '')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'Format inconnu (zip ou pdf)'}), 400
+    if not (client or du or au):
+        return jsonify({'success': False, 'error': 'Préciser un client ou une période'}), 400
+    try:
+        for date in filter(None, (du, au)):
+            datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Date invalide (AAAA-MM-JJ)'}), 400
+
+    rows = iter_soumissions(client=client or None, date_debut=du or None, date_fin=au or None)
+    nom = '-'.join(filter(None, ('soumissions-bcs', secure_filename(client), du, au)))
+    return Response(
+        stream_with_context(export_stream(rows, fmt)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{nom}.{fmt}"', 'X-Accel-Buffering': 'no'}
+    )
+
+
 # ============================================================
 # ROUTES — CONFIG / PRIX
 # ============================================================
 
 @app.route('/api/pricing')
 def pricing():
-    """Retourne la grille tarifaire pour le frontend"""
+    """Retourne la grille tarifaire active (et sa version) pour le frontend"""
+    tables = current_tables()
+    card = tables.source
     return jsonify({
-        'tarif_regulier': Config.TARIF_REGULIER,
-        'tarif_affiche': Config.TARIF_AFFICHE,
-        'services_carte': Config.SERVICES_CARTE,
-        'contrats': Config.CONTRATS,
-        'forfaits': Config.FORFAITS_RECURRENTS,
-        'addons': Config.ADDONS,
+        'version': tables.version,
+        'tarif_regulier': card.TARIF_REGULIER,
+        'tarif_affiche': card.TARIF_AFFICHE,
+        'services_carte': card.SERVICES_CARTE,
+        'contrats': card.CONTRATS,
+        'forfaits': card.FORFAITS_RECURRENTS,
+        'addons': card.ADDONS,
         'categories': Config.CATEGORIES,
         'types_service': Config.TYPES_SERVICE,
-        'tps': Config.TPS_RATE,
-        'tvq': Config.TVQ_RATE,
+        'tps': card.TPS_RATE,
+        'tvq': card.TVQ_RATE,
     })
 
 
+@app.route('/api/pricing-rules')
+def pricing_rules():
+    """Règles de tarification compilées pour le calcul local (pricing.js); ETag = version"""
+    tables = current_tables()
+    if request.if_none_match.contains(tables.version):
+        return '', 304
+    response = jsonify(client_rules(tables))
+    response.set_etag(tables.version)
+    return response
+
+
+@app.route('/api/cheapest-options', methods=['POST'])
+def cheapest():
+    """
+    Classe les options de service par coût mensuel pour un besoin récurrent
+    Entrée: {visites_semaine, heures_visite | heures_semaine, nombre_personnes, addon_*}
+    """
+    result = cheapest_options(request.json or {})
+    return jsonify(result), (200 if result['success'] else 400)
+
+
 @app.route('/api/lang/<lang>')
 def get_lang(lang):
     """Retourne les traductions pour une langue"""
@@ -416,15 +615,22 @@ def get_lang(lang):
 # SESSIONS DEBUG
 # ============================================================
 
+@app.route('/api/parser-stats')
+def parser_stats():
+    """Latence (TTFT) et tokens en cache des appels au parser IA (debug)"""
+    return jsonify({'success': True, 'stats': get_parser_stats()})
+
+
 @app.route('/api/sessions')
 def list_sessions():
     """Liste les sessions actives (debug)"""
     return jsonify({
         'count': len(sessions),
         'sessions': [
-            {'id': sid, 'created': s.get('created_at')}
+            {'id': sid, 'created': s.get('created_at'), 'pricing_version': s.get('pricing_version')}
             for sid, s in sessions.items()
-        ]
+        ],
+        'prerender': get_prerender_stats()
     })
 
 
@@ -443,11 +649,7 @@ def cleanup_old_sessions():
     ]
 
     for sid in expired:
-        if sessions[sid].get('pdf_path') and os.path.exists(sessions[sid]['pdf_path']):
-            try:
-                os.unlink(sessions[sid]['pdf_path'])
-            except Exception:
-                pass
+        cancel_prerender(sid)
         del sessions[sid]
 
     return len(expired)
@@ -471,6 +673,8 @@ if __name__ == '__main__':
     print(f"  Anthropic (Claude):  {'OK' if Config.ANTHROPIC_API_KEY else 'MANQUANT'}")
     print(f"  Notion:              {'OK' if Config.NOTION_API_KEY and Config.NOTION_SOUMISSIONS_DB else 'MANQUANT'}")
     print(f"  Email (SMTP):        {'OK' if Config.SMTP_USER and Config.SMTP_PASSWORD else 'MANQUANT'}")
+    if Config.HTTP_WARMUP:
+        print(f"  Préchauffage HTTP:   {warm_up()}")
     print()
     print("=" * 60)
 
@@ -0,0 +1,164 @@
+"""
+BIEN CHEZ SOI - Re-parsing en lot des transcriptions historiques
+Soumet toutes les transcriptions en un seul lot (Message Batches API),
+attend la fin du traitement et écrit les résultats en JSONL.
+Sert à détecter les dérives après un changement de prompt ou de tarifs.
+
+Usage:
+    python batch_reparse.py transcriptions.jsonl resultats.jsonl
+    python -m benchmarks.batch_check    # vérification locale, sans appel API
+
+Format d'entrée (une ligne JSON par transcription):
+    {"id": "BCS-20260211...", "text": "2h de compagnie samedi...", "data": {...}}
+`data` (optionnel) est l'ancien résultat: les champs qui diffèrent sont signalés.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import ai_parser
+from ai_parser import SOUMISSION_FIELDS, build_parse_params, parse_response_text
+
+POLL_INTERVAL = 30       # secondes entre deux vérifications du lot
+BATCH_TIMEOUT = 24 * 3600  # les lots expirent côté API après 24h
+
+
+def load_transcriptions(path):
+    """
+    Lit un fichier JSONL de transcriptions.
+    Chaque ligne est un objet {"id", "text", "data"?} ou une simple chaîne.
+
+    Returns:
+        list: [{'id': str, 'text': str, 'data': dict ou None}]
+    """
+    items = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, str):
+                entry = {'text': entry}
+            text = entry.get('text') or entry.get('transcription') or ''
+            if not text.strip():
+                continue
+            items.append({
+                'id': str(entry.get('id') or line_no),
+                'text': text,
+                'data': entry.get('data'),
+            })
+    return items
+
+
+def build_batch_requests(items):
+    """
+    Construit les requêtes du lot: même modèle, même prompt système (cacheable)
+    et même message utilisateur que parse_voice_input.
+    Les custom_id sont des index (l'API limite leurs caractères).
+    """
+    return [
+        {'custom_id': f't-{index:06d}', 'params': build_parse_params(item['text'])}
+        for index, item in enumerate(items)
+    ]
+
+
+def submit_batch(requests, client=None):
+    """Soumet le lot et retourne son identifiant"""
+    client = client or ai_parser.client
+    batch = client.messages.batches.create(requests=requests)
+    return batch.id
+
+
+def wait_for_batch(batch_id, client=None, poll_interval=POLL_INTERVAL, timeout=BATCH_TIMEOUT):
+    """Attend la fin du traitement du lot (processing_status == 'ended')"""
+    client = client or ai_parser.client
+    deadline = time.monotonic() + timeout
+    while True:
+        batch = client.messages.batches.retrieve(batch_id)
+        if batch.processing_status == 'ended':
+            return batch
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Lot {batch_id} non terminé après {timeout}s')
+        counts = batch.request_counts
+        print(f"  Lot {batch_id}: {counts.processing} en cours, "
+              f"{counts.succeeded} réussis, {counts.errored} en erreur", file=sys.stderr)
+        time.sleep(poll_interval)
+
+
+def _result_row(item, entry):
+    """Convertit un résultat du lot en ligne de sortie (même post-traitement que le parser)"""
+    row = {'id': item['id'], 'text': item['text'], 'success': False}
+
+    result = entry.result if entry else None
+    if result is None or result.type != 'succeeded':
+        row['error'] = f"Requête {result.type if result else 'absente'}"
+        return row
+
+    parsed = parse_response_text(result.message.content[0].text, item['text'])
+    if not parsed['success']:
+        row['error'] = parsed['error']
+        return row
+
+    data = parsed['data']
+    row.update({'success': True, 'data': data, 'validation': parsed['validation']})
+
+    if isinstance(item.get('data'), dict):
+        row['changed_fields'] = [
+            field for field in SOUMISSION_FIELDS
+            if field in item['data'] and item['data'][field] != data.get(field)
+        ]
+    return row
+
+
+def reparse_backlog(input_path, output_path, client=None, poll_interval=POLL_INTERVAL):
+    """
+    Re-parse un fichier de transcriptions en un seul lot et écrit les résultats.
+
+    Returns:
+        dict: {'success': bool, 'batch_id': str, 'total': int, 'succeeded': int, 'drifted': int}
+    """
+    client = client or ai_parser.client
+    if not client:
+        return {'success': False, 'error': 'ANTHROPIC_API_KEY non configurée. Ajoutez-la dans .env.'}
+
+    items = load_transcriptions(input_path)
+    if not items:
+        return {'success': False, 'error': 'Aucune transcription à traiter'}
+
+    requests = build_batch_requests(items)
+    batch_id = submit_batch(requests, client)
+    wait_for_batch(batch_id, client, poll_interval)
+
+    entries = {entry.custom_id: entry for entry in client.messages.batches.results(batch_id)}
+
+    succeeded = drifted = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        for request, item in zip(requests, items):
+            row = _result_row(item, entries.get(request['custom_id']))
+            succeeded += 1 if row['success'] else 0
+            drifted += 1 if row.get('changed_fields') else 0
+            out.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    return {
+        'success': True,
+        'batch_id': batch_id,
+        'total': len(items),
+        'succeeded': succeeded,
+        'drifted': drifted,
+    }
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Re-parsing en lot des transcriptions BCS')
+    arg_parser.add_argument('input', help='Fichier JSONL des transcriptions')
+    arg_parser.add_argument('output', help='Fichier JSONL des résultats')
+    arg_parser.add_argument('--poll', type=int, default=POLL_INTERVAL,
+                            help='Secondes entre deux vérifications du lot')
+    args = arg_parser.parse_args()
+
+    summary = reparse_backlog(args.input, args.output, poll_interval=args.poll)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    sys.exit(0 if summary['success'] else 1)
@@ -0,0 +1,4 @@
+"""
+BIEN CHEZ SOI - Micro-benchmarks des chemins critiques
+Usage: python -m benchmarks.run [--update-baseline]
+"""
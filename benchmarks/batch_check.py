@@ -0,0 +1,128 @@
+"""
+BIEN CHEZ SOI - Vérification locale du re-parsing en lot (sans appel API)
+
+LocalBatchClient imite client.messages.batches (create, retrieve, results):
+le lot reste 'in_progress' pendant quelques vérifications, puis chaque requête
+reçoit la réponse brute prévue (ou une erreur). batch_reparse.reparse_backlog
+tourne dessus de bout en bout: soumission, attente, lecture des résultats et
+écriture JSONL, vérifiées ligne par ligne.
+
+Usage (depuis la racine du projet):
+    python -m benchmarks.batch_check
+"""
+
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import batch_reparse
+from benchmarks import fixtures
+
+
+class LocalBatchClient:
+    """
+    Client de substitution pour batch_reparse (même interface que anthropic.Anthropic).
+
+    Args:
+        responses: Texte brut du modèle par requête, dans l'ordre du lot (None = requête en erreur)
+        polls: Vérifications 'in_progress' avant la fin du lot
+    """
+
+    def __init__(self, responses, polls=2):
+        self.responses = list(responses)
+        self.polls = polls
+        self.batches = {}
+        self.calls = {'create': 0, 'retrieve': 0, 'results': 0}
+        self.messages = SimpleNamespace(batches=SimpleNamespace(
+            create=self._create, retrieve=self._retrieve, results=self._results))
+
+    def _create(self, requests):
+        self.calls['create'] += 1
+        batch_id = f'msgbatch_local_{len(self.batches) + 1:03d}'
+        self.batches[batch_id] = {'requests': requests, 'polls': 0}
+        return SimpleNamespace(id=batch_id, processing_status='in_progress')
+
+    def _retrieve(self, batch_id):
+        self.calls['retrieve'] += 1
+        batch = self.batches[batch_id]
+        batch['polls'] += 1
+        total = len(batch['requests'])
+        ended = batch['polls'] > self.polls
+        errored = sum(1 for r in self.responses[:total] if r is None) if ended else 0
+        return SimpleNamespace(
+            id=batch_id,
+            processing_status='ended' if ended else 'in_progress',
+            request_counts=SimpleNamespace(processing=0 if ended else total,
+                                           succeeded=total - errored if ended else 0,
+                                           errored=errored),
+        )
+
+    def _results(self, batch_id):
+        self.calls['results'] += 1
+        batch = self.batches[batch_id]
+        if batch['polls'] <= self.polls:
+            raise RuntimeError(f'Lot {batch_id} non terminé')
+        # Ordre inverse: l'API ne garantit pas l'ordre des résultats
+        for request, text in reversed(list(zip(batch['requests'], self.responses))):
+            if text is None:
+                result = SimpleNamespace(type='errored')
+            else:
+                result = SimpleNamespace(type='succeeded', message=SimpleNamespace(
+                    content=[SimpleNamespace(type='text', text=text)]))
+            yield SimpleNamespace(custom_id=request['custom_id'], result=result)
+
+
+def _echec(message):
+    print(f'ÉCHEC: {message}', file=sys.stderr)
+    return 1
+
+
+def main():
+    soumissions = fixtures.soumissions()
+    responses = [text for text, _ in fixtures.model_responses()]
+    # Une requête en erreur, une réponse illisible, une dérive sur l'ancien résultat
+    responses[1], responses[2] = None, 'Désolé, je ne peux pas répondre.'
+    anciens = [dict(data) for data in soumissions]
+    anciens[3]['nombre_heures'] = 99
+
+    dossier = tempfile.mkdtemp(prefix='bcs-batch-')
+    entree, sortie = os.path.join(dossier, 'transcriptions.jsonl'), os.path.join(dossier, 'resultats.jsonl')
+    with open(entree, 'w', encoding='utf-8') as f:
+        for i, (data, ancien) in enumerate(zip(soumissions, anciens)):
+            f.write(json.dumps({'id': data['numero'], 'text': f"{data['description_service']} #{i}",
+                                'data': ancien}, ensure_ascii=False) + '\n')
+        f.write('\n' + json.dumps({'id': 'vide', 'text': '  '}) + '\n')   # ignorées
+
+    client = LocalBatchClient(responses)
+    summary = batch_reparse.reparse_backlog(entree, sortie, client=client, poll_interval=0)
+    with open(sortie, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+
+    total = len(soumissions)
+    if not summary['success'] or summary['total'] != total:
+        return _echec(f'résumé inattendu: {summary}')
+    if client.calls != {'create': 1, 'retrieve': client.polls + 1, 'results': 1}:
+        return _echec(f'appels au client: {client.calls}')
+    if [row['id'] for row in rows] != [data['numero'] for data in soumissions]:
+        return _echec('lignes JSONL absentes ou hors de l\'ordre d\'entrée')
+    if rows[1]['success'] or rows[1]['error'] != 'Requête errored' or rows[2]['success']:
+        return _echec(f'erreurs mal signalées: {rows[1]}, {rows[2]}')
+    if summary['succeeded'] != total - 2:
+        return _echec(f"{summary['succeeded']} réussies sur {total - 2} attendues")
+    for i, (row, data) in enumerate(zip(rows, soumissions)):
+        if i in (1, 2):
+            continue
+        if row['data']['type_service'] != data['type_service'] or row['validation']:
+            return _echec(f"{row['id']}: {row['data'].get('type_service')} / {row['validation']}")
+    if rows[3]['changed_fields'] != ['nombre_heures'] or summary['drifted'] != 1:
+        return _echec(f"dérives: {rows[3].get('changed_fields')}, drifted={summary['drifted']}")
+
+    print(f"OK: lot de {total} requêtes, {summary['succeeded']} réussies, "
+          f"{summary['drifted']} dérive, {client.calls['retrieve']} vérifications ({sortie})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""
+Corpus représentatif: chaque type de service, en français et en anglais,
+avec durées, nombres de personnes, forfaits, contrats et add-ons variés.
+"""
+
+import json
+
+from config import Config
+
+CLIENTS = {
+    'fr': {
+        'client_nom': 'Marie Tremblay',
+        'client_telephone': '450-555-0123',
+        'client_email': 'marie.tremblay@example.com',
+        'adresse_service': '1234 boul. Taschereau, Brossard',
+        'description_service': 'Visite de compagnie et aide au repas, marche au parc si la météo le permet',
+        'categorie': 'Animation & Compagnie',
+        'notes': 'Sonner deux fois, chien amical',
+    },
+    'en': {
+        'client_nom': 'John Smith',
+        'client_telephone': '514-555-0199',
+        'client_email': 'john.smith@example.com',
+        'adresse_service': '55 Rome Ave, Brossard',
+        'description_service': 'Companionship visit and meal assistance, short walk if the weather allows',
+        'categorie': 'Soins & Hygiène',
+        'notes': 'Parking in the back',
+    },
+}
+
+VARIANTES = {
+    'Régulier (sans contrat)': [{'nombre_heures': h} for h in (1, 2, 3, 4, 6)],
+    'À la carte (Animation)': [{'nombre_heures': h} for h in (2, 3, 5)],
+    'Groupe Soins RPA': [{'nombre_heures': 4, 'nombre_personnes': n} for n in (3, 5, 12, 20)],
+    'Groupe Animation RPA': [{'nombre_heures': 4, 'nombre_personnes': n} for n in (5, 8, 25)],
+    'Partagé voisins RPA': [{'nombre_heures': 4, 'nombre_personnes': n} for n in (2, 3, 4)],
+    'Contrat corporatif': [{'nombre_heures': h, 'type_contrat': c}
+                           for h in (4, 16) for c in Config.CONTRATS],
+    'Forfait récurrent': [{'forfait_recurrent': f} for f in Config.FORFAITS_RECURRENTS],
+}
+
+ADDON_SETS = [
+    {},
+    {'addon_urgence': True},
+    {'addon_fin_semaine': True, 'addon_hors_horaire': True},
+    {f'addon_{key}': True for key in Config.ADDONS},
+]
+
+
+def soumissions():
+    """Toutes les soumissions du corpus (type × variante × add-ons × langue)"""
+    corpus = []
+    for lang, client in CLIENTS.items():
+        for type_service, variantes in VARIANTES.items():
+            for i, variante in enumerate(variantes):
+                addons = ADDON_SETS[i % len(ADDON_SETS)]
+                corpus.append({
+                    **client,
+                    'type_service': type_service,
+                    **variante,
+                    **addons,
+                    'langue_client': lang,
+                    'date_service': '2026-03-14',
+                    'heure_service': '10:00',
+                    'numero': f'BCS-BENCH-{len(corpus):04d}',
+                })
+    return corpus
+
+
+def pdf_soumissions():
+    """Une soumission par type de service et par langue (rendu PDF, plus lent)"""
+    seen, corpus = set(), []
+    for data in soumissions():
+        key = (data['type_service'], data['langue_client'])
+        if key not in seen:
+            seen.add(key)
+            corpus.append(data)
+    return corpus
+
+
+def model_responses():
+    """Réponses brutes du modèle telles que reçues (texte autour, bloc ```json)"""
+    fields = ('client_nom', 'client_telephone', 'client_email', 'adresse_service',
+              'description_service', 'categorie', 'type_service', 'nombre_heures',
+              'nombre_personnes', 'forfait_recurrent', 'type_contrat', 'date_service',
+              'heure_service', 'notes', 'langue_client')
+    responses = []
+    for i, data in enumerate(soumissions()):
+        payload = {field: data.get(field) for field in fields}
+        payload.update({f'addon_{key}': bool(data.get(f'addon_{key}')) for key in Config.ADDONS})
+        body = json.dumps(payload, ensure_ascii=False, indent=2)
+        text = f"Voici les informations extraites:\n```json\n{body}\n```" if i % 2 else body
+        responses.append((text, data['description_service']))
+    return responses
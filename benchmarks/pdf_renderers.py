@@ -0,0 +1,246 @@
+"""
+BIEN CHEZ SOI - Comparaison des moteurs de rendu PDF (canvas / platypus)
+
+Pour chaque soumission du corpus (sans signature, signature PNG ou vectorielle, plus des cas qui
+débordent de la mise en page fixe), rend le PDF avec les deux moteurs et
+rapporte le temps de rendu, la taille du fichier et un diff visuel.
+
+Le diff visuel interprète les flux de contenu des deux PDF (texte avec
+police, taille, couleur et position absolue; rectangles pleins; filets;
+images) et compare les marques page par page, à 0,01 pt près.
+Code de sortie 1 si un document diffère.
+
+Usage (depuis la racine du projet):
+    python -m benchmarks.pdf_renderers
+    python -m benchmarks.pdf_renderers --repeat 50
+"""
+
+import argparse
+import base64
+import os
+import re
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+
+from PIL import Image, ImageDraw
+
+from benchmarks import fixtures
+from pdf_generator import generate_soumission_pdf
+from pricing_engine import calculate_totals
+from signature import prepare_signature, _encoder_traits
+
+TOKEN = re.compile(rb"""
+    \((?:\\.|[^\\)])*\)          # string
+  | /[^\s/\[\]()<>]+             # name
+  | [-+]?(?:\d+\.?\d*|\.\d+)     # number
+  | \[ | \]
+  | [A-Za-z*'"]+                 # operator
+""", re.X | re.S)
+STREAM = re.compile(rb'<<(.*?)>>\s*stream\r?\n(.*?)endstream', re.S)
+
+
+def _multiply(m, n):
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (a * a2 + b * c2, a * b2 + b * d2, c * a2 + d * c2, c * b2 + d * d2,
+            e * a2 + f * c2 + e2, e * b2 + f * d2 + f2)
+
+
+def _point(m, x, y):
+    a, b, c, d, e, f = m
+    return round(a * x + c * y + e, 2), round(b * x + d * y + f, 2)
+
+
+def _unescape(raw):
+    text = raw[1:-1]
+    text = re.sub(rb'\\([0-7]{1,3})', lambda m: bytes([int(m.group(1), 8)]), text)
+    return re.sub(rb'\\(.)', rb'\1', text, flags=re.S).decode('latin1')
+
+
+def page_streams(pdf_bytes):
+    """Flux de contenu des pages décodés (ASCII85 + Flate), dans l'ordre du fichier"""
+    pages = []
+    for header, body in STREAM.findall(pdf_bytes):
+        if b'/Subtype' in header:
+            continue  # images et formulaires
+        data = body.strip()
+        if b'ASCII85Decode' in header:
+            data = base64.a85decode(data, adobe=True)
+        if b'FlateDecode' in header:
+            data = zlib.decompress(data)
+        pages.append(data)
+    return pages
+
+
+def marks(stream):
+    """Marques visibles d'un flux de contenu (liste triée)"""
+    found = []
+    operands = []
+    ctm, stack = (1, 0, 0, 1, 0, 0), []
+    fill, stroke, width, cap = (0,), (0,), 1, 0
+    font, size, leading = None, None, 0
+    tm = tlm = (1, 0, 0, 1, 0, 0)
+    path, rects = [], []
+
+    for token in TOKEN.findall(stream):
+        if token[:1] in b'(/[]' or re.fullmatch(rb'[-+]?(?:\d+\.?\d*|\.\d+)', token):
+            operands.append(token)
+            continue
+        op = token.decode()
+        nums = []
+        for value in operands:
+            try:
+                nums.append(float(value))
+            except ValueError:
+                pass
+        if op == 'q':
+            stack.append((ctm, fill, stroke, width, cap))
+        elif op == 'Q':
+            ctm, fill, stroke, width, cap = stack.pop()
+        elif op == 'cm':
+            ctm = _multiply(tuple(nums), ctm)
+        elif op in ('rg', 'g'):
+            fill = tuple(round(v, 4) for v in nums)
+        elif op in ('RG', 'G'):
+            stroke = tuple(round(v, 4) for v in nums)
+        elif op == 'w':
+            width = nums[0]
+        elif op == 'J':
+            cap = nums[0]
+        elif op == 'BT':
+            tm = tlm = (1, 0, 0, 1, 0, 0)
+        elif op == 'Tf':
+            font, size = operands[0].decode(), nums[0]
+        elif op == 'TL':
+            leading = nums[0]
+        elif op == 'Tm':
+            tm = tlm = tuple(nums)
+        elif op == 'Td':
+            tm = tlm = _multiply((1, 0, 0, 1, nums[0], nums[1]), tlm)
+        elif op == 'T*':
+            tm = tlm = _multiply((1, 0, 0, 1, 0, -leading), tlm)
+        elif op == 'Tj':
+            text = _unescape(operands[0])
+            if text:
+                found.append(('text', font, size, fill, *_point(_multiply(tm, ctm), 0, 0), text))
+        elif op == 're':
+            x, y, w, h = nums
+            rects.append((_point(ctm, x, y), _point(ctm, x + w, y + h)))
+        elif op == 'm':
+            path = [_point(ctm, *nums)]
+        elif op == 'l':
+            path.append(_point(ctm, *nums))
+        elif op == 'S':
+            found.append(('line', stroke, width, cap, *path))
+            path = []
+        elif op in ('f', 'f*', 'F'):
+            for (x1, y1), (x2, y2) in rects:
+                found.append(('rect', fill, min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)))
+            rects = []
+        elif op == 'n':
+            path, rects = [], []
+        elif op == 'Do':
+            found.append(('image', *_point(ctm, 0, 0), *_point(ctm, 1, 1)))
+        operands = []
+    return sorted(found, key=repr)
+
+
+def visual_diff(path_a, path_b):
+    """Différences de marques page par page (liste vide si identiques)"""
+    with open(path_a, 'rb') as f:
+        pages_a = page_streams(f.read())
+    with open(path_b, 'rb') as f:
+        pages_b = page_streams(f.read())
+    if len(pages_a) != len(pages_b):
+        return [f'pages: {len(pages_a)} != {len(pages_b)}']
+    problems = []
+    for i, (a, b) in enumerate(zip(pages_a, pages_b), 1):
+        ma, mb = Counter(marks(a)), Counter(marks(b))
+        for mark in (ma - mb):
+            problems.append(f'page {i} seulement dans {os.path.basename(path_a)}: {mark}')
+        for mark in (mb - ma):
+            problems.append(f'page {i} seulement dans {os.path.basename(path_b)}: {mark}')
+    return problems
+
+
+def _signature_png(path):
+    """Signature de test: quelques traits sur fond transparent, à 2x comme le canvas du navigateur"""
+    img = Image.new('RGBA', (1200, 400), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.line([(80, 300), (260, 120), (420, 280), (640, 90), (900, 260), (1100, 180)],
+              fill=(27, 42, 74, 255), width=8)
+    img.save(path, 'PNG')
+    return path
+
+
+def _signature_vectorielle():
+    """Mêmes traits que _signature_png, envoyés en vecteur (demi-pixels CSS)"""
+    traits = [[(80, 300), (260, 120), (420, 280), (640, 90), (900, 260), (1100, 180)]]
+    return prepare_signature({'traits': _encoder_traits(traits)})['signature']
+
+
+def cases(workdir):
+    """(nom, data, totals, signature: chemin du PNG ou signature vectorielle)"""
+    signature = _signature_png(os.path.join(workdir, 'signature.png'))
+    vectorielle = _signature_vectorielle()
+    result = []
+    for data in fixtures.pdf_soumissions():
+        totals = calculate_totals(data)
+        result.append((data['numero'], data, totals, None))
+        result.append((data['numero'] + '-signée', data, totals, signature))
+        result.append((data['numero'] + '-vecteur', data, totals, vectorielle))
+
+    # Débordements: description trop longue pour sa colonne, texte multiligne
+    base = fixtures.pdf_soumissions()[0]
+    longue = dict(base, numero='BCS-BENCH-LONGUE', description_service=base['description_service'] * 3)
+    multiligne = dict(base, numero='BCS-BENCH-MULTI', adresse_service='55 av. de Rome\nBrossard')
+    for data in (longue, multiligne):
+        result.append((data['numero'], data, calculate_totals(data), None))
+    return result
+
+
+def _render_time(data, totals, signature, path, renderer, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = generate_soumission_pdf(data, path, signature, totals=totals, renderer=renderer)
+        best = min(best, time.perf_counter() - started)
+    if not result['success']:
+        raise RuntimeError(result['error'])
+    return best, result['renderer'], os.path.getsize(path)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Rendu PDF canvas vs platypus: temps, taille, diff visuel')
+    arg_parser.add_argument('--repeat', type=int, default=20, help='Rendus par cas (meilleur temps retenu)')
+    args = arg_parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bcs-renderers-')
+    print(f"{'cas':<26} {'platypus ms':>11} {'canvas ms':>10} {'gain':>6} {'octets p.':>10} {'octets c.':>10}  rendu")
+    totals_p = totals_c = size_p = size_c = 0.0
+    problems = []
+    for name, data, totals, signature in cases(workdir):
+        path_p = os.path.join(workdir, f'{name}-platypus.pdf')
+        path_c = os.path.join(workdir, f'{name}-canvas.pdf')
+        t_p, _, s_p = _render_time(data, totals, signature, path_p, 'platypus', args.repeat)
+        t_c, used, s_c = _render_time(data, totals, signature, path_c, 'canvas', args.repeat)
+        totals_p, totals_c, size_p, size_c = totals_p + t_p, totals_c + t_c, size_p + s_p, size_c + s_c
+        print(f"{name:<26} {t_p * 1e3:>11.2f} {t_c * 1e3:>10.2f} {t_p / t_c:>5.2f}x {s_p:>10} {s_c:>10}  {used}")
+        problems += [f'{name}: {p}' for p in visual_diff(path_p, path_c)]
+
+    print(f"{'TOTAL':<26} {totals_p * 1e3:>11.2f} {totals_c * 1e3:>10.2f} {totals_p / totals_c:>5.2f}x "
+          f"{size_p:>10.0f} {size_c:>10.0f}")
+    if problems:
+        print('DIFFÉRENCES VISUELLES:')
+        for problem in problems:
+            print(f'  {problem}')
+        return 1
+    print('Diff visuel: aucune différence')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
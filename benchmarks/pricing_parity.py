@@ -0,0 +1,227 @@
+"""
+BIEN CHEZ SOI - Parité du moteur de tarification avec l'ancien calcul
+
+Compare pricing_engine (grille compilée depuis Config) à l'ancienne chaîne
+if/elif de pdf_generator.calculate_totals, recopiée ici telle quelle avec les
+fonctions calculer_* qu'elle appelait (retirées de config.py).
+Chaque combinaison type × heures × personnes × contrat × forfait × add-ons
+doit donner le même dict de totals (même repr, hors pricing_version et type
+des séquences de lignes).
+
+Usage (depuis la racine du projet):
+    python -m benchmarks.pricing_parity            # code de sortie 1 au premier écart
+    python -m benchmarks.pricing_parity --all      # liste tous les écarts
+"""
+
+import argparse
+import math
+import sys
+import time
+from itertools import product
+
+import pricing_engine
+from config import Config
+
+TYPES = Config.TYPES_SERVICE + ['Type inconnu']
+HEURES = (None, 0, 1, 1.5, 2, 2.0, 2.5, 3, 4, 4.5, 5, 8, 12, 24, 25, 40)
+PERSONNES = (None, 0, 1, 2, 3, 4, 5, 6, 12, 20, 25, 26, 40)
+CONTRATS = (None, '', 'Type inconnu') + tuple(Config.CONTRATS)
+FORFAITS = (None, '', 'Type inconnu') + tuple(Config.FORFAITS_RECURRENTS)
+ADDONS = [f'addon_{key}' for key in Config.ADDONS]
+
+
+# ============================================================
+# ANCIEN CALCUL (référence, ne pas modifier)
+# ============================================================
+
+def _legacy_prix_regulier(heures):
+    heures = max(1, heures)
+    if heures <= 1:
+        return 65.00
+    elif heures <= 2:
+        return 120.00
+    elif heures <= 3:
+        return 150.00
+    elif heures <= 4:
+        return 180.00
+    else:
+        heures_extra = heures - 4
+        return 180.00 + (heures_extra * 45.00)
+
+
+def _legacy_prix_groupe(nb_personnes):
+    nb_personnes = max(Config.GROUPE_MIN_PERSONNES, min(nb_personnes, Config.GROUPE_MAX_PERSONNES))
+    heures_brut = 0.4 * nb_personnes + 2
+    heures = math.ceil(heures_brut * 2) / 2
+    heures = max(heures, Config.GROUPE_BASE_HEURES)
+    prix_total = heures * Config.GROUPE_TAUX_HORAIRE
+    return {
+        "heures": heures,
+        "prix_total": prix_total,
+        "prix_par_personne": round(prix_total / nb_personnes, 2),
+    }
+
+
+def _legacy_prix_partage(nb_voisins=4):
+    nb_voisins = max(Config.PARTAGE_MIN_VOISINS, min(nb_voisins, Config.PARTAGE_MAX_VOISINS))
+    return {
+        "prix_total": Config.PARTAGE_BLOC_PRIX,
+        "nb_voisins": nb_voisins,
+        "cout_par_voisin": round(Config.PARTAGE_BLOC_PRIX / nb_voisins, 2),
+    }
+
+
+def _legacy_taxes(sous_total):
+    tps = sous_total * Config.TPS_RATE
+    tvq = sous_total * Config.TVQ_RATE
+    return {
+        "tps": round(tps, 2),
+        "tvq": round(tvq, 2),
+        "total": round(sous_total + tps + tvq, 2),
+    }
+
+
+def legacy_totals(data):
+    """pdf_generator.calculate_totals avant le moteur compilé"""
+    type_service = data.get('type_service', 'Régulier (sans contrat)')
+    heures = data.get('nombre_heures', 2) or 2
+    nb_personnes = data.get('nombre_personnes', 0) or 0
+
+    prix_base = 0.00
+    description_prix = ""
+    details_lignes = []
+
+    if type_service == 'Régulier (sans contrat)':
+        prix_base = _legacy_prix_regulier(heures)
+        description_prix = f"Service régulier — {heures}h"
+        details_lignes.append((description_prix, prix_base))
+
+    elif type_service == 'À la carte (Animation)':
+        prix_base = heures * Config.TARIF_AFFICHE
+        prix_base = max(prix_base, 100.00)
+        description_prix = f"Animation & Compagnie — {heures}h × {Config.TARIF_AFFICHE:.0f}$/h"
+        details_lignes.append((description_prix, prix_base))
+
+    elif type_service in ('Groupe Soins RPA', 'Groupe Animation RPA'):
+        if nb_personnes >= Config.GROUPE_MIN_PERSONNES:
+            groupe = _legacy_prix_groupe(nb_personnes)
+            prix_base = groupe['prix_total']
+            description_prix = f"{type_service} — {nb_personnes} pers. × {groupe['heures']}h"
+            details_lignes.append((description_prix, prix_base))
+            details_lignes.append((f"  ({groupe['prix_par_personne']:.2f}$/personne)", 0))
+        else:
+            heures = max(heures, 4)
+            prix_base = heures * Config.GROUPE_TAUX_HORAIRE
+            description_prix = f"{type_service} — {heures}h × {Config.GROUPE_TAUX_HORAIRE:.0f}$/h"
+            details_lignes.append((description_prix, prix_base))
+
+    elif type_service == 'Partagé voisins RPA':
+        nb_voisins = data.get('nombre_personnes', 4) or 4
+        partage = _legacy_prix_partage(nb_voisins)
+        prix_base = partage['prix_total']
+        description_prix = f"Bloc partagé {partage['nb_voisins']} voisins — {Config.PARTAGE_BLOC_HEURES}h"
+        details_lignes.append((description_prix, prix_base))
+        details_lignes.append((f"  ({partage['cout_par_voisin']:.2f}$/voisin)", 0))
+
+    elif type_service == 'Contrat corporatif':
+        type_contrat = data.get('type_contrat', 'hebdomadaire') or 'hebdomadaire'
+        contrat = Config.CONTRATS.get(type_contrat, Config.CONTRATS['hebdomadaire'])
+        if heures:
+            prix_base = heures * contrat['taux']
+        else:
+            prix_base = contrat['total_min']
+        description_prix = f"Contrat {type_contrat} — {heures}h × {contrat['taux']:.0f}$/h"
+        details_lignes.append((description_prix, prix_base))
+
+    elif type_service == 'Forfait récurrent':
+        forfait_nom = data.get('forfait_recurrent', 'Essentiel') or 'Essentiel'
+        forfait = Config.FORFAITS_RECURRENTS.get(forfait_nom, Config.FORFAITS_RECURRENTS['Essentiel'])
+        prix_base = forfait['prix_mois']
+        description_prix = f"Forfait {forfait_nom} — {forfait['heures_mois']}h/mois ({forfait['frequence']})"
+        details_lignes.append((description_prix, prix_base))
+
+    else:
+        prix_base = _legacy_prix_regulier(heures)
+        description_prix = f"Service — {heures}h"
+        details_lignes.append((description_prix, prix_base))
+
+    addons_total = 0.00
+    addon_details = []
+    for addon_key, addon_info in Config.ADDONS.items():
+        if data.get(f'addon_{addon_key}', False):
+            addons_total += addon_info['prix']
+            addon_details.append((addon_info['nom'], addon_info['prix']))
+            details_lignes.append((f"+ {addon_info['nom']}", addon_info['prix']))
+
+    sous_total = prix_base + addons_total
+    taxes = _legacy_taxes(sous_total)
+
+    return {
+        'prix_base': prix_base,
+        'description_prix': description_prix,
+        'details_lignes': details_lignes,
+        'addons_total': addons_total,
+        'addon_details': addon_details,
+        'sous_total': sous_total,
+        'tps': taxes['tps'],
+        'tvq': taxes['tvq'],
+        'total': taxes['total'],
+        'type_service': type_service,
+        'heures': heures,
+        'nb_personnes': nb_personnes,
+    }
+
+
+# ============================================================
+# COMPARAISON
+# ============================================================
+
+def combinations():
+    """Soumissions à comparer (les champs absents ne sont pas envoyés, comme depuis le formulaire)"""
+    for type_service, heures, personnes, contrat, forfait in product(TYPES, HEURES, PERSONNES, CONTRATS, FORFAITS):
+        # Contrat et forfait n'influencent que leur propre type: valeur neutre ailleurs
+        if (contrat is not None and type_service != 'Contrat corporatif') or \
+                (forfait is not None and type_service != 'Forfait récurrent'):
+            continue
+        for flags in product((False, True), repeat=len(ADDONS)):
+            data = {'type_service': type_service}
+            for field, value in (('nombre_heures', heures), ('nombre_personnes', personnes),
+                                 ('type_contrat', contrat), ('forfait_recurrent', forfait)):
+                if value is not None:
+                    data[field] = value
+            data.update((field, True) for field, flag in zip(ADDONS, flags) if flag)
+            yield data
+
+
+def compare(show_all=False):
+    """
+    Returns:
+        tuple: (combinaisons comparées, liste des écarts (data, ancien, moteur))
+    """
+    tables = pricing_engine.compile_rate_card(Config)
+    checked, diffs = 0, []
+    for data in combinations():
+        expected = repr(legacy_totals(data))
+        totals = pricing_engine.calculate_totals(data, tables)
+        totals.pop('pricing_version')
+        # Lignes en tuples dans le moteur (partagées par le cache), en listes dans l'ancien calcul
+        totals.update(details_lignes=list(totals['details_lignes']), addon_details=list(totals['addon_details']))
+        checked += 1
+        if repr(totals) != expected:
+            diffs.append((data, expected, repr(totals)))
+            if not show_all:
+                break
+    return checked, diffs
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Parité du moteur de tarification avec l\'ancien calcul')
+    arg_parser.add_argument('--all', action='store_true', help='Continuer après le premier écart')
+    args = arg_parser.parse_args()
+
+    started = time.perf_counter()
+    checked, diffs = compare(args.all)
+    for data, expected, actual in diffs:
+        print(f"ÉCART {data}\n  ancien: {expected}\n  moteur: {actual}", file=sys.stderr)
+    print(f"{checked} combinaisons, {len(diffs)} écart(s) en {time.perf_counter() - started:.1f} s")
+    sys.exit(1 if diffs else 0)
@@ -0,0 +1,116 @@
+"""
+BIEN CHEZ SOI - Vérification locale du report des montants vers Notion (sans appel API)
+
+Remplace notion_service.notion par un client local dont pages.update répond
+comme l'API Notion (APIResponseError avec son code), puis vérifie que
+what_if_repricing.write_back réessaie sur 'rate_limited' seulement, que
+update_soumission_prix expose le code d'erreur, et que les Contrat corporatif /
+Forfait récurrent sans contrat ni forfait sont écartés du rapport et du report.
+
+Usage (depuis la racine du projet):
+    python -m benchmarks.repricing_check
+"""
+
+import json
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import httpx
+from notion_client import APIResponseError
+
+import notion_service
+import what_if_repricing
+from config import Config
+
+TOTALS = {'prix_base': 180.0, 'sous_total': 180.0, 'tps': 9.0, 'tvq': 17.96, 'total': 206.96}
+MESSAGES = {  # textes de l'API: le code n'y apparaît pas
+    'rate_limited': 'You have been rate limited. Please try again in a few minutes.',
+    'validation_error': 'body failed validation: body.properties.Total.number should be a number.',
+}
+
+
+def _erreur(status, code):
+    response = httpx.Response(status, request=httpx.Request('PATCH', 'https://api.notion.com/v1/pages/local'))
+    return APIResponseError(response, MESSAGES[code], code)
+
+
+class LocalNotion:
+    """
+    Client de substitution: pages.update lève, pour chaque page, les erreurs
+    prévues dans l'ordre, puis réussit.
+    """
+
+    def __init__(self, erreurs):
+        self.erreurs = {page_id: list(codes) for page_id, codes in erreurs.items()}
+        self.calls = []
+        self.pages = SimpleNamespace(update=self._update)
+
+    def _update(self, page_id, properties):
+        self.calls.append(page_id)
+        codes = self.erreurs.get(page_id)
+        if codes:
+            status, code = codes.pop(0)
+            raise _erreur(status, code)
+        return {'id': page_id}
+
+
+def _row(page_id, type_service='Régulier (sans contrat)', **champs):
+    return {'id': page_id, 'statut': 'Envoyée', 'type_service': type_service, 'nombre_heures': 4,
+            'created': '2026-03-14T10:00:00.000Z', **dict.fromkeys(what_if_repricing.AMOUNT_FIELDS, 0.0),
+            **champs}
+
+
+def _entry(page_id, type_service='Régulier (sans contrat)', **champs):
+    return {'row': _row(page_id, type_service, **champs), 'totals': dict(TOTALS)}
+
+
+def _echec(message):
+    print(f'ÉCHEC: {message}', file=sys.stderr)
+    return 1
+
+
+def main():
+    limite = (429, 'rate_limited')
+    client = LocalNotion({
+        'limitee': [limite, limite],                          # réussit à la 3e tentative
+        'saturee': [limite] * (what_if_repricing.MAX_RETRIES + 1),
+        'invalide': [(400, 'validation_error'), limite],      # pas de nouvel essai
+    })
+    notion_service.notion = client
+
+    result = notion_service.update_soumission_prix('invalide', TOTALS)
+    if result.get('code') != 'validation_error' or result['success']:
+        return _echec(f'code non exposé: {result}')
+    client.erreurs['invalide'] = [(400, 'validation_error')]
+    client.calls.clear()
+
+    entries = [_entry(p) for p in ('ok', 'limitee', 'saturee', 'invalide')]
+    entries += [_entry('contrat', 'Contrat corporatif'), _entry('forfait', 'Forfait récurrent')]
+    summary = what_if_repricing.write_back(entries, rate=1000)
+    attendu = ['ok'] + ['limitee'] * 3 + ['saturee'] * (what_if_repricing.MAX_RETRIES + 1) + ['invalide']
+    if client.calls != attendu:
+        return _echec(f'appels pages.update: {client.calls}')
+    if summary['updated'] != 2 or summary['non_recalculables'] != 2 or \
+            [e['id'] for e in summary['errors']] != ['saturee', 'invalide']:
+        return _echec(f'résumé inattendu: {summary}')
+
+    # Rapport: seules les soumissions recalculables entrent dans les écarts
+    mirror = os.path.join(tempfile.mkdtemp(prefix='bcs-repricing-'), 'soumissions.jsonl')
+    rows = [_row('regulier', total=206.96), _row('contrat', 'Contrat corporatif', total=206.96),
+            _row('forfait', 'Forfait récurrent', total=206.96),
+            _row('forfait-connu', 'Forfait récurrent', forfait_recurrent='Essentiel', total=206.96)]
+    what_if_repricing.save_mirror(rows, mirror)
+    report = what_if_repricing.run(Config.RATE_CARD_PATH, mirror=mirror)['report']
+    if report['global']['count'] != 2 or report['non_recalculables'] != \
+            {'count': 2, 'par_type': {'Contrat corporatif': 1, 'Forfait récurrent': 1}}:
+        return _echec(f"rapport: {json.dumps(report, ensure_ascii=False)}")
+
+    print(f"OK: {len(client.calls)} appels, nouvel essai sur rate_limited seulement ({summary['updated']} mis à jour), "
+          f"{report['non_recalculables']['count']} soumissions non recalculables écartées")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+"""
+BIEN CHEZ SOI - Micro-benchmarks avec budgets de régression
+
+Mesure ops/s et allocations (pic tracemalloc par opération) des chemins
+critiques sur le corpus de benchmarks/fixtures.py, puis compare à
+benchmarks/baseline.json. Code de sortie 1 si un chemin régresse au-delà
+de son budget.
+
+Usage (depuis la racine du projet):
+    python -m benchmarks.run                    # mesure + comparaison
+    python -m benchmarks.run --only pdf         # filtre sur le nom
+    python -m benchmarks.run --update-baseline  # enregistre la référence
+    python -m benchmarks.run --rounds 9         # plus de séries si la machine est chargée
+
+Chaque chemin est mesuré en ROUNDS séries et la médiane est retenue: sur une
+machine partagée, une série isolée s'écarte jusqu'à 35% de la référence, la
+médiane de 5 reste sous 20% (au-delà de 25% pour les rendus PDF, qui écrivent
+sur disque: budget propre dans baseline.json, clé 'budget'). La référence
+dépend de la machine: la régénérer sur la machine de CI.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import ai_parser
+import email_service
+import pricing_engine
+from benchmarks import fixtures
+from pdf_generator import generate_soumission_pdf
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+OUTPUT_PATH = Path(__file__).resolve().parent.parent / 'bench_output.txt'
+DEFAULT_BUDGET = 0.30   # régression tolérée: -30% ops/s, +30% allocations
+ALLOC_SLACK = 256       # octets/op ignorés (bruit de tracemalloc)
+MIN_TIME = 0.1          # secondes minimum par mesure
+REPEAT = 9              # meilleure de REPEAT mesures (robuste aux interférences)
+ROUNDS = 5              # séries par chemin, médiane retenue
+
+
+def _benchmarks():
+    """{nom: (fonction exécutant une passe sur le corpus, opérations par passe)}"""
+    soumissions = fixtures.soumissions()
+    totals = [pricing_engine.calculate_totals(d) for d in soumissions]
+    tables = pricing_engine.current_tables()
+    groupes = [(t, n) for t in pricing_engine.TYPES_GROUPE for n in range(1, 26)]
+    sous_totaux = [t['sous_total'] for t in totals]
+    responses = fixtures.model_responses()
+    emails = [(d, t) for d, t in zip(soumissions, totals)]
+    pdfs = [(d, pricing_engine.calculate_totals(d)) for d in fixtures.pdf_soumissions()]
+    pdf_path = os.path.join(tempfile.mkdtemp(prefix='bcs-bench-'), 'bench.pdf')
+
+    # Chaque passe garde ses résultats: le pic tracemalloc / op = octets alloués par op
+    def calculate_totals():
+        return [pricing_engine.calculate_totals(data) for data in soumissions]
+
+    def calculate_totals_uncached():
+        return [pricing_engine._compute_totals(data, tables) for data in soumissions]
+
+    def prix_groupe():
+        return [pricing_engine._prix_groupe(tables, None, t, 4, n) for t, n in groupes]
+
+    def taxes():
+        return [tables.taxes(sous_total) for sous_total in sous_totaux]
+
+    def parse_response():
+        return [ai_parser.parse_response_text(text, transcription) for text, transcription in responses]
+
+    def email_fr():
+        return [email_service._build_email_fr(data, t, data['numero']) for data, t in emails]
+
+    def email_en():
+        return [email_service._build_email_en(data, t, data['numero']) for data, t in emails]
+
+    def pdf():
+        return [generate_soumission_pdf(data, pdf_path, totals=t, renderer='canvas') for data, t in pdfs]
+
+    def pdf_platypus():
+        return [generate_soumission_pdf(data, pdf_path, totals=t, renderer='platypus') for data, t in pdfs]
+
+    return {
+        'calculate_totals': (calculate_totals, len(soumissions)),
+        'calculate_totals_uncached': (calculate_totals_uncached, len(soumissions)),
+        'prix_groupe': (prix_groupe, len(groupes)),
+        'taxes': (taxes, len(sous_totaux)),
+        'parse_response_text': (parse_response, len(responses)),
+        'build_email_fr': (email_fr, len(emails)),
+        'build_email_en': (email_en, len(emails)),
+        'generate_soumission_pdf': (pdf, len(pdfs)),
+        'generate_soumission_pdf_platypus': (pdf_platypus, len(pdfs)),
+    }
+
+
+def _calibration():
+    """Charge Python pure de référence: les débits sont aussi exprimés relativement à elle"""
+    table = {i: str(i) for i in range(200)}
+    return [len(table[i % 200]) + round(i * 0.05, 2) for i in range(2000)]
+
+
+def measure(run_pass, ops):
+    """
+    Returns:
+        dict: {'ops_sec': meilleur débit sur REPEAT mesures, 'alloc_bytes_op': pic tracemalloc par opération}
+    """
+    run_pass()  # préchauffage (caches, imports paresseux)
+
+    passes = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(passes):
+            run_pass()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_TIME:
+            break
+        passes *= 2
+
+    best = elapsed
+    for _ in range(REPEAT - 1):
+        started = time.perf_counter()
+        for _ in range(passes):
+            run_pass()
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    run_pass()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ops_sec': round(passes * ops / best, 1),
+        'alloc_bytes_op': round(peak / ops),
+    }
+
+
+def measure_rounds(run_pass, ops, rounds):
+    """
+    Médiane de `rounds` séries; chaque série est calibrée juste avant la mesure
+    (relative = ops/s du chemin / ops/s de la charge de référence).
+    """
+    series = []
+    for _ in range(rounds):
+        calibration = measure(_calibration, 1)['ops_sec']
+        result = measure(run_pass, ops)
+        result['relative'] = round(result['ops_sec'] / calibration, 6)
+        series.append(result)
+    series.sort(key=lambda r: r['relative'])
+    return series[len(series) // 2]
+
+
+def compare(name, result, baseline):
+    """
+    Liste des dépassements de budget pour un chemin (vide si OK ou sans référence).
+    Le débit est comparé relativement à la calibration, ce qui absorbe la
+    vitesse de la machine et une partie du bruit.
+    """
+    ref = baseline.get(name)
+    if not ref:
+        return []
+    budget = ref.get('budget', DEFAULT_BUDGET)
+    problems = []
+    if result['relative'] < ref['relative'] * (1 - budget):
+        problems.append(f"{name}: {result['ops_sec']:.0f} ops/s, {_ratio(result, ref):.2f}x la référence "
+                        f"(calibrée; -{budget:.0%} max)")
+    if result['alloc_bytes_op'] > ref['alloc_bytes_op'] * (1 + budget) + ALLOC_SLACK:
+        problems.append(f"{name}: {result['alloc_bytes_op']} o/op > référence {ref['alloc_bytes_op']} (+{budget:.0%} max)")
+    return problems
+
+
+def _ratio(result, ref):
+    return result['relative'] / ref['relative']
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Micro-benchmarks BCS')
+    arg_parser.add_argument('--only', help='Ne mesurer que les chemins dont le nom contient ce texte')
+    arg_parser.add_argument('--update-baseline', action='store_true', help='Enregistrer les mesures comme référence')
+    arg_parser.add_argument('--rounds', type=int,
+                            default=ROUNDS, help=f'Séries de mesures par chemin, médiane retenue (défaut: {ROUNDS})')
+    args = arg_parser.parse_args()
+
+    baseline = json.loads(BASELINE_PATH.read_text(encoding='utf-8')) if BASELINE_PATH.exists() else {}
+
+    results, problems, lines = {}, [], []
+    lines.append(f"{'chemin':<34} {'ops/s':>12} {'o/op (pic)':>12} {'vs réf.':>9}")
+    for name, (run_pass, ops) in _benchmarks().items():
+        if args.only and args.only not in name:
+            continue
+        result = results[name] = measure_rounds(run_pass, ops, args.rounds)
+        ref = baseline.get(name)
+        ratio = f"{_ratio(result, ref):.2f}x" if ref else '—'
+        lines.append(f"{name:<34} {result['ops_sec']:>12.1f} {result['alloc_bytes_op']:>12} {ratio:>9}")
+        problems += compare(name, result, baseline)
+        print('\n'.join(lines[-2:]) if len(lines) == 2 else lines[-1], flush=True)
+
+    if args.update_baseline:
+        for name, result in results.items():
+            budget = baseline.get(name, {}).get('budget')
+            baseline[name] = {**result, **({'budget': budget} if budget is not None else {})}
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+        lines.append(f"Référence mise à jour: {BASELINE_PATH}")
+        problems = []
+    elif problems:
+        lines.append('RÉGRESSIONS:')
+        lines += [f'  {p}' for p in problems]
+    else:
+        lines.append('OK: aucun chemin au-delà de son budget')
+
+    print('\n'.join(lines[len(results) + 1:]))
+    OUTPUT_PATH.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,7 +4,8 @@ Variables d'environnement, tarification complète et constantes
 """
 
 import os
-import math
+import json
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -31,6 +32,11 @@ if _env_path.exists():
     except Exception:
         pass
 
+# Grille tarifaire (données, pas de code): chemin configurable par RATE_CARD_PATH
+_rate_card_path = os.getenv('RATE_CARD_PATH') or str(_project_dir / 'rate_card.json')
+with open(_rate_card_path, 'r', encoding='utf-8') as f:
+    _RATE_CARD = json.load(f)
+
 
 class Config:
     # ============================================================
@@ -50,6 +56,26 @@ class Config:
     SMTP_USER = os.getenv('SMTP_USER')
     SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
 
+    # ============================================================
+    # IA — PARSER CLAUDE
+    # ============================================================
+    PARSER_MODEL = os.getenv('PARSER_MODEL', 'claude-sonnet-4-20250514')
+    # Modèle rapide pour les demandes courtes/simples (vide = toujours PARSER_MODEL)
+    PARSER_MODEL_FAST = os.getenv('PARSER_MODEL_FAST', 'claude-3-5-haiku-20241022')
+    PARSER_FAST_MAX_WORDS = int(os.getenv('PARSER_FAST_MAX_WORDS', 40))
+    # Prompt caching : le prompt système (fixe par version de grille) est envoyé comme préfixe cacheable
+    PARSER_PROMPT_CACHE = os.getenv('PARSER_PROMPT_CACHE', '1') != '0'
+
+    # ============================================================
+    # POOL HTTP (OpenAI, Anthropic, Notion)
+    # ============================================================
+    HTTP_POOL_MAX_CONNECTIONS = int(os.getenv('HTTP_POOL_MAX_CONNECTIONS', 20))
+    HTTP_POOL_MAX_KEEPALIVE = int(os.getenv('HTTP_POOL_MAX_KEEPALIVE', 10))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv('HTTP_KEEPALIVE_EXPIRY', 60))
+    HTTP_HTTP2 = os.getenv('HTTP_HTTP2', '1') != '0'
+    # Préchauffer les connexions au démarrage de chaque worker
+    HTTP_WARMUP = os.getenv('HTTP_WARMUP', '1') != '0'
+
     # ============================================================
     # BIEN CHEZ SOI — Informations entreprise
     # ============================================================
@@ -62,63 +88,77 @@ class Config:
     BCS_WEBSITE = os.getenv('BCS_WEBSITE', 'www.bienchezsoi.ca')
 
     # ============================================================
-    # TAXES QUÉBEC
+    # PDF — rendu des soumissions
     # ============================================================
-    TPS_RATE = 0.05
-    TVQ_RATE = 0.09975
+    # 'canvas': mise en page fixe dessinée directement (platypus si le contenu déborde)
+    # 'platypus': mise en page complète reportlab
+    PDF_RENDERER = os.getenv('PDF_RENDERER', 'canvas')
+    # Pool de processus de rendu, par worker web (0 = rendu dans le thread de la requête)
+    PDF_POOL_WORKERS = int(os.getenv('PDF_POOL_WORKERS', 2))
+    # Rendus en attente acceptés en plus des processus occupés (au-delà: 503)
+    PDF_POOL_QUEUE = int(os.getenv('PDF_POOL_QUEUE', 4))
+    # Délai maximal d'un rendu en secondes, attente comprise (au-delà: 504)
+    PDF_RENDER_TIMEOUT = float(os.getenv('PDF_RENDER_TIMEOUT', 20))
+    # Cache des PDF rendus, partagé par les workers (clé: empreinte du document)
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'bcs-pdf-cache'))
+    PDF_CACHE_MAX_MB = float(os.getenv('PDF_CACHE_MAX_MB', 200))
+    # Durée de vie d'un PDF non relu, en secondes (comme les sessions: 1 h)
+    PDF_CACHE_TTL = int(os.getenv('PDF_CACHE_TTL', 3600))
+    # Rendu spéculatif du PDF en arrière-plan à chaque création/modification de session (0 pour désactiver)
+    PDF_PRERENDER = os.getenv('PDF_PRERENDER', '1').lower() not in ('0', 'false', 'no')
+    # Rendus simultanés d'un export en lot (/api/export), pris sur le pool PDF
+    PDF_EXPORT_CONCURRENCY = int(os.getenv('PDF_EXPORT_CONCURRENCY', 2))
+    # Soumissions individuelles d'un service partagé (PDF + courriel) préparées en parallèle
+    FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', 4))
+    # Signature du client: taille maximale reçue (base64 décodé) et en pixels (au-delà: 413)
+    SIGNATURE_MAX_KB = int(os.getenv('SIGNATURE_MAX_KB', 512))
+    SIGNATURE_MAX_PIXELS = int(os.getenv('SIGNATURE_MAX_PIXELS', 4_000_000))
+    # Résolution de la signature intégrée au PDF (cadre de 3 po x 1 po)
+    SIGNATURE_DPI = int(os.getenv('SIGNATURE_DPI', 150))
 
     # ============================================================
-    # TARIFICATION — Prix affiché : 50 $/h
+    # GRILLE TARIFAIRE — rate_card.json (rechargée à chaud par pricing_engine)
+    # Les valeurs ci-dessous sont celles du démarrage; la grille active
+    # (et sa version) s'obtient avec pricing_engine.current_tables().
     # ============================================================
+    RATE_CARD_PATH = _rate_card_path
+    # Intervalle minimal (s) entre deux vérifications de la date du fichier
+    RATE_CARD_CHECK_INTERVAL = float(os.getenv('RATE_CARD_CHECK_INTERVAL', 5))
 
-    # --- Régulier sans contrat (un seul payeur) ---
-    TARIF_REGULIER = {
-        "1h": {"heures": 1, "prix": 65.00, "taux_effectif": 65.00},
-        "2h": {"heures": 2, "prix": 120.00, "taux_effectif": 60.00},
-        "3h": {"heures": 3, "prix": 150.00, "taux_effectif": 50.00},
-        "4h": {"heures": 4, "prix": 180.00, "taux_effectif": 45.00},
-    }
-    # 4h+ : 180$ + 45$/h additionnel
-    TARIF_BASE_4H = 180.00
-    TARIF_HEURE_ADDITIONNEL = 45.00
-    TARIF_AFFICHE = 50.00  # prix marché
+    # --- Taxes Québec ---
+    TPS_RATE = _RATE_CARD['TPS_RATE']
+    TVQ_RATE = _RATE_CARD['TVQ_RATE']
+
+    # --- Régulier sans contrat (un seul payeur); 4h+ : base 4h + tarif additionnel ---
+    TARIF_REGULIER = _RATE_CARD['TARIF_REGULIER']
+    TARIF_BASE_4H = _RATE_CARD['TARIF_BASE_4H']
+    TARIF_HEURE_ADDITIONNEL = _RATE_CARD['TARIF_HEURE_ADDITIONNEL']
+    TARIF_AFFICHE = _RATE_CARD['TARIF_AFFICHE']  # prix marché
 
     # --- Services à la carte (Animation & Compagnie) ---
-    # Base 50$/h, minimum 2h par visite
-    SERVICES_CARTE = {
-        "Visite de compagnie": {"duree_min": 2, "tarif": 100.00},
-        "Bingo / jeux de société / activités cognitives": {"duree_min": 2, "tarif": 100.00},
-        "Promenade / sortie divertissement": {"duree_min": 2, "tarif": 100.00},
-        "Animation thématique": {"duree_min": 2, "tarif": 100.00},
-        "Accompagnement événement / sortie spéciale": {"duree_min": 3, "tarif": 150.00},
-    }
+    SERVICES_CARTE = _RATE_CARD['SERVICES_CARTE']
 
     # --- Forfaits groupe RPA (Soins & Animation) ---
-    GROUPE_TAUX_HORAIRE = 50.00
-    GROUPE_BASE_HEURES = 4
-    GROUPE_BASE_PRIX = 200.00
-    GROUPE_MIN_PERSONNES = 5
-    GROUPE_MAX_PERSONNES = 20
+    GROUPE_TAUX_HORAIRE = _RATE_CARD['GROUPE_TAUX_HORAIRE']
+    GROUPE_BASE_HEURES = _RATE_CARD['GROUPE_BASE_HEURES']
+    GROUPE_BASE_PRIX = _RATE_CARD['GROUPE_BASE_PRIX']
+    GROUPE_MIN_PERSONNES = _RATE_CARD['GROUPE_MIN_PERSONNES']
+    GROUPE_MAX_PERSONNES = _RATE_CARD['GROUPE_MAX_PERSONNES']
 
     # --- Service partagé voisins RPA ---
-    PARTAGE_BLOC_HEURES = 4
-    PARTAGE_BLOC_PRIX = 200.00
-    PARTAGE_MAX_VOISINS = 4
-    PARTAGE_MIN_VOISINS = 2
+    PARTAGE_BLOC_HEURES = _RATE_CARD['PARTAGE_BLOC_HEURES']
+    PARTAGE_BLOC_PRIX = _RATE_CARD['PARTAGE_BLOC_PRIX']
+    PARTAGE_MAX_VOISINS = _RATE_CARD['PARTAGE_MAX_VOISINS']
+    PARTAGE_MIN_VOISINS = _RATE_CARD['PARTAGE_MIN_VOISINS']
 
     # --- Contrats corporatifs ---
-    CONTRATS = {
-        "hebdomadaire": {"min_heures_sem": 4, "taux": 45.00, "total_min": 180.00},
-        "mensuel": {"min_heures_mois": 16, "taux": 43.00, "total_min": 688.00},
-        "annuel": {"min_heures_mois": 16, "taux": 40.00, "total_annuel": 7680.00},
-    }
+    CONTRATS = _RATE_CARD['CONTRATS']
 
     # --- Forfaits récurrents individuels (mensuel) ---
-    FORFAITS_RECURRENTS = {
-        "Essentiel": {"frequence": "1x/semaine", "heures_mois": 8, "prix_mois": 360.00, "taux": 45.00},
-        "Confort": {"frequence": "2x/semaine", "heures_mois": 16, "prix_mois": 680.00, "taux": 42.50},
-        "Premium": {"frequence": "3x/semaine", "heures_mois": 24, "prix_mois": 960.00, "taux": 40.00},
-    }
+    FORFAITS_RECURRENTS = _RATE_CARD['FORFAITS_RECURRENTS']
+
+    # --- Add-ons / suppléments ---
+    ADDONS = _RATE_CARD['ADDONS']
 
     # ============================================================
     # CATÉGORIES DE SERVICES
@@ -149,17 +189,6 @@ class Config:
         "Forfait récurrent",
     ]
 
-    # ============================================================
-    # ADD-ONS / SUPPLÉMENTS
-    # ============================================================
-    ADDONS = {
-        "urgence": {"nom": "Urgence même jour", "prix": 15.00},
-        "hors_horaire": {"nom": "Hors horaire (avant 7h / après 20h)", "prix": 10.00},
-        "fin_semaine": {"nom": "Fin de semaine / jour férié", "prix": 10.00},
-        "deplacement_extra": {"nom": "Déplacement hors zone", "prix": 15.00},
-        "materiel": {"nom": "Matériel / fournitures spéciales", "prix": 10.00},
-    }
-
     # ============================================================
     # STATUTS SOUMISSION
     # ============================================================
@@ -237,92 +266,3 @@ class Config:
             "history_title": "History",
         },
     }
-
-
-# ============================================================
-# FONCTIONS DE CALCUL DE PRIX
-# ============================================================
-
-def calculer_prix_regulier(heures):
-    """
-    Calcule le prix pour un service régulier sans contrat (1 seul payeur).
-    1h=65$, 2h=120$, 3h=150$, 4h+=180$ + 45$/h additionnel
-    """
-    heures = max(1, heures)
-    if heures <= 1:
-        return 65.00
-    elif heures <= 2:
-        return 120.00
-    elif heures <= 3:
-        return 150.00
-    elif heures <= 4:
-        return 180.00
-    else:
-        heures_extra = heures - 4
-        return 180.00 + (heures_extra * 45.00)
-
-
-def calculer_prix_groupe(nb_personnes, type_groupe="soins"):
-    """
-    Calcule le prix pour un forfait groupe RPA.
-    Formule: heures = 0.4 × nb_personnes + 2 (arrondi à la demi-heure)
-    Taux: 50$/h, base 4h = 200$
-    """
-    nb_personnes = max(Config.GROUPE_MIN_PERSONNES, min(nb_personnes, Config.GROUPE_MAX_PERSONNES))
-
-    # Formule : heures = 0.4 * personnes + 2
-    heures_brut = 0.4 * nb_personnes + 2
-    # Arrondi à la demi-heure supérieure
-    heures = math.ceil(heures_brut * 2) / 2
-    heures = max(heures, Config.GROUPE_BASE_HEURES)
-
-    prix_total = heures * Config.GROUPE_TAUX_HORAIRE
-    prix_par_personne = prix_total / nb_personnes
-
-    return {
-        "heures": heures,
-        "prix_total": prix_total,
-        "prix_par_personne": round(prix_par_personne, 2),
-        "nb_personnes": nb_personnes,
-        "taux_horaire": Config.GROUPE_TAUX_HORAIRE,
-    }
-
-
-def calculer_prix_partage(nb_voisins=4):
-    """
-    Service partagé entre voisins RPA.
-    Bloc 4h = 200$ ÷ nb_voisins
-    Toujours 50$/h, jamais 45$/h.
-    """
-    nb_voisins = max(Config.PARTAGE_MIN_VOISINS, min(nb_voisins, Config.PARTAGE_MAX_VOISINS))
-    cout_par_voisin = Config.PARTAGE_BLOC_PRIX / nb_voisins
-    heures_par_voisin = Config.PARTAGE_BLOC_HEURES / nb_voisins
-
-    return {
-        "prix_total": Config.PARTAGE_BLOC_PRIX,
-        "nb_voisins": nb_voisins,
-        "cout_par_voisin": round(cout_par_voisin, 2),
-        "heures_par_voisin": round(heures_par_voisin, 2),
-        "taux_horaire": Config.GROUPE_TAUX_HORAIRE,
-    }
-
-
-def calculer_prix_contrat(type_contrat="hebdomadaire"):
-    """
-    Prix pour contrat corporatif.
-    Hebdo=45$/h, Mensuel=43$/h, Annuel=40$/h
-    """
-    contrat = Config.CONTRATS.get(type_contrat, Config.CONTRATS["hebdomadaire"])
-    return contrat
-
-
-def calculer_taxes(sous_total):
-    """Calcule TPS + TVQ sur un sous-total"""
-    tps = sous_total * Config.TPS_RATE
-    tvq = sous_total * Config.TVQ_RATE
-    return {
-        "sous_total": sous_total,
-        "tps": round(tps, 2),
-        "tvq": round(tvq, 2),
-        "total": round(sous_total + tps + tvq, 2),
-    }
@@ -0,0 +1,23 @@
+"""
+BIEN CHEZ SOI - Configuration gunicorn
+Chargée automatiquement par gunicorn depuis le dossier courant.
+"""
+
+from config import Config
+
+
+def post_worker_init(worker):
+    """Préchauffe le pool HTTP partagé et le pool de rendu PDF dès le démarrage du worker"""
+    from pdf_pool import warm_up as warm_up_pdf
+    worker.log.info(f"Pool PDF: {warm_up_pdf()}")
+
+    if not Config.HTTP_WARMUP:
+        return
+    from http_pool import warm_up
+    worker.log.info(f"Préchauffage HTTP: {warm_up()}")
+
+
+def worker_exit(server, worker):
+    """Arrête les processus de rendu PDF du worker"""
+    from pdf_pool import shutdown
+    shutdown()
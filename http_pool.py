@@ -0,0 +1,85 @@
+"""
+BIEN CHEZ SOI - Pool de connexions HTTP partagé
+Un seul transport httpx (keep-alive, HTTP/2 si disponible) pour les clients
+OpenAI, Anthropic et Notion, et un préchauffage optionnel au démarrage du worker.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from config import Config
+
+try:
+    import h2  # noqa: F401  (HTTP/2 nécessite le paquet h2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Hôtes des fournisseurs à préchauffer (DNS + TCP + TLS)
+PROVIDER_URLS = {
+    'openai': 'https://api.openai.com/v1/',
+    'anthropic': 'https://api.anthropic.com/v1/',
+    'notion': 'https://api.notion.com/v1/',
+}
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Transport partagé (créé au premier appel): un seul pool de connexions par worker"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = httpx.HTTPTransport(
+                http2=Config.HTTP_HTTP2 and HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=Config.HTTP_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=Config.HTTP_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return _transport
+
+
+def make_client(timeout=60.0):
+    """
+    Client httpx adossé au transport partagé.
+    Chaque SDK reçoit son propre client (Notion modifie base_url et en-têtes),
+    mais les connexions sont mises en commun.
+    """
+    return httpx.Client(transport=get_transport(), timeout=timeout)
+
+
+def warm_up(providers=None, timeout=5.0):
+    """
+    Ouvre une connexion keep-alive vers chaque fournisseur configuré pour que
+    la première soumission ne paie pas DNS/TCP/TLS. Les erreurs sont ignorées.
+
+    Returns:
+        dict: {fournisseur: durée en ms ou message d'erreur}
+    """
+    if providers is None:
+        providers = [
+            name for name, configured in (
+                ('openai', Config.OPENAI_API_KEY),
+                ('anthropic', Config.ANTHROPIC_API_KEY),
+                ('notion', Config.NOTION_API_KEY),
+            ) if configured
+        ]
+    if not providers:
+        return {}
+
+    client = make_client(timeout=timeout)
+
+    def _ping(name):
+        try:
+            response = client.head(PROVIDER_URLS[name])
+            return name, round(response.elapsed.total_seconds() * 1000, 1)
+        except Exception as e:
+            return name, str(e)
+
+    with ThreadPoolExecutor(max_workers=len(providers)) as executor:
+        return dict(executor.map(_ping, providers))
@@ -3,14 +3,15 @@ BIEN CHEZ SOI - Intégration Notion
 Adapté au schéma BCS pour bases SOUMISSIONS et CONTACTS
 """
 
-from notion_client import Client
+from notion_client import APIResponseError, Client
 from config import Config
+from http_pool import make_client
 from datetime import datetime
 
-# Initialisation conditionnelle
+# Initialisation conditionnelle (connexions partagées via http_pool)
 notion = None
 if Config.NOTION_API_KEY:
-    notion = Client(auth=Config.NOTION_API_KEY)
+    notion = Client(auth=Config.NOTION_API_KEY, client=make_client())
 
 
 def create_soumission(data, totals, pdf_path=None):
@@ -315,6 +316,108 @@ def search_soumissions(query):
         return []
 
 
+def iter_soumissions(statuts=None, page_size=100, client=None, date_debut=None, date_fin=None):
+    """
+    Parcourt toute la base SOUMISSIONS (pagination Notion).
+    Le type de contrat et le forfait ne sont pas stockés dans Notion: ils
+    restent à None, et les montants des Contrat corporatif / Forfait récurrent
+    ne peuvent pas être recalculés (voir what_if_repricing.recalculable).
+
+    Args:
+        statuts: Liste de statuts à inclure (None = tous)
+        client: Texte recherché dans le titre ("BCS-... — Nom Client") (optionnel)
+        date_debut, date_fin: Bornes incluses de la date de création, AAAA-MM-JJ (optionnel)
+
+    Yields:
+        dict: Champs de tarification, champs affichés dans le PDF, montants
+              enregistrés, statut et date de création
+    """
+    if not notion or not Config.NOTION_SOUMISSIONS_DB:
+        return
+
+    query = {
+        'database_id': Config.NOTION_SOUMISSIONS_DB,
+        'sorts': [{"timestamp": "created_time", "direction": "ascending"}],
+        'page_size': page_size,
+    }
+    conditions = []
+    if statuts:
+        filters = [{"property": "Statut", "select": {"equals": statut}} for statut in statuts]
+        conditions.append({"or": filters} if len(filters) > 1 else filters[0])
+    if client:
+        conditions.append({"property": "Titre", "title": {"contains": client}})
+    if date_debut:
+        conditions.append({"timestamp": "created_time", "created_time": {"on_or_after": date_debut}})
+    if date_fin:
+        conditions.append({"timestamp": "created_time", "created_time": {"on_or_before": date_fin}})
+    if conditions:
+        query['filter'] = {"and": conditions} if len(conditions) > 1 else conditions[0]
+
+    cursor = None
+    while True:
+        response = notion.databases.query(**query, **({'start_cursor': cursor} if cursor else {}))
+        for page in response['results']:
+            props = page['properties']
+            yield {
+                'id': page['id'],
+                'titre': _get_title(props.get('Titre')),
+                'statut': _get_select(props.get('Statut')),
+                'created': page.get('created_time', ''),
+                'type_service': _get_select(props.get('Type service')) or None,
+                'nombre_heures': _get_number(props.get('Nombre heures')),
+                'nombre_personnes': _get_number(props.get('Nombre personnes')),
+                'forfait_recurrent': None,
+                'type_contrat': None,
+                'addon_urgence': _get_checkbox(props.get('Add-on urgence')),
+                'addon_hors_horaire': _get_checkbox(props.get('Add-on hors horaire')),
+                'addon_fin_semaine': _get_checkbox(props.get('Add-on fin semaine')),
+                'addon_deplacement_extra': _get_checkbox(props.get('Add-on déplacement')),
+                'addon_materiel': _get_checkbox(props.get('Add-on matériel')),
+                'description_service': _get_rich_text(props.get('Description service')),
+                'adresse_service': _get_rich_text(props.get('Adresse service')),
+                'categorie': _get_select(props.get('Catégorie')),
+                'langue_client': _get_select(props.get('Langue')) or 'fr',
+                'prix_base': _get_number(props.get('Prix base')),
+                'sous_total': _get_number(props.get('Sous-total')),
+                'tps': _get_number(props.get('TPS')),
+                'tvq': _get_number(props.get('TVQ')),
+                'total': _get_number(props.get('Total')),
+            }
+        if not response.get('has_more'):
+            return
+        cursor = response['next_cursor']
+
+
+def update_soumission_prix(page_id, totals):
+    """
+    Met à jour les montants (Prix base, Sous-total, TPS, TVQ, Total) d'une soumission.
+
+    Returns:
+        dict: {'success': True} ou {'success': False, 'error': str, 'code': code d'erreur Notion si connu}
+    """
+    if not notion:
+        return {'success': False, 'error': 'Notion non configuré'}
+
+    try:
+        properties = {
+            name: {"number": totals[key]}
+            for name, key in (
+                ("Prix base", 'prix_base'),
+                ("Sous-total", 'sous_total'),
+                ("TPS", 'tps'),
+                ("TVQ", 'tvq'),
+                ("Total", 'total'),
+            )
+        }
+        notion.pages.update(page_id=page_id, properties=properties)
+        return {'success': True}
+    except APIResponseError as e:
+        # code Notion (ex. 'rate_limited'): l'appelant décide s'il réessaie
+        return {'success': False, 'error': str(e), 'code': getattr(e.code, 'value', e.code)}
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
 # === Helpers ===
 
 def _get_title(prop):
@@ -333,3 +436,15 @@ def _get_select(prop):
     if not prop or not prop.get('select'):
         return ''
     return prop['select'].get('name', '')
+
+
+def _get_number(prop):
+    if not prop:
+        return None
+    return prop.get('number')
+
+
+def _get_checkbox(prop):
+    if not prop:
+        return False
+    return bool(prop.get('checkbox'))
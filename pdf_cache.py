@@ -0,0 +1,255 @@
+"""
+BIEN CHEZ SOI - Cache des PDF rendus
+Chaque PDF est rangé sous l'empreinte de son document (pdf_generator.document_key:
+contenu affiché, signature, version du gabarit). Le cache est un répertoire
+partagé par les workers du serveur: /api/generate-pdf, /api/submit ou un autre
+worker qui a besoin du même document le relisent au lieu de le rendre à nouveau.
+Les demandes simultanées d'un même document dans un worker attendent un seul rendu.
+
+Pour une signature vectorielle, le corps de la soumission (mise en page signée,
+cadre vide) est rangé à part: une autre signature sur le même document y est
+apposée (pdf_stamp) au lieu de refaire le rendu.
+
+Usage (banc d'essai: rendu vs relecture du cache):
+    python pdf_cache.py
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from config import Config
+from pdf_generator import SIGNATURE_RESERVEE, calculate_totals, document_key
+from pdf_pool import render_body, render_pdf
+from pdf_stamp import stamp_signature
+
+_lock = threading.Lock()
+_inflight = {}      # fichier -> Event des rendus en cours dans ce worker
+_stores = [0]
+EVICT_EVERY = 50    # écritures entre deux passes d'éviction
+
+
+def _path(key, ext='.pdf'):
+    return os.path.join(Config.PDF_CACHE_DIR, key + ext)
+
+
+def lookup(key, ext='.pdf'):
+    """Chemin du PDF en cache (et marqué comme récent), None si absent"""
+    path = _path(key, ext)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def store(key, pdf_bytes, ext='.pdf'):
+    """Range un PDF sous son empreinte (écriture atomique) et retourne son chemin"""
+    os.makedirs(Config.PDF_CACHE_DIR, mode=0o700, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=Config.PDF_CACHE_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp, _path(key, ext))
+    except Exception:
+        discard_path(tmp)
+        raise
+
+    with _lock:
+        _stores[0] += 1
+        due = _stores[0] % EVICT_EVERY == 0
+    if due:
+        evict()
+    return _path(key, ext)
+
+
+def discard_path(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def discard(key):
+    """Retire un document du cache (ex. soumission envoyée)"""
+    discard_path(_path(key))
+
+
+def evict():
+    """
+    Supprime les PDF non relus depuis PDF_CACHE_TTL, puis les plus anciens
+    tant que le cache dépasse PDF_CACHE_MAX_MB.
+
+    Returns:
+        int: Nombre de fichiers supprimés
+    """
+    try:
+        entries = []
+        with os.scandir(Config.PDF_CACHE_DIR) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+
+    entries.sort()
+    cutoff = time.time() - Config.PDF_CACHE_TTL
+    budget = Config.PDF_CACHE_MAX_MB * 1024 * 1024
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= budget:
+            break
+        discard_path(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _produire(key, ext, rendre):
+    """
+    Fichier du cache relu, ou produit par rendre() puis rangé. Un seul rendu
+    par fichier à la fois dans le worker: les autres demandes attendent son résultat.
+
+    Returns:
+        dict: {'success': True, 'path': str, 'cached': bool} ou l'erreur de rendre()
+    """
+    path = lookup(key, ext)
+    if path:
+        return {'success': True, 'path': path, 'cached': True}
+
+    with _lock:
+        event = _inflight.get(key + ext)
+        owner = event is None
+        if owner:
+            event = _inflight[key + ext] = threading.Event()
+
+    if not owner:
+        # Même fichier en cours de rendu dans un autre thread: attendre son résultat
+        event.wait(Config.PDF_RENDER_TIMEOUT)
+        path = lookup(key, ext)
+        if path:
+            return {'success': True, 'path': path, 'cached': True}
+
+    try:
+        result = rendre()
+        if not result['success']:
+            return result
+        path = store(key, result['pdf'], ext)
+    finally:
+        if owner:
+            with _lock:
+                _inflight.pop(key + ext, None)
+            event.set()
+    return {'success': True, 'path': path, 'cached': False}
+
+
+def _rendre_corps(data, totals):
+    """Corps à signer, rangé avec la position du cadre (1re ligne JSON, puis le PDF)"""
+    result = render_body(data, totals)
+    if not result['success']:
+        return result
+    entete = json.dumps({'cadre': result['cadre']}).encode() + b'\n'
+    return {'success': True, 'pdf': entete + (result['pdf'] or b'')}
+
+
+def get_body(data, totals):
+    """
+    Corps à signer d'une soumission (mise en page signée, cadre vide), relu du
+    cache ou rendu puis rangé. data doit avoir 'numero' et 'date' (voir get_pdf).
+
+    Returns:
+        dict: {'success': True, 'path': str, 'cached': bool} ou l'erreur de render_body
+    """
+    return _produire(document_key(data, totals, SIGNATURE_RESERVEE), '.corps',
+                     lambda: _rendre_corps(data, totals))
+
+
+def _signer(data, totals, signature):
+    """
+    PDF signé par une signature vectorielle apposée sur le corps en cache.
+
+    Returns:
+        dict: {'success': True, 'pdf': bytes}, l'erreur du rendu du corps,
+              ou None si le document doit être rendu en entier (contenu hors mise en page fixe)
+    """
+    corps = get_body(data, totals)
+    if not corps['success']:
+        return corps
+    with open(corps['path'], 'rb') as f:
+        entete, pdf = f.read().split(b'\n', 1)
+    cadre = json.loads(entete)['cadre']
+    if not cadre:
+        return None
+    return {'success': True, 'pdf': stamp_signature(pdf, cadre, signature)}
+
+
+def get_pdf(data, totals=None, signature=None):
+    """
+    PDF d'une soumission, relu du cache ou rendu (pool de processus) puis rangé.
+    Une signature vectorielle est apposée sur le corps du document déjà rendu.
+
+    Args:
+        data: Données de la soumission (dict); 'numero' et 'date' doivent être
+              fixés par l'appelant pour que le même document garde la même empreinte
+        totals: Totaux déjà calculés (optionnel)
+        signature: Image de la signature en octets ou signature vectorielle (dict, optionnel)
+
+    Returns:
+        dict: {'success': True, 'path': str, 'key': str, 'numero': str, 'cached': bool}
+              ou l'erreur de render_pdf ({'success': False, 'error': str, 'busy'|'timeout': True})
+    """
+    data = dict(data)
+    data.setdefault('numero', f"BCS-{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    data.setdefault('date', datetime.now().strftime('%Y-%m-%d'))
+    totals = totals or calculate_totals(data)
+    key = document_key(data, totals, signature)
+
+    def rendre():
+        if isinstance(signature, dict) and signature['traits'] and Config.PDF_RENDERER == 'canvas':
+            signe = _signer(data, totals, signature)
+            if signe is not None:
+                return signe
+        return render_pdf(data, totals, signature)
+
+    result = _produire(key, '.pdf', rendre)
+    if result['success']:
+        result.update(key=key, numero=data['numero'])
+    return result
+
+
+if __name__ == '__main__':
+    from concurrent.futures import ThreadPoolExecutor
+    from pdf_pool import shutdown
+
+    Config.PDF_CACHE_DIR = tempfile.mkdtemp(prefix='bcs-pdf-cache-')
+    data = {
+        'numero': 'BCS-BANC', 'date': '2026-01-15', 'langue_client': 'fr',
+        'client_nom': 'Marie Tremblay', 'type_service': 'Régulier (sans contrat)',
+        'nombre_heures': 3, 'description_service': 'Accompagnement et préparation du repas',
+    }
+
+    started = time.perf_counter()
+    first = get_pdf(data)
+    rendu = (time.perf_counter() - started) * 1e3
+
+    started = time.perf_counter()
+    for _ in range(100):
+        again = get_pdf(data)
+    relu = (time.perf_counter() - started) * 1e3 / 100
+
+    print(f"Premier rendu (pool compris):   {rendu:.1f} ms  cached={first['cached']}")
+    print(f"Même document, relu du cache:   {relu:.3f} ms  cached={again['cached']}")
+
+    # 8 demandes simultanées d'un nouveau document: un seul rendu
+    autre = dict(data, numero='BCS-BANC-2')
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: get_pdf(autre), range(8)))
+    print(f"8 demandes simultanées:         {sum(not r['cached'] for r in results)} rendu(s)")
+    shutdown()
@@ -0,0 +1,317 @@
+"""
+BIEN CHEZ SOI - Export en lot des soumissions en PDF
+Toutes les soumissions d'un client ou d'une période (ex. facturation RPA),
+rendues en parallèle dans le pool PDF et diffusées au fil du rendu:
+- zip: un PDF par soumission (archive écrite en continu, sans index préalable)
+- pdf: un seul PDF, les pages de chaque soumission à la suite
+
+La mémoire ne dépend pas du nombre de soumissions: au plus quelques PDF sont
+en cours à la fois (2 x PDF_EXPORT_CONCURRENCY); seul l'index écrit à la fin
+grandit (ZIP: nom et taille de chaque fichier; PDF: 8 octets par objet et par page).
+
+Les montants sont ceux enregistrés dans Notion (prix de base, sous-total, TPS,
+TVQ, total), jamais recalculés. Le détail des lignes de prix n'y est pas
+enregistré: il est reconstitué avec la grille active, et ses montants ne sont
+affichés que s'ils concordent avec les montants enregistrés. Une soumission sans
+montants enregistrés n'est pas exportée (listée dans erreurs.txt).
+
+Usage:
+    python pdf_export.py --client Tremblay -o tremblay.zip
+    python pdf_export.py --du 2026-01-01 --au 2026-01-31 --format pdf -o janvier.pdf
+    python pdf_export.py --mirror soumissions.jsonl --format zip -o export.zip
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+import zipfile
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from pdf_pool import render_pdf, wait_for_slot
+from pricing_engine import calculate_totals
+
+FORMATS = {'zip': 'application/zip', 'pdf': 'application/pdf'}
+MONTANTS = ('prix_base', 'sous_total', 'tps', 'tvq', 'total')
+TITRE = re.compile(r'^\s*(BCS-[\w-]+)\s*[—-]+\s*(.*)$')
+OBJET = re.compile(rb'(\d+)\s+0\s+obj\s*(.*?)(stream\r?\n|endobj)', re.S)
+REF = re.compile(rb'(\d+)\s+0\s+R')
+
+
+def soumission_data(row):
+    """Données de rendu d'une soumission enregistrée (ligne de notion_service.iter_soumissions)"""
+    m = TITRE.match(row.get('titre') or '')
+    numero, client = (m.group(1), m.group(2).strip()) if m else (row.get('titre') or row.get('id') or 'BCS', '')
+    data = {key: value for key, value in row.items() if value is not None}
+    data.update(numero=numero, client_nom=client or None, date=(row.get('created') or '')[:10] or None)
+    return data
+
+
+def stored_totals(row, data):
+    """
+    Totaux d'une soumission enregistrée (forme de calculate_totals) bâtis sur ses
+    montants enregistrés. Les lignes de détail recalculées ne servent que de
+    libellés: sans montant si la grille ou les champs ne redonnent pas le
+    prix de base et le sous-total enregistrés.
+
+    Returns:
+        dict, ou None si un montant n'est pas enregistré
+    """
+    montants = {key: row.get(key) for key in MONTANTS}
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in montants.values()):
+        return None
+    totals = calculate_totals(data)
+    concordants = all(round(totals[key], 2) == round(montants[key], 2) for key in ('prix_base', 'sous_total'))
+    if not concordants:
+        totals['details_lignes'] = tuple((desc, 0) for desc, _ in totals['details_lignes'])
+        totals['addon_details'] = tuple((nom, 0) for nom, _ in totals['addon_details'])
+    totals.update(montants, addons_total=round(montants['sous_total'] - montants['prix_base'], 2))
+    return totals
+
+
+def _rendre(row):
+    """Rendu d'une soumission; attend une place si le pool est saturé par les demandes en direct"""
+    data = soumission_data(row)
+    totals = stored_totals(row, data)
+    if totals is None:
+        return data, {'success': False, 'error': 'montants non enregistrés dans Notion'}
+    return data, wait_for_slot(render_pdf, data, totals)
+
+
+def render_all(rows, concurrency=None):
+    """
+    Rend les soumissions en parallèle, dans leur ordre.
+
+    Yields:
+        tuple: (data, résultat de pdf_pool.render_pdf), au plus 2 x concurrency en mémoire
+    """
+    concurrency = max(concurrency or Config.PDF_EXPORT_CONCURRENCY, 1)
+    with ThreadPoolExecutor(concurrency, thread_name_prefix='pdf-export') as executor:
+        window = deque()
+        for row in rows:
+            window.append(executor.submit(_rendre, row))
+            if len(window) >= 2 * concurrency:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def _nom_fichier(data, vus):
+    nom = re.sub(r'[^\w.-]+', '_', f"soumission-{data['numero']}").strip('_')
+    vus[nom] = vus.get(nom, 0) + 1
+    return f"{nom}.pdf" if vus[nom] == 1 else f"{nom}-{vus[nom]}.pdf"
+
+
+class _Flux:
+    """Fichier en écriture seule vidé à chaque morceau diffusé (zipfile le traite comme non positionnable)"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def iter_zip(rendus):
+    """Archive ZIP diffusée au fil des rendus (PDF stockés tels quels, déjà compressés)"""
+    flux, vus, erreurs = _Flux(), {}, []
+    with zipfile.ZipFile(flux, 'w', zipfile.ZIP_STORED) as archive:
+        for data, result in rendus:
+            if not result['success']:
+                erreurs.append(f"{data['numero']}: {result['error']}")
+                continue
+            info = zipfile.ZipInfo(_nom_fichier(data, vus), date_time=time.localtime()[:6])
+            archive.writestr(info, result['pdf'])
+            yield flux.vider()
+        if erreurs:
+            archive.writestr('erreurs.txt', '\n'.join(erreurs) + '\n')
+    yield flux.vider()
+
+
+def _objets(pdf):
+    """
+    Objets d'un PDF reportlab (table xref classique, sans flux d'objets).
+
+    Returns:
+        tuple: ({numéro: (dictionnaire, flux ou None)}, trailer)
+    """
+    debut_xref = int(re.search(rb'startxref\s+(\d+)\s+%%EOF\s*$', pdf).group(1))
+    trailer = pdf[pdf.index(b'trailer', debut_xref):]
+    objets = {}
+    m_xref = re.match(rb'xref\s+0\s+(\d+)\s+', pdf[debut_xref:])
+    table = debut_xref + m_xref.end()
+    for numero in range(1, int(m_xref.group(1))):
+        entree = pdf[table + 20 * numero:table + 20 * numero + 18]
+        if entree.endswith(b'f'):
+            continue
+        m = OBJET.match(pdf, int(entree[:10]))
+        dictionnaire, flux = m.group(2).strip(), None
+        if m.group(3) != b'endobj':
+            longueur = int(re.search(rb'/Length\s+(\d+)', dictionnaire).group(1))
+            flux = pdf[m.end():m.end() + longueur]
+        objets[int(m.group(1))] = (dictionnaire, flux)
+    return objets, trailer
+
+
+class _FusionPdf:
+    """
+    PDF unique écrit au fil de l'eau: les objets de chaque soumission sont
+    renumérotés et écrits dès qu'elle est rendue; catalogue, arbre des pages et
+    table xref viennent à la fin. Les polices standard (sans référence ni
+    flux), identiques d'une soumission à l'autre, ne sont écrites qu'une fois.
+    """
+
+    CATALOGUE, PAGES = 1, 2
+
+    def __init__(self):
+        self.offset = 0
+        self.positions = array('q', [0, 0, 0])    # position de chaque objet (8 octets par objet)
+        self.pages = array('q')
+        self.partages = {}
+
+    def _emettre(self, numero, dictionnaire, flux=None):
+        self.positions[numero] = self.offset
+        if flux is None:
+            data = b'%d 0 obj\n%s\nendobj\n' % (numero, dictionnaire)
+        else:
+            data = b'%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n' % (numero, dictionnaire, flux)
+        self.offset += len(data)
+        return data
+
+    def entete(self):
+        data = b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n'
+        self.offset += len(data)
+        return data
+
+    def ajouter(self, pdf):
+        """Objets d'un PDF de soumission, renumérotés (bytes à diffuser)"""
+        objets, trailer = _objets(pdf)
+        catalogue = int(re.search(rb'/Root\s+(\d+)\s+0\s+R', trailer).group(1))
+        info = re.search(rb'/Info\s+(\d+)\s+0\s+R', trailer)
+        racine = int(re.search(rb'/Pages\s+(\d+)\s+0\s+R', objets[catalogue][0]).group(1))
+        ignores = {catalogue, racine, int(info.group(1)) if info else None}
+
+        # Les /Parent des pages pointent vers l'arbre des pages de l'export
+        correspondance, nouveaux = {racine: self.PAGES}, []
+        for numero, (dictionnaire, flux) in objets.items():
+            if numero in ignores:
+                continue
+            partage = flux is None and b'/Font' in dictionnaire and not REF.search(dictionnaire)
+            if partage and dictionnaire in self.partages:
+                correspondance[numero] = self.partages[dictionnaire]
+                continue
+            correspondance[numero] = len(self.positions)
+            self.positions.append(0)
+            if partage:
+                self.partages[dictionnaire] = correspondance[numero]
+            nouveaux.append(numero)
+
+        kids = REF.findall(re.search(rb'/Kids\s*\[(.*?)\]', objets[racine][0], re.S).group(1))
+        self.pages.extend(correspondance[int(n)] for n in kids)
+
+        def renumeroter(m):
+            return b'%d 0 R' % correspondance[int(m.group(1))]
+
+        # Références renumérotées dans les dictionnaires seulement (les flux sont compressés)
+        return b''.join(
+            self._emettre(correspondance[numero], REF.sub(renumeroter, objets[numero][0]), objets[numero][1])
+            for numero in nouveaux
+        )
+
+    def fin(self, lot=1000):
+        """Arbre des pages, catalogue, puis table xref (lot entrées par morceau) et trailer"""
+        kids = b' '.join(b'%d 0 R' % n for n in self.pages)
+        yield (self._emettre(self.PAGES, b'<< /Type /Pages /Count %d /Kids [ %s ] >>' % (len(self.pages), kids))
+               + self._emettre(self.CATALOGUE, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES))
+        xref = self.offset
+        yield b'xref\n0 %d\n0000000000 65535 f \n' % len(self.positions)
+        for debut in range(1, len(self.positions), lot):
+            yield b''.join(b'%010d 00000 n \n' % position for position in self.positions[debut:debut + lot])
+        yield (b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+               % (len(self.positions), self.CATALOGUE, xref))
+
+
+def iter_pdf(rendus):
+    """PDF unique diffusé au fil des rendus (pages de chaque soumission à la suite)"""
+    fusion = _FusionPdf()
+    yield fusion.entete()
+    for data, result in rendus:
+        # Une soumission en échec est omise (le PDF n'a pas d'endroit pour le signaler)
+        if result['success']:
+            yield fusion.ajouter(result['pdf'])
+    yield from fusion.fin()
+
+
+def export_stream(rows, format='zip', concurrency=None):
+    """
+    Export en lot, diffusé pendant le rendu.
+
+    Args:
+        rows: Soumissions (itérable de lignes notion_service.iter_soumissions, lu au fil de l'eau)
+        format: 'zip' (un PDF par soumission) ou 'pdf' (un seul PDF)
+        concurrency: Rendus simultanés (défaut: PDF_EXPORT_CONCURRENCY)
+
+    Yields:
+        bytes: Morceaux du fichier
+    """
+    rendus = render_all(rows, concurrency)
+    return iter_zip(rendus) if format == 'zip' else iter_pdf(rendus)
+
+
+def iter_mirror(path, client=None, date_debut=None, date_fin=None):
+    """Lignes d'une copie locale JSONL (format what_if_repricing --save-mirror), mêmes filtres que Notion"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            jour = (row.get('created') or '')[:10]
+            if client and client.lower() not in (row.get('titre') or '').lower():
+                continue
+            if (date_debut and jour < date_debut) or (date_fin and jour > date_fin):
+                continue
+            yield row
+
+
+if __name__ == '__main__':
+    import notion_service
+    from pdf_pool import shutdown
+
+    arg_parser = argparse.ArgumentParser(description='Export en lot des soumissions BCS en PDF')
+    arg_parser.add_argument('--client', help='Texte recherché dans le titre des soumissions')
+    arg_parser.add_argument('--du', help='Date de création minimale (AAAA-MM-JJ)')
+    arg_parser.add_argument('--au', help='Date de création maximale (AAAA-MM-JJ)')
+    arg_parser.add_argument('--format', choices=sorted(FORMATS), default='zip')
+    arg_parser.add_argument('--mirror', help='Copie locale JSONL au lieu de Notion')
+    arg_parser.add_argument('-o', '--output', required=True, help='Fichier produit')
+    args = arg_parser.parse_args()
+
+    if args.mirror:
+        rows = iter_mirror(args.mirror, args.client, args.du, args.au)
+    elif not notion_service.notion or not Config.NOTION_SOUMISSIONS_DB:
+        print('Notion non configuré. Utilisez --mirror ou configurez .env.', file=sys.stderr)
+        sys.exit(1)
+    else:
+        rows = notion_service.iter_soumissions(client=args.client, date_debut=args.du, date_fin=args.au)
+
+    started = time.perf_counter()
+    taille = 0
+    with open(args.output, 'wb') as f:
+        for chunk in export_stream(rows, args.format):
+            f.write(chunk)
+            taille += len(chunk)
+    shutdown()
+    print(f"{args.output}: {taille} octets en {time.perf_counter() - started:.1f} s")
@@ -2,16 +2,43 @@
 BIEN CHEZ SOI - Générateur de PDF pour soumissions
 Crée des PDF professionnels avec calcul automatique des taxes Québec
 Supporte tous les types de tarification BCS
+
+Les parties fixes du document (styles, en-tête, titres de section, conditions,
+pied de page) sont compilées une fois par langue et réutilisées; seuls les
+tableaux client, service et prix sont construits à chaque soumission.
+
+Deux moteurs de rendu (Config.PDF_RENDERER):
+- canvas: mise en page fixe dessinée directement sur le canvas reportlab
+- platypus: mise en page complète, utilisée aussi quand le contenu déborde
+  de la mise en page fixe
+
+Le même document est aussi rendu en fragment HTML (generate_soumission_html)
+pour l'aperçu pendant l'édition, sans passer par reportlab.
 """
 
+import copy
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from html import escape
+from types import SimpleNamespace
+
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
-from reportlab.lib.colors import HexColor
+from reportlab.lib.colors import HexColor, black
 from reportlab.lib.styles import ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.platypus.flowables import Flowable
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
 from datetime import datetime, timedelta
-from config import Config, calculer_prix_regulier, calculer_prix_groupe, calculer_prix_partage, calculer_taxes
+from config import Config
+from pricing_engine import calculate_totals
 
 # Couleurs BCS
 BCS_NAVY = HexColor('#1B2A4A')
@@ -21,358 +48,862 @@ BCS_GREEN = HexColor('#2D6A4F')
 BCS_GRAY = HexColor('#6B7280')
 BCS_WHITE = HexColor('#FFFFFF')
 
+MARGE = 0.75 * inch
+# Largeur utile du cadre de SimpleDocTemplate (marges et 6 pt de padding de chaque côté)
+LARGEUR_UTILE = letter[0] - 2 * MARGE - 12
+
+# Styles
+STYLE_TITLE = ParagraphStyle(
+    'Title', fontSize=30, textColor=BCS_NAVY,
+    spaceAfter=4, alignment=TA_CENTER, fontName='Helvetica-Bold'
+)
+STYLE_SUBTITLE = ParagraphStyle(
+    'Subtitle', fontSize=13, textColor=BCS_GOLD,
+    spaceAfter=20, alignment=TA_CENTER, fontName='Helvetica'
+)
+STYLE_SECTION = ParagraphStyle(
+    'Section', fontSize=12, textColor=BCS_NAVY,
+    spaceBefore=15, spaceAfter=8, fontName='Helvetica-Bold'
+)
+STYLE_NORMAL = ParagraphStyle(
+    'BodyText', fontSize=10, leading=14
+)
+STYLE_SMALL = ParagraphStyle(
+    'Small', fontSize=9, textColor=BCS_GRAY, alignment=TA_CENTER
+)
+STYLE_CONDITIONS = ParagraphStyle(
+    'Conditions', fontSize=9, leading=13, textColor=BCS_GRAY
+)
+
+TABLE_ENTETE = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (-1, -1), BCS_GRAY),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+TABLE_CLIENT = TableStyle([
+    ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+    ('ALIGN', (1, 0), (1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TEXTCOLOR', (0, 0), (0, -1), BCS_GRAY),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+    ('TOPPADDING', (0, 0), (-1, -1), 5),
+])
+TABLE_SERVICE = TableStyle(TABLE_CLIENT.getCommands() + [
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+TABLE_PRIX = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), BCS_LIGHT),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, -1), (-1, -1), 13),
+    ('TEXTCOLOR', (0, -1), (-1, -1), BCS_NAVY),
+    ('LINEABOVE', (0, -1), (-1, -1), 1.5, BCS_NAVY),
+    ('LINEBELOW', (0, 0), (-1, 0), 1, BCS_GRAY),
+])
+TABLE_SIGNATURE = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('TOPPADDING', (0, 0), (-1, -1), 20),
+])
+TABLE_PIED = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (0, 0), 10),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('TEXTCOLOR', (0, 0), (-1, -1), BCS_GRAY),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+])
+
+TITRE = "Bien Chez Soi"
+SOUS_TITRE = "Soins &amp; Compagnie à domicile — Brossard"   # balisage Paragraph (et HTML)
+LIGNES_SIGNATURE_VIDE = [["Signature: ________________________", "Date: ________________________"]]
+
+CONDITIONS = {
+    'fr': """
+            &bull; Paiement dû à la complétion du service<br/>
+            &bull; Annulation sans frais 24h avant le service<br/>
+            &bull; Cette soumission est valide pour 14 jours<br/>
+            &bull; Les taxes TPS/TVQ sont calculées selon les taux en vigueur au Québec<br/>
+            &bull; Services fournis par Les Entreprises REMES Inc.
+            """,
+    'en': """
+            &bull; Payment due upon service completion<br/>
+            &bull; Free cancellation 24h before service<br/>
+            &bull; This quote is valid for 14 days<br/>
+            &bull; GST/QST taxes calculated per Quebec rates<br/>
+            &bull; Services provided by Les Entreprises REMES Inc.
+            """,
+}
 
-def calculate_totals(data):
+
+class _BlocFige(Flowable):
+    """
+    Flowable fixe mis en page une fois (parse et coupure des lignes) à la
+    compilation du gabarit. Chaque document en utilise une copie: le flowable
+    d'origine n'est jamais dessiné directement, ce qui permet de partager le
+    gabarit entre threads.
     """
-    Calcule les totaux avec taxes TPS/TVQ selon le type de service BCS
+
+    def __init__(self, flowable):
+        Flowable.__init__(self)
+        self.flowable = flowable
+        self.hAlign = getattr(flowable, 'hAlign', 'CENTER')
+        self.largeur = LARGEUR_UTILE
+        self.taille = flowable.wrap(LARGEUR_UTILE, letter[1])
+        # Hauteur à partir de laquelle platypus pourrait couper le bloc (rendu canvas)
+        if isinstance(flowable, Table) and len(flowable._rowHeights) > 1:
+            self.seuil_coupure = flowable._rowHeights[0]
+        elif isinstance(flowable, Paragraph) and len(flowable.blPara.lines) > 1:
+            self.seuil_coupure = flowable.style.leading
+        else:
+            self.seuil_coupure = None
+
+    def wrap(self, availWidth, availHeight):
+        if availWidth != self.largeur:
+            self.flowable = copy.copy(self.flowable)
+            self.largeur = availWidth
+            self.taille = self.flowable.wrap(availWidth, availHeight)
+        self.width, self.height = self.taille
+        return self.taille
+
+    def split(self, availWidth, availHeight):
+        return copy.copy(self.flowable).split(availWidth, availHeight)
+
+    def getSpaceBefore(self):
+        return self.flowable.getSpaceBefore()
+
+    def getSpaceAfter(self):
+        return self.flowable.getSpaceAfter()
+
+    def draw(self):
+        copy.copy(self.flowable)._drawOn(self.canv)
+
+
+# Signature vectorielle sans trait: mise en page signée, cadre de signature vide
+# (corps sur lequel pdf_stamp appose ensuite la signature)
+SIGNATURE_RESERVEE = {'traits': [], 'epaisseur': 0}
+
+
+def _dessiner_traits(c, signature, x, y):
+    """Signature vectorielle (signature.vector_signature) dans le cadre de 3 po x 1 po au point (x, y)"""
+    if not signature['traits']:
+        return
+    c.saveState()
+    c.setStrokeColor(BCS_NAVY)
+    c.setLineWidth(signature['epaisseur'])
+    c.setLineCap(1)
+    c.setLineJoin(1)
+    for trait in signature['traits']:
+        path = c.beginPath()
+        path.moveTo(x + trait[0], y + trait[1])
+        for i in range(2, len(trait), 2):
+            path.lineTo(x + trait[i], y + trait[i + 1])
+        c.drawPath(path, stroke=1, fill=0)
+    c.restoreState()
+
+
+class _SignatureVectorielle(Flowable):
+    """Signature vectorielle dans le flux platypus (même dessin que le rendu canvas)"""
+
+    def __init__(self, signature):
+        Flowable.__init__(self)
+        self.signature = signature
+        self.hAlign = 'CENTER'
+
+    def wrap(self, availWidth, availHeight):
+        return 3 * inch, 1 * inch
+
+    def draw(self):
+        _dessiner_traits(self.canv, self.signature, 0, 0)
+
+
+@lru_cache(maxsize=None)
+def _gabarit(lang):
+    """Parties fixes du document pour une langue ('fr' ou 'en'), compilées une fois"""
+    t = Config.LANGUES[lang]
+    fr = lang == 'fr'
+
+    def section(texte):
+        return _BlocFige(Paragraph(texte, STYLE_SECTION))
+
+    signature_vide = Table(LIGNES_SIGNATURE_VIDE, colWidths=[3.5 * inch, 3.5 * inch])
+    signature_vide.setStyle(TABLE_SIGNATURE)
+
+    lignes_pied = [
+        f"{Config.BCS_NAME} — Soins & Compagnie à domicile",
+        Config.BCS_LEGAL_NAME,
+        Config.BCS_ADDRESS,
+        f"{Config.BCS_EMAIL} | {Config.BCS_PHONE}",
+        f"NEQ: {Config.BCS_NEQ}",
+    ]
+    pied = Table([[ligne] for ligne in lignes_pied], colWidths=[7 * inch])
+    pied.setStyle(TABLE_PIED)
+
+    sections = SimpleNamespace(
+        client=t['label_client'].upper(),
+        service="SERVICE DEMANDÉ" if fr else "REQUESTED SERVICE",
+        prix="DÉTAIL DES PRIX" if fr else "PRICE DETAILS",
+        signature=t['signature_title'],
+        conditions=t['conditions_title'],
+    )
+
+    return SimpleNamespace(
+        t=t,
+        soumission_label="Soumission" if fr else "Quote",
+        date_label="Date",
+        valid_label="Valide jusqu'au" if fr else "Valid until",
+        montant_col="Montant" if fr else "Amount",
+        sections=sections,
+        lignes_pied=lignes_pied,
+        titre=_BlocFige(Paragraph(TITRE, STYLE_TITLE)),
+        sous_titre=_BlocFige(Paragraph(SOUS_TITRE, STYLE_SUBTITLE)),
+        section_client=section(sections.client),
+        section_service=section(sections.service),
+        section_prix=section(sections.prix),
+        section_signature=section(sections.signature),
+        section_conditions=section(sections.conditions),
+        conditions=_BlocFige(Paragraph(CONDITIONS[lang], STYLE_CONDITIONS)),
+        signature_vide=_BlocFige(signature_vide),
+        pied=_BlocFige(pied),
+    )
+
+
+def _document(data, totals, g, numero, date_soumission):
+    """
+    Contenu variable d'une soumission, commun aux deux moteurs de rendu:
+    lignes des tables d'en-tête, client, service et prix.
+    """
+    t = g.t
+    date_expiration = date_soumission + timedelta(days=14)
+
+    entete = [
+        [f"{g.soumission_label}: {numero}", f"{g.date_label}: {date_soumission.strftime('%Y-%m-%d')}"],
+        ["", f"{g.valid_label}: {date_expiration.strftime('%Y-%m-%d')}"]
+    ]
+
+    def texte(valeur):
+        return str(valeur or '—')
+
+    client = [
+        [f"{t['label_name']}:", texte(data.get('client_nom'))],
+        [f"{t['label_phone']}:", texte(data.get('client_telephone'))],
+        [f"{t['label_email']}:", texte(data.get('client_email'))],
+        [f"{t['label_address']}:", texte(data.get('adresse_service'))],
+    ]
+
+    service = [
+        [f"{t['label_type']}:", str(totals['type_service'])],
+        [f"{t['label_category']}:", texte(data.get('categorie'))],
+        [f"{t['label_hours']}:", f"{totals['heures']}h"],
+        [f"{t['label_description']}:", texte(data.get('description_service'))],
+    ]
+    if totals['nb_personnes'] and totals['nb_personnes'] > 0:
+        service.insert(3, [f"{t['label_persons']}:", str(totals['nb_personnes'])])
+
+    prix = [["Description", g.montant_col]]
+    for desc, montant in totals['details_lignes']:
+        if montant > 0:
+            prix.append([str(desc), f"{montant:.2f} $"])
+        else:
+            prix.append([str(desc), ""])
+
+    prix.append(["", ""])
+    prix.append([t['sous_total'], f"{totals['sous_total']:.2f} $"])
+    prix.append([t['tps'], f"{totals['tps']:.2f} $"])
+    prix.append([t['tvq'], f"{totals['tvq']:.2f} $"])
+    prix.append([t['total'], f"{totals['total']:.2f} $"])
+
+    return SimpleNamespace(numero=numero, entete=entete, client=client, service=service, prix=prix)
+
+
+def _rendu_platypus(doc_model, g, output_path, signature_path):
+    """Mise en page complète par platypus (SimpleDocTemplate)"""
+    doc = SimpleDocTemplate(
+        output_path,
+        pagesize=letter,
+        rightMargin=MARGE,
+        leftMargin=MARGE,
+        topMargin=MARGE,
+        bottomMargin=MARGE
+    )
+
+    def table(lignes, col_widths, style):
+        tbl = Table(lignes, colWidths=col_widths)
+        tbl.setStyle(style)
+        return tbl
+
+    story = []
+
+    # === EN-TÊTE ===
+    story.append(copy.copy(g.titre))
+    story.append(copy.copy(g.sous_titre))
+    story.append(table(doc_model.entete, [3.5 * inch, 3.5 * inch], TABLE_ENTETE))
+    story.append(Spacer(1, 20))
+
+    # === CLIENT ===
+    story.append(copy.copy(g.section_client))
+    story.append(table(doc_model.client, [1.8 * inch, 5.2 * inch], TABLE_CLIENT))
+
+    # === SERVICE ===
+    story.append(copy.copy(g.section_service))
+    story.append(table(doc_model.service, [1.8 * inch, 5.2 * inch], TABLE_SERVICE))
+
+    # === PRIX ===
+    story.append(copy.copy(g.section_prix))
+    story.append(table(doc_model.prix, [5 * inch, 2 * inch], TABLE_PRIX))
+
+    # === SIGNATURE CLIENT ===
+    story.append(Spacer(1, 20))
+    story.append(copy.copy(g.section_signature))
+
+    if isinstance(signature_path, dict):
+        story.append(_SignatureVectorielle(signature_path))
+    elif signature_path:
+        try:
+            sig_img = Image(signature_path, width=3 * inch, height=1 * inch)
+            story.append(sig_img)
+        except Exception:
+            story.append(Paragraph("_" * 50, STYLE_NORMAL))
+    else:
+        # Ligne de signature vide
+        story.append(copy.copy(g.signature_vide))
+
+    # === CONDITIONS ===
+    story.append(Spacer(1, 15))
+    story.append(copy.copy(g.section_conditions))
+    story.append(copy.copy(g.conditions))
+
+    # === PIED DE PAGE ===
+    story.append(Spacer(1, 25))
+    story.append(copy.copy(g.pied))
+
+    doc.build(story)
+
+
+# ============================================================
+# RENDU DIRECT SUR CANVAS
+# Même document que platypus, dessiné à des coordonnées calculées
+# d'avance: les blocs s'empilent selon les règles du cadre de
+# SimpleDocTemplate (espaces avant/après, saut de page entre blocs),
+# sans passe de mise en page ni découpage.
+# ============================================================
+
+HAUT_CADRE = letter[1] - MARGE - 6
+BAS_CADRE = MARGE + 6
+X_CADRE = MARGE + 6
+INTERLIGNE_CELLULE = 12  # interligne des cellules texte de Table (CellStyle.leading)
+PADDING_CELLULE = 6      # padding horizontal par défaut des cellules
+
+# Équivalents canvas des TableStyle des tables dynamiques
+GRILLE_ENTETE = SimpleNamespace(
+    largeurs=(3.5 * inch, 3.5 * inch), aligns=('LEFT', 'RIGHT'), haut=3, bas=3,
+    polices=(('Helvetica', 10, BCS_GRAY), ('Helvetica', 10, BCS_GRAY)), premiere=None, derniere=None,
+)
+GRILLE_LIBELLES = SimpleNamespace(
+    largeurs=(1.8 * inch, 5.2 * inch), aligns=('RIGHT', 'LEFT'), haut=5, bas=5,
+    polices=(('Helvetica-Bold', 10, BCS_GRAY), ('Helvetica', 10, black)), premiere=None, derniere=None,
+)
+GRILLE_PRIX = SimpleNamespace(
+    largeurs=(5 * inch, 2 * inch), aligns=('LEFT', 'RIGHT'), haut=8, bas=8,
+    polices=(('Helvetica', 10, black), ('Helvetica', 10, black)),
+    premiere=('Helvetica-Bold', 10, black), derniere=('Helvetica-Bold', 13, BCS_NAVY),
+)
+
+
+def _hauteur_ligne(grille):
+    return INTERLIGNE_CELLULE + grille.haut + grille.bas
+
+
+def _polices_lignes(grille, n):
+    """Police, taille et couleur de chaque cellule, ligne par ligne"""
+    polices = [grille.polices] * n
+    if grille.premiere:
+        polices[0] = (grille.premiere,) * len(grille.largeurs)
+    if grille.derniere:
+        polices[-1] = (grille.derniere,) * len(grille.largeurs)
+    return polices
+
+
+def _grille_tient(grille, lignes):
+    """Chaque cellule tient sur une ligne dans sa colonne (sinon: platypus)"""
+    for ligne, polices in zip(lignes, _polices_lignes(grille, len(lignes))):
+        for texte, largeur, (police, taille, _) in zip(ligne, grille.largeurs, polices):
+            if '\n' in texte or stringWidth(texte, police, taille) > largeur - 2 * PADDING_CELLULE:
+                return False
+    return True
+
+
+def _dessiner_grille(c, grille, lignes, x, y):
+    """Dessine une table dont le coin inférieur gauche est (x, y)"""
+    hauteur = _hauteur_ligne(grille)
+    n = len(lignes)
+    courant = None
+    for i, (ligne, polices) in enumerate(zip(lignes, _polices_lignes(grille, n))):
+        rowpos = y + (n - 1 - i) * hauteur
+        col = x
+        for texte, largeur, align, police in zip(ligne, grille.largeurs, grille.aligns, polices):
+            if texte:
+                nom, taille, couleur = police
+                if police != courant:
+                    c.setFont(nom, taille, INTERLIGNE_CELLULE)
+                    c.setFillColor(couleur)
+                    courant = police
+                base = rowpos + grille.bas + INTERLIGNE_CELLULE - taille
+                if align == 'LEFT':
+                    c.drawString(col + PADDING_CELLULE, base, texte)
+                else:
+                    c.drawRightString(col + largeur - PADDING_CELLULE, base, texte)
+            col += largeur
+
+
+def _dessiner_prix(c, grille, lignes, x, y):
+    """Table des prix: fond de l'en-tête, texte, filets sous l'en-tête et au-dessus du total"""
+    hauteur = _hauteur_ligne(grille)
+    largeur = sum(grille.largeurs)
+    haut = y + len(lignes) * hauteur
+
+    c.setFillColor(BCS_LIGHT)
+    c.rect(x, haut - hauteur, largeur, hauteur, stroke=0, fill=1)
+    _dessiner_grille(c, grille, lignes, x, y)
+
+    c.saveState()
+    c.setLineCap(1)
+    c.setLineJoin(1)
+    c.setStrokeColor(BCS_NAVY)
+    c.setLineWidth(1.5)
+    c.line(x, y + hauteur, x + largeur, y + hauteur)
+    c.setStrokeColor(BCS_GRAY)
+    c.setLineWidth(1)
+    c.line(x, haut - hauteur, x + largeur, haut - hauteur)
+    c.restoreState()
+
+
+def _x_aligne(largeur, h_align):
+    if h_align in ('CENTER', 'CENTRE', TA_CENTER):
+        return X_CADRE + (LARGEUR_UTILE - largeur) * 0.5
+    if h_align in ('RIGHT', TA_RIGHT):
+        return X_CADRE + LARGEUR_UTILE - largeur
+    return X_CADRE
+
+
+def _bloc_fixe(bloc):
+    """(hauteur, espace avant, espace après, x, dessin, seuil de coupure) d'un bloc du gabarit"""
+    largeur, hauteur = bloc.taille
+
+    def dessin(c, x, y):
+        copy.copy(bloc.flowable).drawOn(c, x, y)
+
+    return (hauteur, bloc.getSpaceBefore(), bloc.getSpaceAfter(),
+            _x_aligne(largeur, bloc.hAlign), dessin, bloc.seuil_coupure)
+
+
+def _bloc_grille(grille, lignes, dessiner=_dessiner_grille):
+    hauteur_ligne = _hauteur_ligne(grille)
+
+    def dessin(c, x, y):
+        dessiner(c, grille, lignes, x, y)
+
+    # Une table de plusieurs lignes serait coupée par platypus dès que sa première ligne tient
+    seuil = hauteur_ligne if len(lignes) > 1 else None
+    return (hauteur_ligne * len(lignes), 0, 0, _x_aligne(sum(grille.largeurs), 'CENTER'), dessin, seuil)
+
+
+def _espace(hauteur):
+    return (hauteur, 0, 0, X_CADRE, None, None)
+
+
+def _placer(blocs):
+    """
+    Positionne les blocs page par page comme le cadre platypus.
+
+    Returns:
+        list: [[(dessin, x, y), ...] par page], ou None si un bloc devait être
+              coupé entre deux pages (cas laissé à platypus)
+    """
+    pages, page = [], []
+    y, en_haut, apres_prec = HAUT_CADRE, True, 0
+    for hauteur, avant, apres, x, dessin, seuil in blocs:
+        s = 0 if en_haut else max(avant - apres_prec, 0)
+        if y - s - hauteur < BAS_CADRE - 1e-6:
+            if seuil is not None and y - s - BAS_CADRE >= seuil:
+                return None
+            pages.append(page)
+            page, y, en_haut, s = [], HAUT_CADRE, True, 0
+        bas = y - s - hauteur
+        if dessin:
+            page.append((dessin, x, bas))
+        bas -= apres
+        en_haut = en_haut and bas == y
+        y, apres_prec = bas, apres
+    pages.append(page)
+    return pages
+
+
+def _rendu_canvas(doc_model, g, output_path, signature_path, positions=None):
+    """
+    Dessine la soumission directement sur un canvas reportlab.
+    Si positions (dict) est fourni, y range la position du cadre de signature:
+    positions['signature'] = (page, x, y), coin inférieur gauche en points.
+
+    Returns:
+        bool: False si le contenu ne tient pas dans la mise en page fixe
+              (texte trop long ou multiligne, table coupée entre deux pages,
+              signature illisible): rien n'est écrit, utiliser platypus.
+    """
+    grilles = ((GRILLE_ENTETE, doc_model.entete), (GRILLE_LIBELLES, doc_model.client),
+               (GRILLE_LIBELLES, doc_model.service), (GRILLE_PRIX, doc_model.prix))
+    if not all(_grille_tient(grille, lignes) for grille, lignes in grilles):
+        return False
+
+    largeur_sig, hauteur_sig = 3 * inch, 1 * inch
+    if isinstance(signature_path, dict):
+        def dessin_signature(c, x, y):
+            _dessiner_traits(c, signature_path, x, y)
+
+        bloc_signature = (hauteur_sig, 0, 0, _x_aligne(largeur_sig, 'CENTER'), dessin_signature, None)
+    elif signature_path:
+        try:
+            signature = ImageReader(signature_path)
+        except Exception:
+            return False
+
+        def dessin_signature(c, x, y):
+            c.drawImage(signature, x, y, largeur_sig, hauteur_sig, mask='auto')
+
+        bloc_signature = (hauteur_sig, 0, 0, _x_aligne(largeur_sig, 'CENTER'), dessin_signature, None)
+    else:
+        bloc_signature = _bloc_fixe(g.signature_vide)
+
+    pages = _placer([
+        _bloc_fixe(g.titre),
+        _bloc_fixe(g.sous_titre),
+        _bloc_grille(GRILLE_ENTETE, doc_model.entete),
+        _espace(20),
+        _bloc_fixe(g.section_client),
+        _bloc_grille(GRILLE_LIBELLES, doc_model.client),
+        _bloc_fixe(g.section_service),
+        _bloc_grille(GRILLE_LIBELLES, doc_model.service),
+        _bloc_fixe(g.section_prix),
+        _bloc_grille(GRILLE_PRIX, doc_model.prix, _dessiner_prix),
+        _espace(20),
+        _bloc_fixe(g.section_signature),
+        bloc_signature,
+        _espace(15),
+        _bloc_fixe(g.section_conditions),
+        _bloc_fixe(g.conditions),
+        _espace(25),
+        _bloc_fixe(g.pied),
+    ])
+    if pages is None:
+        return False
+
+    if positions is not None:
+        for i, page in enumerate(pages):
+            for dessin, x, y in page:
+                if dessin is bloc_signature[4]:
+                    positions['signature'] = (i, x, y)
+
+    c = Canvas(output_path, pagesize=letter)
+    for i, page in enumerate(pages):
+        if i:
+            c.showPage()
+        for dessin, x, y in page:
+            dessin(c, x, y)
+    c.save()
+    return True
+
+
+# ============================================================
+# RENDU HTML (APERÇU)
+# Même document que les rendus PDF, en fragment HTML autonome pour
+# l'aperçu pendant l'édition: couleurs et tailles du PDF, mise en
+# page laissée au navigateur.
+# ============================================================
+
+def _css(couleur):
+    return '#' + couleur.hexval()[2:]
+
+
+STYLE_APERCU = f"""<style>
+.bcs-apercu {{ font: 10pt/1.4 Helvetica, Arial, sans-serif; color: #000; background: #fff; max-width: 7in; margin: 0 auto; padding: 0.5in; }}
+.bcs-apercu h1 {{ font-size: 30pt; color: {_css(BCS_NAVY)}; text-align: center; margin: 0 0 4pt; }}
+.bcs-apercu .sous-titre {{ font-size: 13pt; color: {_css(BCS_GOLD)}; text-align: center; margin: 0 0 20pt; }}
+.bcs-apercu h2 {{ font-size: 12pt; color: {_css(BCS_NAVY)}; margin: 15pt 0 8pt; }}
+.bcs-apercu table {{ width: 100%; border-collapse: collapse; }}
+.bcs-apercu td, .bcs-apercu th {{ padding: 5pt 6pt; vertical-align: top; text-align: left; }}
+.bcs-apercu .entete {{ color: {_css(BCS_GRAY)}; margin-bottom: 20pt; }}
+.bcs-apercu .entete td {{ padding: 0 6pt 3pt; }}
+.bcs-apercu .entete td + td, .bcs-apercu .prix td + td, .bcs-apercu .prix th + th {{ text-align: right; }}
+.bcs-apercu .libelles th {{ width: 1.8in; text-align: right; color: {_css(BCS_GRAY)}; }}
+.bcs-apercu .prix td, .bcs-apercu .prix th {{ padding: 8pt 6pt; }}
+.bcs-apercu .prix th {{ background: {_css(BCS_LIGHT)}; border-bottom: 1pt solid {_css(BCS_GRAY)}; }}
+.bcs-apercu .prix tr:last-child td {{ font-weight: bold; font-size: 13pt; color: {_css(BCS_NAVY)}; border-top: 1.5pt solid {_css(BCS_NAVY)}; }}
+.bcs-apercu .signature td {{ padding-top: 20pt; }}
+.bcs-apercu .conditions {{ font-size: 9pt; line-height: 13pt; color: {_css(BCS_GRAY)}; margin: 0; }}
+.bcs-apercu footer {{ margin-top: 25pt; text-align: center; font-size: 9pt; color: {_css(BCS_GRAY)}; }}
+.bcs-apercu footer p {{ margin: 0 0 3pt; }}
+.bcs-apercu footer p:first-child {{ font-weight: bold; font-size: 10pt; }}
+</style>"""
+
+
+def _table_html(lignes, classe, entete_ligne=False, entete_colonne=False):
+    """Table du document en HTML (th pour la ligne ou la colonne de libellés)"""
+    rangs = []
+    for i, ligne in enumerate(lignes):
+        cellules = []
+        for j, cellule in enumerate(ligne):
+            balise = 'th' if (entete_ligne and i == 0) or (entete_colonne and j == 0) else 'td'
+            cellules.append(f'<{balise}>{escape(cellule)}</{balise}>')
+        rangs.append('<tr>' + ''.join(cellules) + '</tr>')
+    return f'<table class="{classe}">' + ''.join(rangs) + '</table>'
+
+
+@lru_cache(maxsize=None)
+def _gabarit_html(lang):
+    """Parties fixes de l'aperçu HTML pour une langue, compilées une fois (textes de _gabarit)"""
+    g = _gabarit(lang)
+
+    def section(texte):
+        return f'<h2>{escape(texte)}</h2>'
+
+    pied = ''.join(f'<p>{escape(ligne)}</p>' for ligne in g.lignes_pied)
+    return SimpleNamespace(
+        debut=(f'<article class="bcs-apercu" lang="{lang}">{STYLE_APERCU}'
+               f'<h1>{TITRE}</h1><p class="sous-titre">{SOUS_TITRE}</p>'),
+        section_client=section(g.sections.client),
+        section_service=section(g.sections.service),
+        section_prix=section(g.sections.prix),
+        fin=(section(g.sections.signature) + _table_html(LIGNES_SIGNATURE_VIDE, 'signature')
+             + section(g.sections.conditions) + f'<p class="conditions">{CONDITIONS[lang].strip()}</p>'
+             + f'<footer>{pied}</footer></article>'),
+    )
+
+
+def _rendu_html(doc_model, h):
+    """Fragment HTML de la soumission (sans signature: elle est tracée dans l'interface)"""
+    return ''.join((
+        h.debut,
+        _table_html(doc_model.entete, 'entete'),
+        h.section_client,
+        _table_html(doc_model.client, 'libelles', entete_colonne=True),
+        h.section_service,
+        _table_html(doc_model.service, 'libelles', entete_colonne=True),
+        h.section_prix,
+        _table_html(doc_model.prix, 'prix', entete_ligne=True),
+        h.fin,
+    ))
+
+
+def _date_soumission(data):
+    """Date de la soumission: data['date'] (AAAA-MM-JJ) si fournie, sinon aujourd'hui"""
+    try:
+        return datetime.strptime(data['date'], '%Y-%m-%d')
+    except (KeyError, TypeError, ValueError):
+        return datetime.now()
+
+
+@lru_cache(maxsize=1)
+def _version_gabarit():
+    """Empreinte de la mise en page: code de ce module, libellés, informations BCS et moteur"""
+    h = hashlib.sha256()
+    with open(__file__, 'rb') as f:
+        h.update(f.read())
+    infos = [Config.BCS_NAME, Config.BCS_LEGAL_NAME, Config.BCS_ADDRESS, Config.BCS_EMAIL,
+             Config.BCS_PHONE, Config.BCS_NEQ, Config.PDF_RENDERER, Config.LANGUES]
+    h.update(json.dumps(infos, sort_keys=True, ensure_ascii=False).encode())
+    return h.hexdigest()[:16]
+
+
+def document_key(data, totals=None, signature=None):
+    """
+    Empreinte du document rendu: deux soumissions de même empreinte donnent le
+    même PDF. Calculée sur le contenu affiché (lignes des tables, numéro, date),
+    la langue, les octets de la signature et la version du gabarit; les champs
+    qui n'apparaissent pas dans le PDF n'en font pas partie.
 
     Args:
-        data: Données de la soumission
+        data: Données de la soumission (dict, avec 'numero' et 'date')
+        totals: Totaux déjà calculés (optionnel, sinon calculate_totals)
+        signature: Image de la signature en octets ou signature vectorielle (dict, optionnel)
 
     Returns:
-        dict: Détail des prix et totaux
+        str: Empreinte hexadécimale (sha256)
     """
-    type_service = data.get('type_service', 'Régulier (sans contrat)')
-    heures = data.get('nombre_heures', 2) or 2
-    nb_personnes = data.get('nombre_personnes', 0) or 0
-
-    prix_base = 0.00
-    description_prix = ""
-    details_lignes = []
-
-    # --- Calcul selon le type ---
-    if type_service == 'Régulier (sans contrat)':
-        prix_base = calculer_prix_regulier(heures)
-        taux = prix_base / heures if heures > 0 else 0
-        description_prix = f"Service régulier — {heures}h"
-        details_lignes.append((description_prix, prix_base))
-
-    elif type_service == 'À la carte (Animation)':
-        prix_base = heures * Config.TARIF_AFFICHE
-        prix_base = max(prix_base, 100.00)  # minimum 2h = 100$
-        description_prix = f"Animation & Compagnie — {heures}h × {Config.TARIF_AFFICHE:.0f}$/h"
-        details_lignes.append((description_prix, prix_base))
-
-    elif type_service in ('Groupe Soins RPA', 'Groupe Animation RPA'):
-        if nb_personnes >= Config.GROUPE_MIN_PERSONNES:
-            groupe = calculer_prix_groupe(nb_personnes)
-            prix_base = groupe['prix_total']
-            description_prix = f"{type_service} — {nb_personnes} pers. × {groupe['heures']}h"
-            details_lignes.append((description_prix, prix_base))
-            details_lignes.append((f"  ({groupe['prix_par_personne']:.2f}$/personne)", 0))
-        else:
-            # Fallback: tarif horaire groupe
-            heures = max(heures, 4)
-            prix_base = heures * Config.GROUPE_TAUX_HORAIRE
-            description_prix = f"{type_service} — {heures}h × {Config.GROUPE_TAUX_HORAIRE:.0f}$/h"
-            details_lignes.append((description_prix, prix_base))
-
-    elif type_service == 'Partagé voisins RPA':
-        nb_voisins = data.get('nombre_personnes', 4) or 4
-        partage = calculer_prix_partage(nb_voisins)
-        prix_base = partage['prix_total']
-        description_prix = f"Bloc partagé {partage['nb_voisins']} voisins — {Config.PARTAGE_BLOC_HEURES}h"
-        details_lignes.append((description_prix, prix_base))
-        details_lignes.append((f"  ({partage['cout_par_voisin']:.2f}$/voisin)", 0))
-
-    elif type_service == 'Contrat corporatif':
-        type_contrat = data.get('type_contrat', 'hebdomadaire') or 'hebdomadaire'
-        contrat = Config.CONTRATS.get(type_contrat, Config.CONTRATS['hebdomadaire'])
-        if heures:
-            prix_base = heures * contrat['taux']
-        else:
-            prix_base = contrat['total_min']
-        description_prix = f"Contrat {type_contrat} — {heures}h × {contrat['taux']:.0f}$/h"
-        details_lignes.append((description_prix, prix_base))
+    totals = totals or calculate_totals(data)
+    lang = data.get('langue_client', 'fr')
+    lang = lang if lang in Config.LANGUES else 'fr'
+    numero = data.get('numero', '')
+    doc_model = _document(data, totals, _gabarit(lang), numero, _date_soumission(data))
+    return _empreinte(lang, doc_model, signature)
+
+
+def _empreinte(lang, doc_model, signature=None):
+    """Empreinte d'un document déjà construit (voir document_key)"""
+    h = hashlib.sha256()
+    h.update(_version_gabarit().encode())
+    h.update(json.dumps(
+        [lang, doc_model.entete, doc_model.client, doc_model.service, doc_model.prix],
+        ensure_ascii=False, separators=(',', ':')
+    ).encode())
+    if isinstance(signature, dict):
+        signature = json.dumps(signature, sort_keys=True, separators=(',', ':')).encode()
+    h.update(hashlib.sha256(signature or b'').digest())
+    return h.hexdigest()
+
+
+def warm_up():
+    """Compile les gabarits de chaque langue et charge polices et modules par un premier rendu"""
+    for lang in Config.LANGUES:
+        _gabarit(lang)
+        generate_soumission_pdf({'numero': 'BCS-PRECHAUFFAGE', 'langue_client': lang}, io.BytesIO())
+    try:
+        import PIL.Image  # noqa: F401  (décodage des signatures)
+    except ImportError:
+        pass
 
-    elif type_service == 'Forfait récurrent':
-        forfait_nom = data.get('forfait_recurrent', 'Essentiel') or 'Essentiel'
-        forfait = Config.FORFAITS_RECURRENTS.get(forfait_nom, Config.FORFAITS_RECURRENTS['Essentiel'])
-        prix_base = forfait['prix_mois']
-        description_prix = f"Forfait {forfait_nom} — {forfait['heures_mois']}h/mois ({forfait['frequence']})"
-        details_lignes.append((description_prix, prix_base))
 
-    else:
-        prix_base = calculer_prix_regulier(heures)
-        description_prix = f"Service — {heures}h"
-        details_lignes.append((description_prix, prix_base))
-
-    # --- Add-ons ---
-    addons_total = 0.00
-    addon_details = []
-
-    for addon_key, addon_info in Config.ADDONS.items():
-        if data.get(f'addon_{addon_key}', False):
-            addons_total += addon_info['prix']
-            addon_details.append((addon_info['nom'], addon_info['prix']))
-            details_lignes.append((f"+ {addon_info['nom']}", addon_info['prix']))
-
-    # --- Calculs finaux ---
-    sous_total = prix_base + addons_total
-    taxes = calculer_taxes(sous_total)
-
-    return {
-        'prix_base': prix_base,
-        'description_prix': description_prix,
-        'details_lignes': details_lignes,
-        'addons_total': addons_total,
-        'addon_details': addon_details,
-        'sous_total': sous_total,
-        'tps': taxes['tps'],
-        'tvq': taxes['tvq'],
-        'total': taxes['total'],
-        'type_service': type_service,
-        'heures': heures,
-        'nb_personnes': nb_personnes,
-    }
-
-
-def generate_soumission_pdf(data, output_path, signature_path=None):
+def generate_soumission_pdf(data, output_path, signature_path=None, totals=None, renderer=None):
     """
     Génère un PDF de soumission Bien Chez Soi
 
     Args:
         data: Données de la soumission (dict)
-        output_path: Chemin du fichier PDF à créer
-        signature_path: Chemin vers l'image de la signature (optionnel)
+        output_path: Chemin du fichier PDF à créer (ou fichier binaire ouvert, ex. BytesIO)
+        signature_path: Chemin ou fichier de l'image de la signature, ou signature
+                        vectorielle (dict, signature.vector_signature) (optionnel)
+        totals: Totaux déjà calculés (optionnel, sinon calculate_totals)
+        renderer: 'canvas' ou 'platypus' (défaut: Config.PDF_RENDERER)
 
     Returns:
-        dict: {'success': bool, 'path': str, 'totals': dict}
+        dict: {'success': bool, 'path': str, 'totals': dict, 'renderer': str}
     """
     try:
-        totals = calculate_totals(data)
+        totals = totals or calculate_totals(data)
         lang = data.get('langue_client', 'fr')
-        t = Config.LANGUES.get(lang, Config.LANGUES['fr'])
+        g = _gabarit(lang if lang in Config.LANGUES else 'fr')
 
         numero = data.get('numero', f"BCS-{datetime.now().strftime('%Y%m%d%H%M%S')}")
-        date_soumission = datetime.now()
-        date_expiration = date_soumission + timedelta(days=14)
-
-        doc = SimpleDocTemplate(
-            output_path,
-            pagesize=letter,
-            rightMargin=0.75 * inch,
-            leftMargin=0.75 * inch,
-            topMargin=0.75 * inch,
-            bottomMargin=0.75 * inch
-        )
-
-        # Styles
-        style_title = ParagraphStyle(
-            'Title', fontSize=30, textColor=BCS_NAVY,
-            spaceAfter=4, alignment=TA_CENTER, fontName='Helvetica-Bold'
-        )
-        style_subtitle = ParagraphStyle(
-            'Subtitle', fontSize=13, textColor=BCS_GOLD,
-            spaceAfter=20, alignment=TA_CENTER, fontName='Helvetica'
-        )
-        style_section = ParagraphStyle(
-            'Section', fontSize=12, textColor=BCS_NAVY,
-            spaceBefore=15, spaceAfter=8, fontName='Helvetica-Bold'
-        )
-        style_normal = ParagraphStyle(
-            'BodyText', fontSize=10, leading=14
-        )
-        style_small = ParagraphStyle(
-            'Small', fontSize=9, textColor=BCS_GRAY, alignment=TA_CENTER
-        )
-        style_conditions = ParagraphStyle(
-            'Conditions', fontSize=9, leading=13, textColor=BCS_GRAY
-        )
-
-        story = []
-
-        # === EN-TÊTE ===
-        story.append(Paragraph("Bien Chez Soi", style_title))
-        story.append(Paragraph("Soins &amp; Compagnie à domicile — Brossard", style_subtitle))
-
-        # Numéro et date
-        date_label = "Date" if lang == 'fr' else "Date"
-        valid_label = "Valide jusqu'au" if lang == 'fr' else "Valid until"
-        soumission_label = "Soumission" if lang == 'fr' else "Quote"
-
-        header_data = [
-            [f"{soumission_label}: {numero}", f"{date_label}: {date_soumission.strftime('%Y-%m-%d')}"],
-            ["", f"{valid_label}: {date_expiration.strftime('%Y-%m-%d')}"]
-        ]
-        header_table = Table(header_data, colWidths=[3.5 * inch, 3.5 * inch])
-        header_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('TEXTCOLOR', (0, 0), (-1, -1), BCS_GRAY),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        story.append(header_table)
-        story.append(Spacer(1, 20))
-
-        # === CLIENT ===
-        story.append(Paragraph(t['label_client'].upper(), style_section))
-
-        client_data = [
-            [f"{t['label_name']}:", data.get('client_nom') or '—'],
-            [f"{t['label_phone']}:", data.get('client_telephone') or '—'],
-            [f"{t['label_email']}:", data.get('client_email') or '—'],
-            [f"{t['label_address']}:", data.get('adresse_service') or '—'],
-        ]
-        client_table = Table(client_data, colWidths=[1.8 * inch, 5.2 * inch])
-        client_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('TEXTCOLOR', (0, 0), (0, -1), BCS_GRAY),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        story.append(client_table)
-
-        # === SERVICE ===
-        service_label = "SERVICE DEMANDÉ" if lang == 'fr' else "REQUESTED SERVICE"
-        story.append(Paragraph(service_label, style_section))
-
-        type_label = t['label_type']
-        cat_label = t['label_category']
-        desc_label = t['label_description']
-        hrs_label = t['label_hours']
-
-        service_rows = [
-            [f"{type_label}:", totals['type_service']],
-            [f"{cat_label}:", data.get('categorie') or '—'],
-            [f"{hrs_label}:", f"{totals['heures']}h"],
-            [f"{desc_label}:", data.get('description_service') or '—'],
-        ]
-        if totals['nb_personnes'] and totals['nb_personnes'] > 0:
-            pers_label = t['label_persons']
-            service_rows.insert(3, [f"{pers_label}:", str(totals['nb_personnes'])])
-
-        service_table = Table(service_rows, colWidths=[1.8 * inch, 5.2 * inch])
-        service_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('TEXTCOLOR', (0, 0), (0, -1), BCS_GRAY),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ]))
-        story.append(service_table)
-
-        # === PRIX ===
-        prix_label = "DÉTAIL DES PRIX" if lang == 'fr' else "PRICE DETAILS"
-        story.append(Paragraph(prix_label, style_section))
-
-        desc_col = "Description"
-        montant_col = "Montant" if lang == 'fr' else "Amount"
-        prix_rows = [[desc_col, montant_col]]
-
-        for desc, montant in totals['details_lignes']:
-            if montant > 0:
-                prix_rows.append([desc, f"{montant:.2f} $"])
-            else:
-                prix_rows.append([desc, ""])
-
-        prix_rows.append(["", ""])
-        prix_rows.append([t['sous_total'], f"{totals['sous_total']:.2f} $"])
-        prix_rows.append([t['tps'], f"{totals['tps']:.2f} $"])
-        prix_rows.append([t['tvq'], f"{totals['tvq']:.2f} $"])
-        prix_rows.append([t['total'], f"{totals['total']:.2f} $"])
-
-        prix_table = Table(prix_rows, colWidths=[5 * inch, 2 * inch])
-        prix_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), BCS_LIGHT),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, -1), (-1, -1), 13),
-            ('TEXTCOLOR', (0, -1), (-1, -1), BCS_NAVY),
-            ('LINEABOVE', (0, -1), (-1, -1), 1.5, BCS_NAVY),
-            ('LINEBELOW', (0, 0), (-1, 0), 1, BCS_GRAY),
-        ]))
-        story.append(prix_table)
-
-        # === SIGNATURE CLIENT ===
-        story.append(Spacer(1, 20))
-        story.append(Paragraph(t['signature_title'], style_section))
-
-        if signature_path:
-            try:
-                sig_img = Image(signature_path, width=3 * inch, height=1 * inch)
-                story.append(sig_img)
-            except Exception:
-                story.append(Paragraph("_" * 50, style_normal))
-        else:
-            # Ligne de signature vide
-            sig_data = [
-                ["Signature: ________________________", f"Date: ________________________"],
-            ]
-            sig_table = Table(sig_data, colWidths=[3.5 * inch, 3.5 * inch])
-            sig_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('TOPPADDING', (0, 0), (-1, -1), 20),
-            ]))
-            story.append(sig_table)
-
-        # === CONDITIONS ===
-        story.append(Spacer(1, 15))
-        story.append(Paragraph(t['conditions_title'], style_section))
-
-        if lang == 'fr':
-            conditions_text = """
-            &bull; Paiement dû à la complétion du service<br/>
-            &bull; Annulation sans frais 24h avant le service<br/>
-            &bull; Cette soumission est valide pour 14 jours<br/>
-            &bull; Les taxes TPS/TVQ sont calculées selon les taux en vigueur au Québec<br/>
-            &bull; Services fournis par Les Entreprises REMES Inc.
-            """
-        else:
-            conditions_text = """
-            &bull; Payment due upon service completion<br/>
-            &bull; Free cancellation 24h before service<br/>
-            &bull; This quote is valid for 14 days<br/>
-            &bull; GST/QST taxes calculated per Quebec rates<br/>
-            &bull; Services provided by Les Entreprises REMES Inc.
-            """
-        story.append(Paragraph(conditions_text, style_conditions))
-
-        # === PIED DE PAGE ===
-        story.append(Spacer(1, 25))
-
-        footer_data = [
-            [f"{Config.BCS_NAME} — Soins & Compagnie à domicile"],
-            [Config.BCS_LEGAL_NAME],
-            [Config.BCS_ADDRESS],
-            [f"{Config.BCS_EMAIL} | {Config.BCS_PHONE}"],
-            [f"NEQ: {Config.BCS_NEQ}"],
-        ]
-        footer_table = Table(footer_data, colWidths=[7 * inch])
-        footer_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (0, 0), 10),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('TEXTCOLOR', (0, 0), (-1, -1), BCS_GRAY),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        story.append(footer_table)
-
-        doc.build(story)
+        doc_model = _document(data, totals, g, numero, _date_soumission(data))
+
+        rendu = 'canvas'
+        if (renderer or Config.PDF_RENDERER) != 'canvas' or not _rendu_canvas(doc_model, g, output_path, signature_path):
+            rendu = 'platypus'
+            _rendu_platypus(doc_model, g, output_path, signature_path)
 
         return {
             'success': True,
             'path': output_path,
             'totals': totals,
-            'numero': numero
+            'numero': numero,
+            'renderer': rendu
+        }
+
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+def generate_soumission_corps(data, output_path, totals=None):
+    """
+    Corps d'une soumission à signer: mise en page signée, cadre de signature
+    vide, rendu canvas. pdf_stamp y appose ensuite une signature vectorielle
+    sans refaire le document.
+
+    Args:
+        data: Données de la soumission (dict)
+        output_path: Chemin du fichier PDF à créer (ou fichier binaire ouvert, ex. BytesIO)
+        totals: Totaux déjà calculés (optionnel, sinon calculate_totals)
+
+    Returns:
+        dict: {'success': bool, 'path': str, 'numero': str,
+               'cadre': (page, x, y) du cadre de signature, ou None si le contenu
+               déborde de la mise en page fixe (rien n'est écrit: rendu complet)}
+    """
+    try:
+        totals = totals or calculate_totals(data)
+        lang = data.get('langue_client', 'fr')
+        g = _gabarit(lang if lang in Config.LANGUES else 'fr')
+
+        numero = data.get('numero', f"BCS-{datetime.now().strftime('%Y%m%d%H%M%S')}")
+        doc_model = _document(data, totals, g, numero, _date_soumission(data))
+
+        positions = {}
+        if not _rendu_canvas(doc_model, g, output_path, SIGNATURE_RESERVEE, positions):
+            return {'success': True, 'path': output_path, 'numero': numero, 'cadre': None}
+
+        return {
+            'success': True,
+            'path': output_path,
+            'numero': numero,
+            'cadre': positions['signature']
+        }
+
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+
+APERCUS_MAX = 256       # aperçus HTML gardés en mémoire (par processus)
+_apercus = OrderedDict()
+_apercus_lock = threading.Lock()
+
+
+def generate_soumission_html(data, totals=None):
+    """
+    Aperçu HTML d'une soumission: même document que le PDF, en fragment HTML
+    autonome (styles compris). Les aperçus récents sont gardés en mémoire sous
+    l'empreinte du document.
+
+    Args:
+        data: Données de la soumission (dict)
+        totals: Totaux déjà calculés (optionnel, sinon calculate_totals)
+
+    Returns:
+        dict: {'success': bool, 'html': str, 'numero': str, 'cached': bool,
+               'key': empreinte du document (celle du PDF non signé, voir document_key)}
+    """
+    try:
+        totals = totals or calculate_totals(data)
+        lang = data.get('langue_client', 'fr')
+        lang = lang if lang in Config.LANGUES else 'fr'
+
+        numero = data.get('numero', f"BCS-{datetime.now().strftime('%Y%m%d%H%M%S')}")
+        doc_model = _document(data, totals, _gabarit(lang), numero, _date_soumission(data))
+        key = _empreinte(lang, doc_model)
+
+        with _apercus_lock:
+            html = _apercus.get(key)
+            if html is not None:
+                _apercus.move_to_end(key)
+        cached = html is not None
+        if not cached:
+            html = _rendu_html(doc_model, _gabarit_html(lang))
+            with _apercus_lock:
+                _apercus[key] = html
+                if len(_apercus) > APERCUS_MAX:
+                    _apercus.popitem(last=False)
+
+        return {
+            'success': True,
+            'html': html,
+            'numero': numero,
+            'key': key,
+            'cached': cached
         }
 
     except Exception as e:
@@ -0,0 +1,259 @@
+"""
+BIEN CHEZ SOI - Rendu PDF dans un pool de processus
+Le rendu reportlab est du calcul Python pur qui garde le GIL: exécuté dans le
+thread de la requête, il ralentit toutes les autres requêtes du worker.
+Les PDF sont donc rendus dans un petit pool de processus préchauffé (polices
+et gabarits chargés), avec une file bornée et un délai maximal; le résultat
+revient en octets.
+
+Usage (banc d'essai: latence d'une requête légère pendant des rendus PDF):
+    python pdf_pool.py
+"""
+
+import io
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from config import Config
+from pdf_generator import generate_soumission_corps, generate_soumission_pdf
+
+_executor = None
+_executor_lock = threading.Lock()
+# Rendus acceptés (en cours + en attente); une place est rendue quand le rendu se termine
+_slots = threading.BoundedSemaphore(max(Config.PDF_POOL_WORKERS + Config.PDF_POOL_QUEUE, 1))
+
+
+def _init_worker():
+    """Initialisation de chaque processus: gabarits fr/en, polices, premier rendu"""
+    from pdf_generator import warm_up
+    warm_up()
+
+
+def _ready():
+    return True
+
+
+def _render(data, totals, signature, renderer):
+    """Rendu en mémoire (exécuté dans le processus de rendu)"""
+    buffer = io.BytesIO()
+    result = generate_soumission_pdf(
+        data, buffer, io.BytesIO(signature) if isinstance(signature, bytes) else signature,
+        totals=totals, renderer=renderer
+    )
+    if not result['success']:
+        return result
+    return {
+        'success': True,
+        'pdf': buffer.getvalue(),
+        'numero': result['numero'],
+        'renderer': result['renderer'],
+    }
+
+
+def _render_corps(data, totals):
+    """Corps à signer en mémoire (exécuté dans le processus de rendu)"""
+    buffer = io.BytesIO()
+    result = generate_soumission_corps(data, buffer, totals=totals)
+    if not result['success']:
+        return result
+    return {
+        'success': True,
+        'pdf': buffer.getvalue() if result['cadre'] else None,
+        'numero': result['numero'],
+        'cadre': result['cadre'],
+    }
+
+
+def _context():
+    # forkserver: processus propres, sans les threads ni les connexions du worker web
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def get_executor():
+    """Pool partagé (créé au premier appel), None si le pool est désactivé"""
+    global _executor
+    if Config.PDF_POOL_WORKERS <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=Config.PDF_POOL_WORKERS,
+                mp_context=_context(),
+                initializer=_init_worker,
+            )
+        return _executor
+
+
+def _reset_executor(broken):
+    """Remplace un pool cassé (processus tué, mémoire épuisée...)"""
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_up(timeout=60.0):
+    """
+    Démarre tous les processus du pool et attend leur initialisation,
+    pour que le premier PDF ne paie pas le démarrage.
+
+    Returns:
+        dict: {'workers': int, 'ms': float} ou {'workers': 0} si désactivé
+    """
+    executor = get_executor()
+    if executor is None:
+        return {'workers': 0}
+    started = time.perf_counter()
+    # Une tâche par processus: le pool en démarre un nouveau tant qu'aucun n'est libre
+    futures = [executor.submit(_ready) for _ in range(Config.PDF_POOL_WORKERS)]
+    for future in futures:
+        future.result(timeout=timeout)
+    return {'workers': Config.PDF_POOL_WORKERS, 'ms': round((time.perf_counter() - started) * 1000, 1)}
+
+
+def shutdown():
+    """Arrête le pool (fin du worker)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _executer(fonction, *args, timeout=None):
+    """Exécute un rendu dans le pool: file bornée, délai maximal, pool cassé remplacé"""
+    executor = get_executor()
+    if executor is None:
+        return fonction(*args)
+
+    if not _slots.acquire(blocking=False):
+        return {'success': False, 'busy': True, 'error': 'Trop de PDF en cours de génération, réessayez'}
+
+    try:
+        future = executor.submit(fonction, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        _reset_executor(executor)
+        return {'success': False, 'error': 'Pool de rendu PDF redémarré, réessayez'}
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+
+    try:
+        return future.result(timeout=timeout or Config.PDF_RENDER_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        return {'success': False, 'timeout': True, 'error': 'Délai de génération du PDF dépassé'}
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        return {'success': False, 'error': 'Pool de rendu PDF redémarré, réessayez'}
+
+
+def render_pdf(data, totals=None, signature=None, renderer=None, timeout=None):
+    """
+    Rend une soumission en PDF hors du thread de la requête.
+
+    Args:
+        data: Données de la soumission (dict)
+        totals: Totaux déjà calculés (optionnel)
+        signature: Image de la signature en octets ou signature vectorielle (dict, optionnel)
+        renderer: 'canvas' ou 'platypus' (défaut: Config.PDF_RENDERER)
+        timeout: Délai maximal en secondes (défaut: Config.PDF_RENDER_TIMEOUT)
+
+    Returns:
+        dict: {'success': True, 'pdf': bytes, 'numero': str, 'renderer': str}
+              ou {'success': False, 'error': str, 'busy'|'timeout': True}
+    """
+    return _executer(_render, data, totals, signature, renderer, timeout=timeout)
+
+
+def render_body(data, totals=None, timeout=None):
+    """
+    Rend le corps à signer d'une soumission (voir pdf_generator.generate_soumission_corps)
+    hors du thread de la requête.
+
+    Returns:
+        dict: {'success': True, 'pdf': bytes ou None, 'numero': str, 'cadre': (page, x, y) ou None}
+              (cadre None: contenu hors mise en page fixe, pas de corps)
+              ou {'success': False, 'error': str, 'busy'|'timeout': True}
+    """
+    return _executer(_render_corps, data, totals, timeout=timeout)
+
+
+def wait_for_slot(fonction, *args, **kwargs):
+    """
+    Appelle fonction (render_pdf, pdf_cache.get_pdf, ...) et réessaie tant que
+    le pool est saturé, au plus PDF_RENDER_TIMEOUT: pour les travaux en lot,
+    qui passent après les demandes en direct au lieu d'échouer en 503.
+
+    Returns:
+        dict: Résultat de fonction (le dernier 'busy' si le délai est dépassé)
+    """
+    limite = time.monotonic() + Config.PDF_RENDER_TIMEOUT
+    while True:
+        result = fonction(*args, **kwargs)
+        if not result.get('busy') or time.monotonic() > limite:
+            return result
+        time.sleep(0.05)
+
+
+if __name__ == '__main__':
+    from pricing_engine import _compute_totals, calculate_totals, current_tables
+
+    data = {
+        'numero': 'BCS-BANC', 'langue_client': 'fr', 'client_nom': 'Marie Tremblay',
+        'type_service': 'Régulier (sans contrat)', 'nombre_heures': 3,
+        'description_service': 'Accompagnement et préparation du repas',
+    }
+    totals = calculate_totals(data)
+    tables = current_tables()
+    rendus = 40
+
+    def requete_legere():
+        # Une requête typique hors PDF: lectures réseau (GIL relâché) et un peu de calcul;
+        # chaque reprise du GIL attend les threads de rendu
+        started = time.perf_counter()
+        for h in range(10):
+            time.sleep(0.0005)
+            _compute_totals({**data, 'nombre_heures': 1 + h / 10}, tables)
+        return time.perf_counter() - started
+
+    def mesure(render):
+        """Latence médiane d'une requête légère pendant 4 threads de rendu"""
+        stop = threading.Event()
+        compte = [0]
+
+        def producteur():
+            while not stop.is_set() and compte[0] < rendus:
+                compte[0] += 1
+                render()
+
+        threads = [threading.Thread(target=producteur) for _ in range(4)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        latences = []
+        while any(t.is_alive() for t in threads):
+            latences.append(requete_legere())
+            time.sleep(0.005)
+        stop.set()
+        elapsed = time.perf_counter() - started
+        latences.sort()
+        return latences[len(latences) // 2] * 1e3, rendus / elapsed
+
+    seule = sorted(requete_legere() for _ in range(20))[10] * 1e3
+    print(f"Requête légère seule:             {seule:.2f} ms")
+
+    thread_ms, thread_rate = mesure(lambda: generate_soumission_pdf(data, io.BytesIO(), totals=totals))
+    print(f"Rendus dans les threads:           {thread_ms:.2f} ms (médiane), {thread_rate:.0f} PDF/s")
+
+    print(f"Préchauffage du pool:              {warm_up()}")
+    pool_ms, pool_rate = mesure(lambda: render_pdf(data, totals))
+    print(f"Rendus dans le pool de processus:  {pool_ms:.2f} ms (médiane), {pool_rate:.0f} PDF/s")
+    shutdown()
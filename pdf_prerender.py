@@ -0,0 +1,95 @@
+"""
+BIEN CHEZ SOI - Rendu spéculatif des PDF
+Dès qu'une session est créée ou modifiée, ses données sont en général
+définitives: le PDF non signé et, en rendu canvas, le corps à signer
+(pdf_cache) sont rendus en arrière-plan, pour que /api/generate-pdf les relise
+du cache au lieu d'attendre le rendu. Une modification plus récente de la même session remplace le rendu
+en attente (annulé) ou en cours (ses étapes restantes sont abandonnées).
+
+Un seul rendu spéculatif à la fois par worker: il n'occupe qu'une place de la
+file du pool PDF, le reste reste disponible pour les vraies demandes.
+"""
+
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from pdf_cache import get_body, get_pdf
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-prerender')
+_lock = threading.Lock()
+_pending = {}                   # session_id -> (génération, future)
+_generations = itertools.count(1)
+_stats = {'scheduled': 0, 'superseded': 0, 'rendered': 0, 'cached': 0, 'errors': 0}
+
+
+def _current(session_id, generation):
+    with _lock:
+        entry = _pending.get(session_id)
+        return entry is not None and entry[0] == generation
+
+
+def _count(key):
+    with _lock:
+        _stats[key] += 1
+
+
+def _run(session_id, generation, data, totals):
+    """Corps à signer puis PDF non signé, tant qu'aucune version plus récente n'est demandée"""
+    # Le corps à signer ne sert qu'au rendu canvas (signature apposée, voir pdf_cache)
+    steps = (get_body, get_pdf) if Config.PDF_RENDERER == 'canvas' else (get_pdf,)
+    try:
+        for step in steps:
+            if not _current(session_id, generation):
+                _count('superseded')
+                return
+            result = step(data, totals)
+            if not result['success']:
+                # Pool saturé ou rendu en échec: la vraie demande rendra le PDF
+                _count('errors')
+                return
+            _count('cached' if result['cached'] else 'rendered')
+    finally:
+        with _lock:
+            if _pending.get(session_id, (None,))[0] == generation:
+                del _pending[session_id]
+
+
+def schedule(session_id, data, totals):
+    """
+    Lance le rendu spéculatif d'une session (remplace celui déjà demandé).
+
+    Args:
+        session_id: Identifiant de la session
+        data: Données de la soumission, avec 'numero' et 'date' (copiées)
+        totals: Totaux de la session
+
+    Returns:
+        Future ou None si le rendu spéculatif est désactivé
+    """
+    if not Config.PDF_PRERENDER:
+        return None
+    with _lock:
+        generation = next(_generations)
+        previous = _pending.get(session_id)
+        if previous and previous[1].cancel():
+            _stats['superseded'] += 1
+        future = _executor.submit(_run, session_id, generation, dict(data), totals)
+        _pending[session_id] = (generation, future)
+        _stats['scheduled'] += 1
+    return future
+
+
+def cancel(session_id):
+    """Abandonne le rendu spéculatif d'une session (soumise ou expirée)"""
+    with _lock:
+        entry = _pending.pop(session_id, None)
+    if entry and entry[1].cancel():
+        _count('superseded')
+
+
+def get_stats():
+    """Compteurs des rendus spéculatifs (debug)"""
+    with _lock:
+        return dict(_stats, pending=len(_pending))
@@ -0,0 +1,133 @@
+"""
+BIEN CHEZ SOI - Signature apposée sur un PDF déjà rendu
+Le corps d'une soumission (pdf_generator.generate_soumission_corps: mise en
+page signée, cadre vide) est rendu une fois; chaque signature vectorielle y est
+ensuite apposée par une mise à jour incrémentale du PDF (ISO 32000, 7.5.6):
+un flux de contenu avec les traits, la page qui le référence et une nouvelle
+table xref sont ajoutés à la fin du fichier, sans relire ni réécrire le reste.
+
+Usage (banc d'essai: signature apposée vs rendus complets):
+    python pdf_stamp.py
+"""
+
+import re
+
+from reportlab.lib.rl_accel import fp_str
+
+from pdf_generator import BCS_NAVY
+
+STARTXREF = re.compile(rb'startxref\s+(\d+)\s+%%EOF\s*$')
+TRAILER = re.compile(rb'trailer\s*<<(.*?)>>\s*startxref', re.S)
+
+
+def _ref(texte, nom):
+    m = re.search(rb'/' + nom + rb'\s+(\d+)\s+0\s+R', texte)
+    if not m:
+        raise ValueError(f'/{nom} introuvable')
+    return int(m.group(1))
+
+
+def _objet(pdf, numero):
+    """Dictionnaire de l'objet (dernière définition dans le fichier)"""
+    debut = pdf.rindex(b'\n%d 0 obj' % numero) + 1
+    fin = pdf.index(b'endobj', debut)
+    return pdf[pdf.index(b'obj', debut) + 3:fin].strip()
+
+
+def _operateurs(signature, x, y):
+    """Traits de la signature en opérateurs PDF (mêmes réglages que pdf_generator._dessiner_traits)"""
+    ops = [b'q', fp_str(*BCS_NAVY.rgb()).encode() + b' RG',
+           fp_str(signature['epaisseur']).encode() + b' w', b'1 J', b'1 j']
+    for trait in signature['traits']:
+        chemin = [fp_str(x + trait[0], y + trait[1]) + ' m']
+        for i in range(2, len(trait), 2):
+            chemin.append(fp_str(x + trait[i], y + trait[i + 1]) + ' l')
+        ops.append(' '.join(chemin).encode() + b' S')
+    ops.append(b'Q')
+    return b'\n'.join(ops)
+
+
+def stamp_signature(pdf, cadre, signature):
+    """
+    Appose une signature vectorielle dans le cadre réservé d'un corps de soumission.
+
+    Args:
+        pdf: Corps de la soumission (bytes, rendu par generate_soumission_corps)
+        cadre: (page, x, y) du cadre de signature, retourné par generate_soumission_corps
+        signature: Signature vectorielle (dict, signature.vector_signature)
+
+    Returns:
+        bytes: PDF signé (le corps suivi de la mise à jour incrémentale)
+    """
+    page, x, y = cadre
+    startxref = int(STARTXREF.search(pdf).group(1))
+    trailer = TRAILER.findall(pdf)[-1]
+    taille = int(re.search(rb'/Size\s+(\d+)', trailer).group(1))
+
+    pages = _objet(pdf, _ref(_objet(pdf, _ref(trailer, b'Root')), b'Pages'))
+    kids = [int(n) for n in re.findall(rb'(\d+)\s+0\s+R', re.search(rb'/Kids\s*\[(.*?)\]', pages, re.S).group(1))]
+    numero_page = kids[page]
+    dict_page = _objet(pdf, numero_page)
+    contenu = re.search(rb'/Contents\s+(\d+\s+0\s+R|\[[^\]]*\])', dict_page, re.S)
+    anciens = contenu.group(1).strip(b'[] ')
+
+    # Contenu d'origine isolé entre q et Q: la signature repart de l'état graphique initial
+    n_q, n_signature = taille, taille + 1
+    flux = {n_q: b'q', n_signature: b'Q\n' + _operateurs(signature, x, y)}
+    nouvelle_page = (dict_page[:contenu.start(1)]
+                     + b'[ %d 0 R %s %d 0 R ]' % (n_q, anciens, n_signature)
+                     + dict_page[contenu.end(1):])
+
+    sortie = bytearray(pdf if pdf.endswith(b'\n') else pdf + b'\n')
+    positions = {}
+    for numero, donnees in flux.items():
+        positions[numero] = len(sortie)
+        sortie += b'%d 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n' % (numero, len(donnees), donnees)
+    positions[numero_page] = len(sortie)
+    sortie += b'%d 0 obj\n%s\nendobj\n' % (numero_page, nouvelle_page)
+
+    xref = len(sortie)
+    # Entrée 0 répétée: certains lecteurs attendent une table qui commence à l'objet 0
+    sortie += b'xref\n0 1\n0000000000 65535 f \n'
+    for numero in sorted(positions):
+        sortie += b'%d 1\n%010d 00000 n \n' % (numero, positions[numero])
+    entrees = [b'/Size %d' % (taille + 2), b'/Root %d 0 R' % _ref(trailer, b'Root'), b'/Prev %d' % startxref]
+    for nom in (b'Info', b'ID'):
+        m = re.search(rb'/' + nom + rb'\s*(\d+\s+0\s+R|\[[^\]]*\])', trailer)
+        if m:
+            entrees.append(b'/' + nom + b' ' + m.group(1).strip())
+    sortie += b'trailer\n<< ' + b' '.join(entrees) + b' >>\nstartxref\n%d\n%%%%EOF\n' % xref
+    return bytes(sortie)
+
+
+if __name__ == '__main__':
+    import io
+    import time
+    from pdf_generator import generate_soumission_corps, generate_soumission_pdf
+    from signature import prepare_signature, _encoder_traits
+
+    data = {'numero': 'BCS-BANC', 'date': '2026-01-15', 'langue_client': 'fr', 'client_nom': 'Marie Tremblay',
+            'type_service': 'Régulier (sans contrat)', 'nombre_heures': 3,
+            'description_service': 'Accompagnement et préparation du repas'}
+    signature = prepare_signature({'traits': _encoder_traits(
+        [[(360, 440), (600, 180), (840, 420), (1120, 140), (1440, 400), (1720, 260)]]
+    )})['signature']
+
+    def meilleur(fonction, repetitions=50):
+        best = float('inf')
+        for _ in range(repetitions):
+            started = time.perf_counter()
+            fonction()
+            best = min(best, time.perf_counter() - started)
+        return best * 1e3
+
+    buffer = io.BytesIO()
+    cadre = generate_soumission_corps(data, buffer)['cadre']
+    corps = buffer.getvalue()
+
+    platypus = meilleur(lambda: generate_soumission_pdf(data, io.BytesIO(), signature, renderer='platypus'))
+    canvas = meilleur(lambda: generate_soumission_pdf(data, io.BytesIO(), signature, renderer='canvas'))
+    tampon = meilleur(lambda: stamp_signature(corps, cadre, signature), 500)
+    print(f"Rendu complet platypus:   {platypus:7.3f} ms")
+    print(f"Rendu complet canvas:     {canvas:7.3f} ms")
+    print(f"Signature apposée:        {tampon:7.3f} ms  ({platypus / tampon:.0f}x moins qu'un rendu platypus)")
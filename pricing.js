@@ -0,0 +1,116 @@
+// ============================================================
+// BIEN CHEZ SOI — Évaluation locale des prix
+// Applique les règles publiées par /api/pricing-rules (pricing_engine.client_rules)
+// avec les mêmes opérations et les mêmes arrondis que calculate_totals (Python).
+//
+// Navigateur : window.BCSPricing.calculateTotals(rules, data)
+// Node       : node pricing.js corpus.json  (vérifie un corpus de pricing_corpus.py)
+// ============================================================
+(function (root) {
+    'use strict';
+
+    const has = (obj, key) => typeof key === 'string' && Object.prototype.hasOwnProperty.call(obj, key);
+
+    // round(x, 2) de Python : arrondi du développement décimal exact, égalité au pair
+    function pyRound2(x) {
+        const exact = Math.abs(x).toFixed(100);
+        const [ent, dec] = exact.split('.');
+        let cents = BigInt(ent + dec.slice(0, 2));
+        const rest = dec.slice(2);
+        const tie = rest[0] === '5' && /^0*$/.test(rest.slice(1));
+        if (rest[0] > '5' || (rest[0] === '5' && !tie) || (tie && cents % 2n === 1n)) cents += 1n;
+        const value = Number(cents) / 100;
+        return x < 0 ? -value : value;
+    }
+
+    // bisect_left
+    function firstAtLeast(seuils, h) {
+        let lo = 0, hi = seuils.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (seuils[mid] < h) lo = mid + 1; else hi = mid;
+        }
+        return lo;
+    }
+
+    function prixRegulier(r, heures) {
+        const h = Math.max(r.min_heures, heures);
+        if (h <= r.base_heures) return r.prix[firstAtLeast(r.seuils, h)];
+        return r.base + ((h - r.base_heures) * r.additionnel);
+    }
+
+    function prixBase(rules, data, kind, heures, nbPersonnes) {
+        switch (kind) {
+            case 'carte':
+                return Math.max(heures * rules.carte.taux, rules.carte.minimum);
+            case 'groupe': {
+                const g = rules.groupe;
+                if (nbPersonnes >= g.min) {
+                    const nb = Math.min(nbPersonnes, g.max);
+                    const h = Math.max(Math.ceil((0.4 * nb + 2) * 2) / 2, g.base_heures);
+                    return h * g.taux;
+                }
+                return Math.max(heures, g.base_heures) * g.taux;
+            }
+            case 'partage':
+                return rules.partage.prix;
+            case 'contrat': {
+                const nom = data.type_contrat || 'hebdomadaire';
+                return heures * (has(rules.contrats, nom) ? rules.contrats[nom] : rules.contrat_defaut);
+            }
+            case 'forfait': {
+                const nom = data.forfait_recurrent || 'Essentiel';
+                return has(rules.forfaits, nom) ? rules.forfaits[nom] : rules.forfait_defaut;
+            }
+            default:
+                return prixRegulier(rules.regulier, heures);
+        }
+    }
+
+    function calculateTotals(rules, data) {
+        const type = data.type_service === undefined ? 'Régulier (sans contrat)' : data.type_service;
+        const kind = has(rules.types, type) ? rules.types[type] : 'regulier';
+        const heures = data.nombre_heures || 2;
+        const nbPersonnes = data.nombre_personnes || 0;
+
+        const base = prixBase(rules, data, kind, heures, nbPersonnes);
+        let addonsTotal = 0;
+        for (const [field, prix] of rules.addons) {
+            if (data[field]) addonsTotal += prix;
+        }
+
+        const sousTotal = base + addonsTotal;
+        const tps = sousTotal * rules.tps;
+        const tvq = sousTotal * rules.tvq;
+        return {
+            prix_base: base,
+            addons_total: addonsTotal,
+            sous_total: sousTotal,
+            tps: pyRound2(tps),
+            tvq: pyRound2(tvq),
+            total: pyRound2(sousTotal + tps + tvq),
+        };
+    }
+
+    const api = { calculateTotals, pyRound2 };
+
+    if (typeof module !== 'undefined' && module.exports) {
+        module.exports = api;
+        if (require.main === module) {
+            const corpus = JSON.parse(require('fs').readFileSync(process.argv[2], 'utf8'));
+            let mismatches = 0;
+            for (const { data, expected } of corpus.cases) {
+                const got = calculateTotals(corpus.rules, data);
+                for (const key of Object.keys(expected)) {
+                    if (got[key] !== expected[key]) {
+                        if (mismatches++ < 10) console.log('Écart', key, JSON.stringify(data), got[key], expected[key]);
+                    }
+                }
+            }
+            console.log(`Cas: ${corpus.cases.length}, écarts: ${mismatches}`);
+            process.exit(mismatches ? 1 : 0);
+        }
+    } else {
+        root.BCSPricing = api;
+    }
+})(typeof window !== 'undefined' ? window : this);
@@ -0,0 +1,212 @@
+"""
+BIEN CHEZ SOI - Tarification vectorisée (NumPy)
+Reprix en lot de milliers de soumissions à partir de colonnes, avec les
+mêmes règles et les mêmes arrondis que pricing_engine.calculate_totals.
+
+Usage (banc d'essai + vérification de parité):
+    python pricing_batch.py --rows 100000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from pricing_engine import DISPATCH, calculate_totals, current_tables
+
+# Codes numériques des types de service (0 = type inconnu -> tarif régulier "Service")
+_CODE_DEFAUT = 0
+_TYPE_CODES = {type_service: code for code, type_service in enumerate(DISPATCH, start=1)}
+_CODE = {
+    'regulier': _TYPE_CODES['Régulier (sans contrat)'],
+    'carte': _TYPE_CODES['À la carte (Animation)'],
+    'groupe_soins': _TYPE_CODES['Groupe Soins RPA'],
+    'groupe_animation': _TYPE_CODES['Groupe Animation RPA'],
+    'partage': _TYPE_CODES['Partagé voisins RPA'],
+    'contrat': _TYPE_CODES['Contrat corporatif'],
+    'forfait': _TYPE_CODES['Forfait récurrent'],
+}
+
+
+def _float_column(values, n):
+    """Colonne numérique; None/absent -> NaN"""
+    if values is None:
+        return np.full(n, np.nan)
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'fiu':
+        return values.astype(float)
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _lookup_column(values, mapping, default, n):
+    """Colonne de libellés -> valeurs de la grille (défaut si absent ou inconnu)"""
+    if values is None:
+        return np.full(n, default, dtype=float)
+    return np.array([mapping.get(v, default) if isinstance(v, str) else default for v in values],
+                    dtype=float)
+
+
+def _prix_regulier(tables, heures):
+    heures = np.maximum(tables.regulier_min_heures, heures)
+    seuils = np.asarray(tables.regulier_seuils, dtype=float)
+    prix_paliers = np.asarray(tables.regulier_prix)
+    index = np.searchsorted(seuils, np.minimum(heures, seuils[-1]), side='left')
+    return np.where(
+        heures <= tables.regulier_base_heures,
+        prix_paliers[index],
+        tables.regulier_base + ((heures - tables.regulier_base_heures) * tables.regulier_additionnel),
+    )
+
+
+def price_batch(type_service, heures, personnes=None, forfait=None, contrat=None,
+                addons=None, tables=None):
+    """
+    Calcule les totaux d'un lot de soumissions à partir de colonnes.
+
+    Args:
+        type_service: Séquence des types de service
+        heures: Séquence des nombres d'heures (None/0 -> 2h, comme le calcul unitaire)
+        personnes: Séquence des nombres de personnes / voisins (optionnel)
+        forfait: Séquence des noms de forfait récurrent (optionnel)
+        contrat: Séquence des types de contrat (optionnel)
+        addons: {clé d'add-on: séquence de booléens}, ex. {'urgence': [...]}
+        tables: Grille compilée (par défaut la grille active)
+
+    Returns:
+        dict: Tableaux NumPy prix_base, addons_total, sous_total, tps, tvq, total
+    """
+    tables = tables or current_tables()
+    n = len(type_service)
+
+    codes = np.array(
+        [_TYPE_CODES.get(t, _CODE_DEFAUT) if isinstance(t, str) else _CODE_DEFAUT for t in type_service],
+        dtype=np.int8,
+    )
+
+    h = _float_column(heures, n)
+    h = np.where(np.isnan(h) | (h == 0), 2.0, h)
+
+    p = _float_column(personnes, n)
+    p = np.where(np.isnan(p), 0.0, p)
+
+    # --- Prix de base par type ---
+    prix_base = _prix_regulier(tables, h)  # régulier et type inconnu
+
+    carte = np.maximum(h * tables.carte_taux, tables.carte_minimum)
+
+    nb_groupe = np.minimum(p, tables.groupe_max)
+    heures_groupe = np.maximum(np.ceil((0.4 * nb_groupe + 2) * 2) / 2, tables.groupe_base_heures)
+    groupe = np.where(
+        p >= tables.groupe_min,
+        heures_groupe * tables.groupe_taux,
+        np.maximum(h, tables.groupe_base_heures) * tables.groupe_taux,
+    )
+
+    taux_contrat = _lookup_column(
+        contrat, {nom: c['taux'] for nom, c in tables.contrats.items()},
+        tables.contrat_defaut['taux'], n,
+    )
+    prix_forfait = _lookup_column(
+        forfait, {nom: entry[0] for nom, entry in tables.forfaits.items()},
+        tables.forfait_defaut['prix_mois'], n,
+    )
+
+    prix_base = np.select(
+        [
+            codes == _CODE['carte'],
+            (codes == _CODE['groupe_soins']) | (codes == _CODE['groupe_animation']),
+            codes == _CODE['partage'],
+            codes == _CODE['contrat'],
+            codes == _CODE['forfait'],
+        ],
+        [carte, groupe, np.full(n, float(tables.partage_prix)), h * taux_contrat, prix_forfait],
+        default=prix_base,
+    )
+
+    # --- Add-ons (même ordre d'addition que le calcul unitaire) ---
+    addons = addons or {}
+    addons_total = np.zeros(n)
+    for field, _, prix, _ in tables.addons:
+        flags = addons.get(field[len('addon_'):])
+        if flags is not None:
+            addons_total = addons_total + np.where(np.asarray(flags, dtype=bool), prix, 0.0)
+
+    sous_total = prix_base + addons_total
+
+    # --- Taxes: arrondi Python exact, une fois par sous-total distinct ---
+    distincts, inverse = np.unique(sous_total, return_inverse=True)
+    taxes = np.array([tables.taxes(float(v)) for v in distincts]).reshape(-1, 3)
+
+    return {
+        'prix_base': prix_base,
+        'addons_total': addons_total,
+        'sous_total': sous_total,
+        'tps': taxes[inverse, 0],
+        'tvq': taxes[inverse, 1],
+        'total': taxes[inverse, 2],
+    }
+
+
+def columns_from_records(records):
+    """Convertit une liste de soumissions (dicts) en colonnes pour price_batch"""
+    return {
+        'type_service': [r.get('type_service', 'Régulier (sans contrat)') for r in records],
+        'heures': [r.get('nombre_heures') for r in records],
+        'personnes': [r.get('nombre_personnes') for r in records],
+        'forfait': [r.get('forfait_recurrent') for r in records],
+        'contrat': [r.get('type_contrat') for r in records],
+        'addons': {
+            field[len('addon_'):]: [bool(r.get(field)) for r in records]
+            for field, _, _, _ in current_tables().addons
+        },
+    }
+
+
+def _random_records(rows, seed=0):
+    """Soumissions aléatoires couvrant tous les types, durées et add-ons"""
+    rng = np.random.default_rng(seed)
+    types = list(DISPATCH) + ['Autre']
+    heures = [None, 1, 2, 2.5, 3, 4, 5, 6, 7.5, 8, 12]
+    personnes = [None, 0, 2, 3, 4, 5, 8, 12, 20, 25]
+    forfaits = [None, 'Essentiel', 'Confort', 'Premium']
+    contrats = [None, 'hebdomadaire', 'mensuel', 'annuel']
+    records = []
+    for _ in range(rows):
+        record = {
+            'type_service': types[rng.integers(len(types))],
+            'nombre_heures': heures[rng.integers(len(heures))],
+            'nombre_personnes': personnes[rng.integers(len(personnes))],
+            'forfait_recurrent': forfaits[rng.integers(len(forfaits))],
+            'type_contrat': contrats[rng.integers(len(contrats))],
+        }
+        for field, _, _, _ in current_tables().addons:
+            record[field] = bool(rng.random() < 0.2)
+        records.append(record)
+    return records
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Banc d\'essai de la tarification vectorisée')
+    arg_parser.add_argument('--rows', type=int, default=100_000)
+    args = arg_parser.parse_args()
+
+    records = _random_records(args.rows)
+    columns = columns_from_records(records)
+
+    started = time.perf_counter()
+    scalar = [calculate_totals(r) for r in records]
+    scalar_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = price_batch(**columns)
+    batch_time = time.perf_counter() - started
+
+    mismatches = sum(
+        1 for i, totals in enumerate(scalar)
+        if any(totals[key] != batch[key][i] for key in ('prix_base', 'sous_total', 'tps', 'tvq', 'total'))
+    )
+
+    print(f"Lignes:          {args.rows}")
+    print(f"Calcul unitaire: {scalar_time * 1000:.1f} ms")
+    print(f"Calcul en lot:   {batch_time * 1000:.1f} ms (x{scalar_time / batch_time:.1f})")
+    print(f"Écarts:          {mismatches}")
+    raise SystemExit(1 if mismatches else 0)
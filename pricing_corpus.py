@@ -0,0 +1,62 @@
+"""
+BIEN CHEZ SOI - Corpus de parité Python / navigateur
+Génère les règles compactes (client_rules) et les totaux attendus de
+calculate_totals pour chaque type de service, chaque combinaison d'add-ons
+et un éventail de durées, personnes, forfaits et contrats.
+pricing.js doit retrouver exactement les mêmes montants.
+
+Usage:
+    python pricing_corpus.py corpus.json
+    node pricing.js corpus.json
+"""
+
+import argparse
+import itertools
+import json
+
+from pricing_engine import DISPATCH, calculate_totals, client_rules, current_tables
+
+HEURES = [None, 0, 1, 2, 2.5, 3, 4, 4.5, 5, 8, 12]
+PERSONNES = [None, 0, 2, 4, 5, 7.5, 8, 12, 20, 25]
+EXPECTED_FIELDS = ('prix_base', 'addons_total', 'sous_total', 'tps', 'tvq', 'total')
+
+
+def build_corpus(tables=None):
+    """
+    Returns:
+        dict: {'rules': client_rules, 'cases': [{'data': dict, 'expected': dict}]}
+    """
+    tables = tables or current_tables()
+    addon_fields = [field for field, _, _, _ in tables.addons]
+    types = list(DISPATCH) + ['Autre', None]
+
+    cases = []
+    for type_service in types:
+        variants = [{}]
+        if type_service == 'Forfait récurrent':
+            variants = [{'forfait_recurrent': nom} for nom in [None, *tables.forfaits, 'Autre']]
+        elif type_service == 'Contrat corporatif':
+            variants = [{'type_contrat': nom} for nom in [None, *tables.contrats, 'autre']]
+
+        for variant, heures, personnes, flags in itertools.product(
+            variants, HEURES, PERSONNES, itertools.product((False, True), repeat=len(addon_fields))
+        ):
+            data = {'nombre_heures': heures, 'nombre_personnes': personnes, **variant}
+            if type_service is not None:
+                data['type_service'] = type_service
+            data.update(zip(addon_fields, flags))
+            totals = calculate_totals(data, tables)
+            cases.append({'data': data, 'expected': {key: totals[key] for key in EXPECTED_FIELDS}})
+
+    return {'rules': client_rules(tables), 'cases': cases}
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Corpus de parité des prix (Python / pricing.js)')
+    arg_parser.add_argument('output', help='Fichier JSON du corpus')
+    args = arg_parser.parse_args()
+
+    corpus = build_corpus()
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, ensure_ascii=False)
+    print(f"{len(corpus['cases'])} cas écrits dans {args.output}")
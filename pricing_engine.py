@@ -0,0 +1,506 @@
+"""
+BIEN CHEZ SOI - Moteur de tarification compilé
+La grille tarifaire (rate_card.json: régulier, à la carte, groupes, partagé,
+contrats, forfaits, add-ons) est compilée en tables de correspondance et en
+table de dispatch par type de service.
+Produit exactement les mêmes totaux que l'ancienne chaîne if/elif.
+
+Rechargement à chaud: chaque worker vérifie la date du fichier (au plus toutes
+les RATE_CARD_CHECK_INTERVAL s) et remplace atomiquement sa grille compilée.
+Chaque grille porte une version (libellé + empreinte du contenu).
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import repeat
+from types import SimpleNamespace
+
+from config import Config
+
+TYPE_REGULIER = 'Régulier (sans contrat)'
+TYPES_GROUPE = ('Groupe Soins RPA', 'Groupe Animation RPA')
+HEURES_PRECOMPILEES = 24
+TAXES_CACHE_MAX = 4096
+TOTALS_CACHE_MAX = 2048
+SNAPSHOTS_MAX = 8  # grilles conservées pour les sessions en cours
+_ABSENT = object()  # champ absent de data (type_service absent = Régulier, None = type inconnu)
+
+logger = logging.getLogger(__name__)
+
+
+class PricingTables:
+    """Grille tarifaire compilée, immuable après compilation"""
+
+    def __init__(self, source, version='config'):
+        self.version = version
+        self.source = source  # grille brute (prompt du parser, /api/pricing)
+        # --- Régulier: paliers triés (heures, prix), puis tarif additionnel ---
+        paliers = sorted((p['heures'], p['prix']) for p in source.TARIF_REGULIER.values())
+        self.regulier_seuils = tuple(h for h, _ in paliers)
+        self.regulier_prix = tuple(float(p) for _, p in paliers)
+        self.regulier_min_heures = self.regulier_seuils[0]
+        self.regulier_base = float(source.TARIF_BASE_4H)
+        self.regulier_base_heures = self.regulier_seuils[-1]
+        self.regulier_additionnel = float(source.TARIF_HEURE_ADDITIONNEL)
+
+        # --- À la carte ---
+        self.carte_taux = source.TARIF_AFFICHE
+        self.carte_minimum = min(s['tarif'] for s in source.SERVICES_CARTE.values())
+        self.carte_label = f"h × {source.TARIF_AFFICHE:.0f}$/h"
+
+        # --- Groupes RPA: une entrée par nombre de personnes admis ---
+        self.groupe_min = source.GROUPE_MIN_PERSONNES
+        self.groupe_max = source.GROUPE_MAX_PERSONNES
+        self.groupe_taux = source.GROUPE_TAUX_HORAIRE
+        self.groupe_base_heures = source.GROUPE_BASE_HEURES
+        self.groupe_taux_label = f"h × {source.GROUPE_TAUX_HORAIRE:.0f}$/h"
+        self.groupes = {
+            n: self._compile_groupe(n)
+            for n in range(self.groupe_min, self.groupe_max + 1)
+        }
+
+        # --- Partagé voisins: une entrée par nombre de voisins admis ---
+        self.partage_min = source.PARTAGE_MIN_VOISINS
+        self.partage_max = source.PARTAGE_MAX_VOISINS
+        self.partage_prix = source.PARTAGE_BLOC_PRIX
+        self.partage_heures = source.PARTAGE_BLOC_HEURES
+        self.partages = {
+            n: self._compile_partage(n)
+            for n in range(self.partage_min, self.partage_max + 1)
+        }
+
+        # --- Contrats et forfaits ---
+        self.contrats = {nom: dict(c) for nom, c in source.CONTRATS.items()}
+        self.contrat_defaut = self.contrats['hebdomadaire']
+        self.forfaits = {
+            nom: (
+                f['prix_mois'],
+                f"Forfait {nom} — {f['heures_mois']}h/mois ({f['frequence']})",
+            )
+            for nom, f in source.FORFAITS_RECURRENTS.items()
+        }
+        self.forfait_defaut = source.FORFAITS_RECURRENTS['Essentiel']
+
+        # --- Add-ons: (champ, nom, prix, libellé de ligne) dans l'ordre de la grille ---
+        self.addons = tuple(
+            (f'addon_{key}', info['nom'], info['prix'], f"+ {info['nom']}")
+            for key, info in source.ADDONS.items()
+        )
+        # Champs lus par le calcul (clé du cache des totaux)
+        self.champs_prix = ('type_service', 'nombre_heures', 'nombre_personnes', 'type_contrat',
+                            'forfait_recurrent') + tuple(field for field, _, _, _ in self.addons)
+
+        self.tps_rate = source.TPS_RATE
+        self.tvq_rate = source.TVQ_RATE
+
+        # --- Lignes précalculées pour les durées entières usuelles ---
+        # (description, prix_base), soit directement la ligne de détail;
+        # les durées non entières sont calculées à la volée
+        heures_usuelles = range(1, HEURES_PRECOMPILEES + 1)
+        self.lignes_regulier = {
+            h: (f"Service régulier — {h}h", self.prix_regulier(h)) for h in heures_usuelles
+        }
+        self.lignes_defaut = {
+            h: (f"Service — {h}h", self.prix_regulier(h)) for h in heures_usuelles
+        }
+        self.lignes_carte = {
+            h: (f"Animation & Compagnie — {h}{self.carte_label}", max(h * self.carte_taux, self.carte_minimum))
+            for h in heures_usuelles
+        }
+        self.lignes_contrat = {
+            (nom, h): (f"Contrat {nom} — {h}h × {c['taux']:.0f}$/h", h * c['taux'])
+            for nom, c in self.contrats.items() for h in heures_usuelles
+        }
+
+        self.lignes_groupe = {
+            (type_service, n): (
+                (f"{type_service} — {n} pers. × {self.groupes[n][0]}h", self.groupes[n][1]),
+                (self.groupes[n][2], 0),
+            )
+            for type_service in TYPES_GROUPE
+            for n in range(self.groupe_min, self.groupe_max + 1)
+        }
+
+        # Taxes par sous-total (peu de valeurs distinctes en pratique)
+        self._taxes = {}
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'Grille tarifaire {self.version} en lecture seule')
+        super().__setattr__(name, value)
+
+    def taxes(self, sous_total):
+        """(tps, tvq, total) arrondis au cent, mémorisés par sous-total"""
+        result = self._taxes.get(sous_total)
+        if result is None or type(sous_total) is not float:
+            tps = sous_total * self.tps_rate
+            tvq = sous_total * self.tvq_rate
+            result = (round(tps, 2), round(tvq, 2), round(sous_total + tps + tvq, 2))
+            if type(sous_total) is float and len(self._taxes) < TAXES_CACHE_MAX:
+                self._taxes[sous_total] = result
+        return result
+
+    def _compile_groupe(self, nb_personnes):
+        heures = math.ceil((0.4 * nb_personnes + 2) * 2) / 2
+        heures = max(heures, self.groupe_base_heures)
+        prix_total = heures * self.groupe_taux
+        return (heures, prix_total, f"  ({round(prix_total / nb_personnes, 2):.2f}$/personne)")
+
+    def _compile_partage(self, nb_voisins):
+        cout = round(self.partage_prix / nb_voisins, 2)
+        return (
+            self.partage_prix,
+            f"Bloc partagé {nb_voisins} voisins — {self.partage_heures}h",
+            f"  ({cout:.2f}$/voisin)",
+        )
+
+    def prix_regulier(self, heures):
+        """Prix régulier sans contrat (paliers, puis tarif additionnel)"""
+        heures = max(self.regulier_min_heures, heures)
+        if heures <= self.regulier_base_heures:
+            return self.regulier_prix[bisect_left(self.regulier_seuils, heures)]
+        return self.regulier_base + ((heures - self.regulier_base_heures) * self.regulier_additionnel)
+
+
+# ============================================================
+# CALCUL PAR TYPE DE SERVICE
+# Chaque fonction retourne (prix_base, description_prix, lignes, heures)
+# ============================================================
+
+def _prix_regulier(tables, data, type_service, heures, nb_personnes):
+    entry = tables.lignes_regulier.get(heures) if type(heures) is int else None
+    if entry is None:
+        entry = (f"Service régulier — {heures}h", tables.prix_regulier(heures))
+    description, prix_base = entry
+    return prix_base, description, [entry], heures
+
+
+def _prix_carte(tables, data, type_service, heures, nb_personnes):
+    entry = tables.lignes_carte.get(heures) if type(heures) is int else None
+    if entry is None:
+        entry = (f"Animation & Compagnie — {heures}{tables.carte_label}",
+                 max(heures * tables.carte_taux, tables.carte_minimum))
+    description, prix_base = entry
+    return prix_base, description, [entry], heures
+
+
+def _prix_groupe(tables, data, type_service, heures, nb_personnes):
+    if nb_personnes >= tables.groupe_min:
+        lignes = tables.lignes_groupe.get((type_service, nb_personnes)) if type(nb_personnes) is int else None
+        if lignes is None:
+            entry = tables.groupes.get(min(nb_personnes, tables.groupe_max))
+            if entry is None:  # nombre de personnes non entier
+                entry = tables._compile_groupe(nb_personnes)
+            groupe_heures, prix_base, ligne_personne = entry
+            description = f"{type_service} — {nb_personnes} pers. × {groupe_heures}h"
+            lignes = ((description, prix_base), (ligne_personne, 0))
+        return lignes[0][1], lignes[0][0], list(lignes), heures
+
+    # Fallback: tarif horaire groupe
+    heures = max(heures, tables.groupe_base_heures)
+    prix_base = heures * tables.groupe_taux
+    description = f"{type_service} — {heures}{tables.groupe_taux_label}"
+    return prix_base, description, [(description, prix_base)], heures
+
+
+def _prix_partage(tables, data, type_service, heures, nb_personnes):
+    nb_voisins = data.get('nombre_personnes', 4) or 4
+    nb_voisins = max(tables.partage_min, min(nb_voisins, tables.partage_max))
+    # Le libellé affiche le nombre tel quel: seules les valeurs entières sont précompilées
+    entry = tables.partages.get(nb_voisins) if type(nb_voisins) is int else None
+    if entry is None:
+        entry = tables._compile_partage(nb_voisins)
+    prix_base, description, ligne_voisin = entry
+    return prix_base, description, [(description, prix_base), (ligne_voisin, 0)], heures
+
+
+def _prix_contrat(tables, data, type_service, heures, nb_personnes):
+    type_contrat = data.get('type_contrat', 'hebdomadaire') or 'hebdomadaire'
+    entry = tables.lignes_contrat.get((type_contrat, heures)) if type(heures) is int else None
+    if entry is None:
+        contrat = tables.contrats.get(type_contrat, tables.contrat_defaut)
+        prix_base = heures * contrat['taux'] if heures else contrat['total_min']
+        entry = (f"Contrat {type_contrat} — {heures}h × {contrat['taux']:.0f}$/h", prix_base)
+    description, prix_base = entry
+    return prix_base, description, [entry], heures
+
+
+def _prix_forfait(tables, data, type_service, heures, nb_personnes):
+    forfait_nom = data.get('forfait_recurrent', 'Essentiel') or 'Essentiel'
+    entry = tables.forfaits.get(forfait_nom)
+    if entry is None:  # nom inconnu: prix de l'Essentiel, libellé tel que reçu
+        f = tables.forfait_defaut
+        entry = (f['prix_mois'], f"Forfait {forfait_nom} — {f['heures_mois']}h/mois ({f['frequence']})")
+    prix_base, description = entry
+    return prix_base, description, [(description, prix_base)], heures
+
+
+def _prix_defaut(tables, data, type_service, heures, nb_personnes):
+    entry = tables.lignes_defaut.get(heures) if type(heures) is int else None
+    if entry is None:
+        entry = (f"Service — {heures}h", tables.prix_regulier(heures))
+    description, prix_base = entry
+    return prix_base, description, [entry], heures
+
+
+DISPATCH = {
+    'Régulier (sans contrat)': _prix_regulier,
+    'À la carte (Animation)': _prix_carte,
+    'Groupe Soins RPA': _prix_groupe,
+    'Groupe Animation RPA': _prix_groupe,
+    'Partagé voisins RPA': _prix_partage,
+    'Contrat corporatif': _prix_contrat,
+    'Forfait récurrent': _prix_forfait,
+}
+assert set(DISPATCH) == set(Config.TYPES_SERVICE), 'DISPATCH doit couvrir Config.TYPES_SERVICE'
+
+# Nom de chaque règle pour l'évaluateur du navigateur (pricing.js)
+_CLIENT_KINDS = {
+    _prix_regulier: 'regulier',
+    _prix_carte: 'carte',
+    _prix_groupe: 'groupe',
+    _prix_partage: 'partage',
+    _prix_contrat: 'contrat',
+    _prix_forfait: 'forfait',
+}
+
+
+def client_rules(tables):
+    """
+    Règles compilées sous forme compacte (JSON) pour pricing.js: le navigateur
+    recalcule prix_base, sous_total, TPS, TVQ et total exactement comme
+    calculate_totals, sans aller-retour serveur.
+    """
+    return {
+        'version': tables.version,
+        'types': {type_service: _CLIENT_KINDS[handler] for type_service, handler in DISPATCH.items()},
+        'regulier': {
+            'seuils': list(tables.regulier_seuils),
+            'prix': list(tables.regulier_prix),
+            'min_heures': tables.regulier_min_heures,
+            'base_heures': tables.regulier_base_heures,
+            'base': tables.regulier_base,
+            'additionnel': tables.regulier_additionnel,
+        },
+        'carte': {'taux': tables.carte_taux, 'minimum': tables.carte_minimum},
+        'groupe': {
+            'min': tables.groupe_min,
+            'max': tables.groupe_max,
+            'taux': tables.groupe_taux,
+            'base_heures': tables.groupe_base_heures,
+        },
+        'partage': {'prix': tables.partage_prix},
+        'contrats': {nom: c['taux'] for nom, c in tables.contrats.items()},
+        'contrat_defaut': tables.contrat_defaut['taux'],
+        'forfaits': {nom: entry[0] for nom, entry in tables.forfaits.items()},
+        'forfait_defaut': tables.forfait_defaut['prix_mois'],
+        'addons': [[field, prix] for field, _, prix, _ in tables.addons],
+        'tps': tables.tps_rate,
+        'tvq': tables.tvq_rate,
+    }
+
+
+def compile_rate_card(source=Config, version='config'):
+    """Compile une grille tarifaire (Config ou objet aux mêmes attributs)"""
+    return PricingTables(source, version)
+
+
+def load_rate_card(path=None):
+    """
+    Lit et compile un fichier de grille tarifaire (JSON, mêmes clés que Config).
+    La version combine le champ "version" du fichier et l'empreinte du contenu:
+    toute modification des prix donne une nouvelle version.
+    """
+    path = path or Config.RATE_CARD_PATH
+    with open(path, 'rb') as f:
+        raw = f.read()
+    card = json.loads(raw)
+    version = f"{card.get('version', 'grille')}-{hashlib.sha256(raw).hexdigest()[:8]}"
+    if set(card['ADDONS']) != set(Config.ADDONS):
+        raise ValueError('la liste des add-ons ne peut changer sans redémarrage')
+    return compile_rate_card(SimpleNamespace(**card), version)
+
+
+# --- Grille active (remplacée atomiquement par simple affectation) ---
+_snapshots = OrderedDict()
+_reload_lock = threading.Lock()
+_current = None
+_file_stamp = None
+_next_check = 0.0
+
+
+def _install(tables):
+    global _current
+    _snapshots[tables.version] = tables
+    _snapshots.move_to_end(tables.version)
+    while len(_snapshots) > SNAPSHOTS_MAX:
+        _snapshots.popitem(last=False)
+    _current = tables
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def current_tables():
+    """
+    Grille active. Recharge le fichier s'il a changé depuis la dernière
+    vérification; en cas d'erreur, la grille précédente reste en place.
+    """
+    global _next_check, _file_stamp
+    now = time.monotonic()
+    if now >= _next_check and _reload_lock.acquire(blocking=False):
+        try:
+            _next_check = now + Config.RATE_CARD_CHECK_INTERVAL
+            stamp = _file_signature(Config.RATE_CARD_PATH)
+            if stamp != _file_stamp:
+                _file_stamp = stamp  # un fichier invalide n'est signalé qu'une fois
+                _install(load_rate_card(Config.RATE_CARD_PATH))
+        except Exception as e:
+            logger.error("Grille tarifaire non rechargée (%s); version %s conservée", e, _current.version)
+        finally:
+            _reload_lock.release()
+    return _current
+
+
+def get_tables(version=None):
+    """Grille d'une version donnée si encore chargée, sinon la grille active"""
+    return _snapshots.get(version) or current_tables()
+
+
+_file_stamp = _file_signature(Config.RATE_CARD_PATH)
+_install(load_rate_card(Config.RATE_CARD_PATH))
+
+
+@lru_cache(maxsize=TOTALS_CACHE_MAX, typed=True)
+def _cached_totals(tables, *valeurs):
+    # typed=True: 2 et 2.0 (ou True et 1) donnent des libellés différents ("2h" / "2.0h")
+    data = {champ: valeur for champ, valeur in zip(tables.champs_prix, valeurs) if valeur is not _ABSENT}
+    return _compute_totals(data, tables)
+
+
+def calculate_totals(data, tables=None):
+    """
+    Calcule les totaux avec taxes TPS/TVQ selon le type de service BCS.
+    Mémoïsé (LRU) sur les seuls champs de prix: modifier le nom, l'adresse ou
+    les notes ne recalcule rien. Chaque appel retourne sa propre copie du dict;
+    les lignes (details_lignes, addon_details) sont des tuples, partagés sans risque.
+
+    Args:
+        data: Données de la soumission
+        tables: Grille compilée (par défaut la grille active)
+
+    Returns:
+        dict: Détail des prix et totaux (dont pricing_version)
+    """
+    tables = tables or current_tables()
+    try:
+        totals = _cached_totals(tables, *map(data.get, tables.champs_prix, repeat(_ABSENT)))
+    except TypeError:
+        # Valeur non hachable (ex. liste renvoyée par le parsing): calcul direct
+        return _compute_totals(data, tables)
+    return totals.copy()
+
+
+def share_range(type_service, tables=None):
+    """
+    Nombre de participants admis pour répartir un service en parts individuelles
+    (Partagé voisins RPA, Groupes RPA): (min, max), ou None si le service n'est pas partageable.
+    """
+    tables = tables or current_tables()
+    handler = DISPATCH.get(type_service) if isinstance(type_service, str) else None
+    if handler is _prix_partage:
+        return tables.partage_min, tables.partage_max
+    if handler is _prix_groupe:
+        return tables.groupe_min, tables.groupe_max
+    return None
+
+
+def share_totals(totals, nb_parts, tables=None):
+    """
+    Totaux de chaque participant d'un service partagé ou de groupe. Le sous-total
+    est réparti à parts égales au cent près (les premières parts prennent les
+    cents restants); TPS et TVQ sont calculées sur chaque part.
+
+    Args:
+        totals: Totaux du service commun (calculate_totals, non modifiés)
+        nb_parts: Nombre de participants
+        tables: Grille compilée (par défaut la grille active)
+
+    Returns:
+        list: nb_parts totaux (même forme que calculate_totals): lignes du service
+              commun avec leur montant dans le libellé, puis la part du participant
+    """
+    tables = tables or current_tables()
+    lignes = [(f"{desc.rstrip()} ({montant:.2f} $)" if montant > 0 else desc, 0)
+              for desc, montant in totals['details_lignes']]
+    base, reste = divmod(round(totals['sous_total'] * 100), nb_parts)
+
+    parts = []
+    for i in range(nb_parts):
+        part = (base + (i < reste)) / 100
+        tps, tvq, total = tables.taxes(part)
+        parts.append(dict(
+            totals,
+            details_lignes=(*lignes, (f"Votre part — 1/{nb_parts}", part)),
+            prix_base=round(totals['prix_base'] / nb_parts, 2),
+            addons_total=round(totals['addons_total'] / nb_parts, 2),
+            sous_total=part, tps=tps, tvq=tvq, total=total,
+        ))
+    return parts
+
+
+def totals_cache_info():
+    """Statistiques du cache des totaux (hits, misses, maxsize, currsize)"""
+    return _cached_totals.cache_info()._asdict()
+
+
+def _compute_totals(data, tables):
+    """Calcul des totaux sur une grille compilée"""
+    type_service = data.get('type_service', TYPE_REGULIER)
+    heures = data.get('nombre_heures', 2) or 2
+    nb_personnes = data.get('nombre_personnes', 0) or 0
+
+    handler = DISPATCH.get(type_service, _prix_defaut) if isinstance(type_service, str) else _prix_defaut
+    prix_base, description_prix, details_lignes, heures = handler(
+        tables, data, type_service, heures, nb_personnes
+    )
+
+    # --- Add-ons ---
+    addons_total = 0.00
+    addon_details = []
+    for field, nom, prix, ligne in tables.addons:
+        if data.get(field, False):
+            addons_total += prix
+            addon_details.append((nom, prix))
+            details_lignes.append((ligne, prix))
+
+    # --- Calculs finaux (TPS et TVQ arrondies au cent) ---
+    sous_total = prix_base + addons_total
+    tps, tvq, total = tables.taxes(sous_total)
+
+    return {
+        'prix_base': prix_base,
+        'description_prix': description_prix,
+        'details_lignes': tuple(details_lignes),
+        'addons_total': addons_total,
+        'addon_details': tuple(addon_details),
+        'sous_total': sous_total,
+        'tps': tps,
+        'tvq': tvq,
+        'total': total,
+        'type_service': type_service,
+        'heures': heures,
+        'nb_personnes': nb_personnes,
+        'pricing_version': tables.version,
+    }
@@ -0,0 +1,187 @@
+"""
+BIEN CHEZ SOI - Option la moins chère pour un besoin récurrent
+Pour un besoin exprimé en visites par semaine, heures par visite, nombre de
+personnes et suppléments, évalue chaque type de service applicable avec le
+moteur de tarification et classe les options par coût mensuel (taxes incluses).
+
+Convention: 4 semaines par mois, comme la grille (Essentiel 1x/semaine = 8h/mois,
+contrat mensuel 16h/mois = 4h/semaine).
+
+Usage (banc d'essai):
+    python pricing_optimizer.py
+"""
+
+import math
+import time
+from functools import lru_cache
+
+from pricing_engine import calculate_totals, current_tables
+
+SEMAINES_PAR_MOIS = 4
+TYPE_REGULIER = 'Régulier (sans contrat)'
+TYPE_CARTE = 'À la carte (Animation)'
+TYPE_PARTAGE = 'Partagé voisins RPA'
+TYPE_CONTRAT = 'Contrat corporatif'
+TYPE_FORFAIT = 'Forfait récurrent'
+TYPES_GROUPE = ('Groupe Soins RPA', 'Groupe Animation RPA')
+# Bornes du besoin (au-delà, la demande n'a pas de sens pour un service à domicile)
+VISITES_MAX = 14        # 2 visites par jour
+HEURES_VISITE_MAX = 24
+PERSONNES_MAX = 100
+
+
+@lru_cache(maxsize=8)
+def _catalogue(tables):
+    """Paramètres des options récurrentes, précalculés une fois par grille"""
+    contrats = []
+    for nom, c in tables.contrats.items():
+        if 'min_heures_sem' in c:
+            contrats.append((nom, 'semaine', c['min_heures_sem']))
+        else:
+            contrats.append((nom, 'mois', c.get('min_heures_mois', 0)))
+    forfaits = sorted(
+        (f['heures_mois'], nom) for nom, f in tables.source.FORFAITS_RECURRENTS.items()
+    )
+    return tuple(contrats), tuple(forfaits)
+
+
+def _option(type_service, libelle, cout_mensuel, personnes, factures, totals):
+    cout_mensuel = round(cout_mensuel, 2)
+    return {
+        'type_service': type_service,
+        'option': libelle,
+        'cout_mensuel': cout_mensuel,
+        'cout_par_personne': round(cout_mensuel / max(personnes, 1), 2),
+        'factures_par_mois': factures,
+        'total_par_facture': totals['total'],
+        'description': totals['description_prix'],
+    }
+
+
+def _cheapest_options(tables, visites_semaine, heures_visite, personnes, addons):
+    contrats, forfaits = _catalogue(tables)
+    addon_flags = dict(zip((field for field, _, _, _ in tables.addons), addons))
+    visites_mois = visites_semaine * SEMAINES_PAR_MOIS
+    heures_semaine = visites_semaine * heures_visite
+    heures_mois = heures_semaine * SEMAINES_PAR_MOIS
+
+    # Suppléments facturés à chaque visite pour les formules mensuelles / hebdomadaires
+    addons_total = sum(prix for field, _, prix, _ in tables.addons if addon_flags[field])
+    supplement_visite = tables.taxes(addons_total)[2] if addons_total else 0.0
+
+    def par_visite(type_service, libelle, data_extra=None, blocs=1):
+        data = {'type_service': type_service, 'nombre_heures': heures_visite,
+                'nombre_personnes': personnes, **addon_flags, **(data_extra or {})}
+        totals = calculate_totals(data, tables)
+        return _option(type_service, libelle, totals['total'] * blocs * visites_mois,
+                       personnes, visites_mois * blocs, totals)
+
+    options = [
+        par_visite(TYPE_REGULIER, 'Régulier'),
+        par_visite(TYPE_CARTE, 'À la carte'),
+    ]
+
+    if tables.partage_min <= personnes <= tables.partage_max:
+        blocs = math.ceil(heures_visite / tables.partage_heures)
+        options.append(par_visite(TYPE_PARTAGE, f'Partagé {personnes} voisins', blocs=blocs))
+
+    if personnes >= tables.groupe_min:
+        for type_service in TYPES_GROUPE:
+            options.append(par_visite(type_service, type_service))
+
+    for nom, periode, minimum in contrats:
+        heures = max(heures_semaine if periode == 'semaine' else heures_mois, minimum)
+        factures = SEMAINES_PAR_MOIS if periode == 'semaine' else 1
+        totals = calculate_totals({'type_service': TYPE_CONTRAT, 'nombre_heures': heures,
+                                   'type_contrat': nom}, tables)
+        cout = totals['total'] * factures + supplement_visite * visites_mois
+        options.append(_option(TYPE_CONTRAT, f'Contrat {nom}', cout, personnes, factures, totals))
+
+    for heures_forfait, nom in forfaits:
+        if heures_forfait < heures_mois:
+            continue
+        totals = calculate_totals({'type_service': TYPE_FORFAIT, 'forfait_recurrent': nom}, tables)
+        cout = totals['total'] + supplement_visite * visites_mois
+        options.append(_option(TYPE_FORFAIT, f'Forfait {nom}', cout, personnes, 1, totals))
+
+    options.sort(key=lambda o: o['cout_mensuel'])
+    return options
+
+
+@lru_cache(maxsize=1024)
+def _cached_options(tables, visites_semaine, heures_visite, personnes, addons):
+    return tuple(_cheapest_options(tables, visites_semaine, heures_visite, personnes, addons))
+
+
+def cheapest_options(besoin, tables=None):
+    """
+    Classe les options de service par coût mensuel.
+
+    Args:
+        besoin: {'visites_semaine': int, 'heures_visite': float
+                 (ou 'heures_semaine'), 'nombre_personnes': int, 'addon_*': bool}
+        tables: Grille compilée (par défaut la grille active)
+
+    Returns:
+        dict: {'success': bool, 'besoin': dict, 'options': list, 'pricing_version': str}
+    """
+    tables = tables or current_tables()
+    if not isinstance(besoin, dict):
+        return {'success': False, 'error': 'Besoin invalide (objet JSON attendu)'}
+    try:
+        visites = int(besoin.get('visites_semaine') or 1)
+        if besoin.get('heures_visite'):
+            heures_visite = float(besoin['heures_visite'])
+        elif besoin.get('heures_semaine'):
+            heures_visite = float(besoin['heures_semaine']) / visites
+        else:
+            heures_visite = 2.0
+        personnes = int(besoin.get('nombre_personnes') or 1)
+        if not math.isfinite(heures_visite):
+            raise ValueError(heures_visite)
+    except (TypeError, ValueError, OverflowError):
+        return {'success': False, 'error': 'Besoin invalide (visites, heures ou personnes non numériques)'}
+
+    if visites < 1 or heures_visite <= 0 or personnes < 1:
+        return {'success': False, 'error': 'Visites, heures et personnes doivent être positives'}
+    if visites > VISITES_MAX or heures_visite > HEURES_VISITE_MAX or personnes > PERSONNES_MAX:
+        return {'success': False, 'error': f'Au plus {VISITES_MAX} visites par semaine, '
+                                           f'{HEURES_VISITE_MAX}h par visite et {PERSONNES_MAX} personnes'}
+
+    # Valeurs entières en int: mêmes libellés que les soumissions ("2h", pas "2.0h")
+    if heures_visite.is_integer():
+        heures_visite = int(heures_visite)
+    addons = tuple(bool(besoin.get(field)) for field, _, _, _ in tables.addons)
+
+    options = _cached_options(tables, visites, heures_visite, personnes, addons)
+    return {
+        'success': True,
+        'besoin': {
+            'visites_semaine': visites,
+            'heures_visite': heures_visite,
+            'heures_mois': visites * heures_visite * SEMAINES_PAR_MOIS,
+            'nombre_personnes': personnes,
+        },
+        'options': [dict(option) for option in options],
+        'pricing_version': tables.version,
+    }
+
+
+if __name__ == '__main__':
+    besoins = [
+        {'visites_semaine': v, 'heures_visite': h, 'nombre_personnes': p, 'addon_fin_semaine': w}
+        for v in (1, 2, 3, 5) for h in (1, 2, 3, 4) for p in (1, 3, 8) for w in (False, True)
+    ]
+    for besoin in besoins:
+        cheapest_options(besoin)  # précalcul
+
+    n = 20000
+    started = time.perf_counter()
+    for i in range(n):
+        cheapest_options(besoins[i % len(besoins)])
+    elapsed = (time.perf_counter() - started) / n
+
+    exemple = cheapest_options({'visites_semaine': 2, 'heures_visite': 2, 'nombre_personnes': 1})
+    for option in exemple['options']:
+        print(f"  {option['option']:<32} {option['cout_mensuel']:>9.2f} $/mois")
+    print(f"Temps moyen par requête: {elapsed * 1e6:.1f} µs")
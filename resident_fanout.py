@@ -0,0 +1,101 @@
+"""
+BIEN CHEZ SOI - Soumissions individuelles d'un service partagé ou de groupe
+Pour un service Partagé voisins RPA (ou Groupe RPA), chaque résident de la
+liste reçoit sa propre soumission: sa part du prix, son PDF et son courriel.
+La session est analysée et tarifée une seule fois (service commun, puis
+pricing_engine.share_totals); seuls les documents de chaque résident sont
+rendus et envoyés, en parallèle (FANOUT_WORKERS à la fois).
+
+La soumission commune reste la seule enregistrée dans Notion (les parts ne
+s'additionnent pas une deuxième fois dans l'historique). Les soumissions
+individuelles ne sont pas signées: chaque résident signe la sienne.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_parser import validate_fields
+from config import Config
+from email_service import send_soumission_email
+from pdf_cache import discard, get_pdf
+from pdf_pool import wait_for_slot
+from pricing_engine import current_tables, share_range, share_totals
+
+CHAMPS_RESIDENT = ('client_nom', 'client_email', 'client_telephone', 'langue_client')
+
+
+def prepare_residents(residents, type_service, tables=None):
+    """
+    Vérifie la liste des résidents avant tout envoi.
+
+    Args:
+        residents: Liste de dicts {'client_nom', 'client_email', 'client_telephone', 'langue_client'}
+        type_service: Type de service de la session
+
+    Returns:
+        dict: {'success': True, 'residents': list (champs retenus seulement)}
+              ou {'success': False, 'error': str}
+    """
+    bornes = share_range(type_service, tables)
+    if bornes is None:
+        return {'success': False, 'error': f"Service non partageable: {type_service}"}
+    if not isinstance(residents, list) or not all(isinstance(r, dict) for r in residents):
+        return {'success': False, 'error': 'Liste de résidents invalide'}
+
+    retenus = []
+    for resident in residents:
+        # Mêmes règles que les coordonnées de la soumission (courriel, téléphone: texte; langue: fr/en)
+        valides, errors = validate_fields(resident, CHAMPS_RESIDENT)
+        if errors:
+            return {'success': False, 'error': f"Résident invalide: {'; '.join(errors)}"}
+        resident = {champ: valeur.strip() for champ, valeur in valides.items() if valeur and valeur.strip()}
+        if not resident.get('client_nom'):
+            return {'success': False, 'error': 'Nom manquant pour un résident'}
+        retenus.append(resident)
+
+    if not bornes[0] <= len(retenus) <= bornes[1]:
+        return {'success': False, 'error': f"{type_service}: de {bornes[0]} à {bornes[1]} résidents"}
+    return {'success': True, 'residents': retenus}
+
+
+def _envoyer(data, totals, resident, numero):
+    """PDF et courriel d'un résident"""
+    # Coordonnées du groupe jamais reprises: seules celles du résident (langue du groupe par défaut)
+    resident_data = {**data, **dict.fromkeys(CHAMPS_RESIDENT), **resident, 'numero': numero}
+    resident_data['langue_client'] = resident.get('langue_client') or data.get('langue_client') or 'fr'
+    result = {'client_nom': resident['client_nom'], 'numero': numero, 'total': totals['total'],
+              'pdf': None, 'email': None}
+
+    pdf = wait_for_slot(get_pdf, resident_data, totals)
+    if not pdf['success']:
+        # Courriel envoyé quand même, sans pièce jointe (comme /api/submit)
+        result['pdf'] = pdf['error']
+    if resident.get('client_email'):
+        result['email'] = send_soumission_email(
+            resident['client_email'], resident_data, totals,
+            pdf['path'] if pdf['success'] else None, resident_data['langue_client']
+        )
+    if pdf['success']:
+        discard(pdf['key'])
+    return result
+
+
+def fan_out(data, totals, residents, tables=None):
+    """
+    Soumission individuelle (PDF + courriel) pour chaque résident d'un service partagé.
+
+    Args:
+        data: Données de la session ('numero' et 'date' fixés par l'appelant,
+              'nombre_personnes' = nombre de résidents)
+        totals: Totaux du service commun (calculate_totals sur data)
+        residents: Liste vérifiée par prepare_residents
+        tables: Grille de la session (par défaut la grille active)
+
+    Returns:
+        dict: {'success': True, 'residents': [{'client_nom', 'numero', 'total', 'pdf', 'email'}, ...]}
+    """
+    parts = share_totals(totals, len(residents), tables or current_tables())
+    numeros = [f"{data['numero']}-{i + 1:02d}" for i in range(len(residents))]
+
+    with ThreadPoolExecutor(min(Config.FANOUT_WORKERS, len(residents)), thread_name_prefix='fanout') as executor:
+        results = list(executor.map(_envoyer, [data] * len(residents), parts, residents, numeros))
+    return {'success': True, 'residents': results}
@@ -0,0 +1,299 @@
+"""
+BIEN CHEZ SOI - Préparation de la signature du client
+L'interface envoie les traits de la signature en vecteur (quelques centaines
+d'octets): points quantifiés, codés en différences. Ils sont cadrés dans la zone
+de signature du PDF et dessinés en chemins vectoriels, nets à tout zoom.
+
+Les signatures en PNG base64 (anciens clients) sont décodées en mémoire,
+recadrées sur le tracé, réduites à la résolution d'impression et ramenées à
+quelques teintes d'encre (PNG à palette) avant d'être intégrées au PDF.
+Les charges trop lourdes sont refusées avant décodage.
+
+Usage (banc d'essai: signature brute vs préparée, taille et temps de rendu):
+    python signature.py
+"""
+
+import base64
+import binascii
+import io
+
+from PIL import Image, ImageStat
+
+from config import Config
+
+# Cadre de la signature dans le PDF (3 po x 1 po, voir pdf_generator), en points
+LARGEUR_CADRE, HAUTEUR_CADRE = 216.0, 72.0
+RATIO_CADRE = LARGEUR_CADRE / HAUTEUR_CADRE
+NIVEAUX = 8         # teintes de la palette, du blanc à l'encre
+MARGE_PX = 4        # marge autour du tracé, en pixels de la toile
+
+# Traits vectoriels (index.html): coordonnées en demi-pixels CSS de la toile; chaque
+# trait est une suite d'entiers (x, y, puis différences dx, dy) en zigzag, écrits en
+# caractères base64url de 5 bits (+ 32 si un autre caractère suit); traits séparés par '.'
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_'
+_VALEURS = {c: i for i, c in enumerate(ALPHABET)}
+UNITE_PX = 0.5          # pixels CSS par unité de coordonnée
+EPAISSEUR_PX = 2        # lineWidth de la toile, en pixels CSS
+ECHELLE_MAX = 1.5       # points PDF par pixel CSS au plus (une petite signature n'est pas démesurée)
+MAX_POINTS = 20000
+CHIFFRES_MAX = 4        # caractères par nombre au plus (20 bits, bien au-delà d'une toile réelle)
+TOILE_MAX = 20000       # coordonnée maximale en valeur absolue, en unités (10 000 pixels CSS)
+
+
+class SignatureInvalide(ValueError):
+    """Traits vectoriels hors de la toile (nombre trop long ou coordonnée démesurée)"""
+
+
+def _trop_lourde():
+    return {
+        'success': False,
+        'too_large': True,
+        'error': f"Signature trop volumineuse (max {Config.SIGNATURE_MAX_KB} Ko)",
+    }
+
+
+def _couverture(img):
+    """Couverture d'encre (L, 0 = fond): alpha de la toile, sinon luminance inversée"""
+    if img.mode in ('RGBA', 'LA') or 'transparency' in img.info:
+        return img.convert('RGBA').getchannel('A')
+    return img.convert('L').point(lambda v: 255 - v)
+
+
+def _couleur(img, couverture):
+    """Couleur de l'encre: moyenne des pixels pleins (le bord anticrénelé est mêlé au fond)"""
+    plein = couverture.point(lambda v: 255 if v >= 192 else 0)
+    if not plein.getbbox():
+        plein = couverture.point(lambda v: 255 if v else 0)
+    return tuple(round(v) for v in ImageStat.Stat(img.convert('RGB'), mask=plein).mean)
+
+
+def compact_signature(img):
+    """
+    Signature recadrée, réduite et en palette.
+
+    Args:
+        img: Image PIL de la signature (toile du navigateur)
+
+    Returns:
+        bytes: PNG à palette au ratio du cadre du PDF, ou None si la toile est vide
+    """
+    couverture = _couverture(img)
+    bbox = couverture.getbbox()
+    if not bbox:
+        return None
+
+    # Recadrage sur le tracé, puis élargi au ratio du cadre (tracé centré)
+    x0, y0, x1, y1 = bbox
+    cadre = (max(x0 - MARGE_PX, 0), max(y0 - MARGE_PX, 0),
+             min(x1 + MARGE_PX, img.width), min(y1 + MARGE_PX, img.height))
+    trace = couverture.crop(cadre)
+    couleur = _couleur(img.crop(cadre), trace)
+
+    largeur, hauteur = trace.size
+    largeur, hauteur = max(largeur, round(hauteur * RATIO_CADRE)), max(hauteur, round(largeur / RATIO_CADRE))
+    fond = Image.new('L', (largeur, hauteur), 0)
+    fond.paste(trace, ((largeur - trace.width) // 2, (hauteur - trace.height) // 2))
+
+    # Résolution d'impression: le cadre fait 1 po de haut
+    cible = (round(Config.SIGNATURE_DPI * RATIO_CADRE), Config.SIGNATURE_DPI)
+    if largeur > cible[0]:
+        fond = fond.resize(cible, Image.LANCZOS)
+
+    # Palette: blanc -> couleur de l'encre en NIVEAUX teintes
+    indices = fond.point(lambda v: (v * (NIVEAUX - 1) + 127) // 255)
+    palette = []
+    for i in range(NIVEAUX):
+        palette += [round(255 + (c - 255) * i / (NIVEAUX - 1)) for c in couleur]
+    out = Image.frombytes('P', indices.size, indices.tobytes())
+    out.putpalette(palette)
+
+    buffer = io.BytesIO()
+    out.save(buffer, 'PNG', bits=3)
+    return buffer.getvalue()
+
+
+def _decoder_traits(texte):
+    """
+    Traits codés par l'interface -> listes de points (x, y) en unités de la toile.
+    Un trait d'un seul point (tapotement) est gardé: il est dessiné en point.
+
+    Raises:
+        KeyError, ValueError: caractère inconnu ou trait tronqué
+        SignatureInvalide: nombre de plus de CHIFFRES_MAX caractères ou point hors de ±TOILE_MAX
+                           (vérifié pendant le décodage: aucun entier démesuré n'est construit)
+    """
+    traits = []
+    for code in texte.split('.'):
+        nombres, valeur, decalage = [], 0, 0
+        for car in code:
+            v = _VALEURS[car]
+            valeur |= (v & 31) << decalage
+            decalage += 5
+            if v < 32:
+                nombres.append(valeur >> 1 if not valeur & 1 else -(valeur + 1) // 2)
+                valeur, decalage = 0, 0
+            elif decalage >= 5 * CHIFFRES_MAX:
+                raise SignatureInvalide(f'nombre de plus de {CHIFFRES_MAX} caractères')
+        if decalage or len(nombres) % 2:
+            raise ValueError('trait tronqué')
+        points, x, y = [], 0, 0
+        for i in range(0, len(nombres), 2):
+            x, y = x + nombres[i], y + nombres[i + 1]
+            if abs(x) > TOILE_MAX or abs(y) > TOILE_MAX:
+                raise SignatureInvalide('point hors de la toile')
+            points.append((x, y))
+        if points:
+            traits.append(points)
+    return traits
+
+
+def _encoder_traits(traits):
+    """Inverse de _decoder_traits (même codage que index.html, sans simplification)"""
+    codes = []
+    for trait in traits:
+        code, x, y = [], 0, 0
+        for px, py in trait:
+            for n in (px - x, py - y):
+                z = n * 2 if n >= 0 else -n * 2 - 1
+                while z >= 32:
+                    code.append(ALPHABET[32 + (z & 31)])
+                    z >>= 5
+                code.append(ALPHABET[z])
+            x, y = px, py
+        codes.append(''.join(code))
+    return '.'.join(codes)
+
+
+def vector_signature(traits):
+    """
+    Traits de la signature cadrés dans la zone de signature du PDF.
+
+    Args:
+        traits: Listes de points (x, y) en unités de la toile (y vers le bas)
+
+    Returns:
+        dict: {'traits': [[x0, y0, x1, y1, ...], ...] en points depuis le coin
+              inférieur gauche du cadre, 'epaisseur': float} ou None si aucun trait
+    """
+    points = [p for trait in traits for p in trait]
+    if not points:
+        return None
+    x0, x1 = min(x for x, _ in points), max(x for x, _ in points)
+    y0, y1 = min(y for _, y in points), max(y for _, y in points)
+
+    # Tracé centré dans le cadre, épaisseur du trait comprise
+    marge = EPAISSEUR_PX / UNITE_PX
+    largeur, hauteur = x1 - x0 + marge, y1 - y0 + marge
+    echelle = min(LARGEUR_CADRE / largeur, HAUTEUR_CADRE / hauteur, ECHELLE_MAX * UNITE_PX)
+    dx = (LARGEUR_CADRE - (x1 - x0) * echelle) / 2
+    dy = (HAUTEUR_CADRE - (y1 - y0) * echelle) / 2
+
+    cadres = []
+    for trait in traits:
+        coords = []
+        for x, y in trait:
+            coords += [round(dx + (x - x0) * echelle, 2), round(HAUTEUR_CADRE - dy - (y - y0) * echelle, 2)]
+        if len(trait) == 1:
+            coords *= 2  # tapotement: segment de longueur nulle, rendu en point par le bout rond
+        cadres.append(coords)
+    return {'traits': cadres, 'epaisseur': round(EPAISSEUR_PX / UNITE_PX * echelle, 2)}
+
+
+def prepare_signature(signature_data):
+    """
+    Décode et compacte la signature envoyée par l'interface.
+
+    Args:
+        signature_data: {'traits': str} (traits vectoriels codés par index.html)
+                        ou PNG en base64, avec ou sans préfixe data:image/png;base64,
+
+    Returns:
+        dict: {'success': True, 'signature': dict (vectorielle, voir vector_signature),
+               bytes (PNG compacté) ou None (absente, vide ou illisible)}
+              ou {'success': False, 'too_large': True, 'error': str}
+              ou {'success': False, 'invalid': True, 'error': str} (traits hors de la toile)
+    """
+    if not signature_data:
+        return {'success': True, 'signature': None}
+    if isinstance(signature_data, dict):
+        texte = signature_data.get('traits')
+        if not isinstance(texte, str):
+            return {'success': True, 'signature': None}
+        if len(texte) > Config.SIGNATURE_MAX_KB * 1024:
+            return _trop_lourde()
+        try:
+            traits = _decoder_traits(texte)
+        except SignatureInvalide as e:
+            return {'success': False, 'invalid': True, 'error': f'Signature invalide: {e}'}
+        except (KeyError, ValueError):
+            return {'success': True, 'signature': None}
+        if sum(len(trait) for trait in traits) > MAX_POINTS:
+            return _trop_lourde()
+        return {'success': True, 'signature': vector_signature(traits)}
+    if not isinstance(signature_data, str):
+        return {'success': True, 'signature': None}
+
+    # Retirer le préfixe data:image/png;base64,
+    if ',' in signature_data:
+        signature_data = signature_data.split(',', 1)[1]
+    # Refus avant décodage: 4 caractères base64 pour 3 octets
+    if len(signature_data) * 3 // 4 > Config.SIGNATURE_MAX_KB * 1024:
+        return _trop_lourde()
+
+    try:
+        raw = base64.b64decode(signature_data, validate=True)
+    except (binascii.Error, ValueError):
+        return {'success': True, 'signature': None}
+
+    try:
+        # Dimensions lues dans l'en-tête, avant de décompresser les pixels
+        img = Image.open(io.BytesIO(raw))
+        if img.width * img.height > Config.SIGNATURE_MAX_PIXELS:
+            return _trop_lourde()
+        return {'success': True, 'signature': compact_signature(img)}
+    except Image.DecompressionBombError:
+        return _trop_lourde()
+    except Exception:
+        return {'success': True, 'signature': None}
+
+
+if __name__ == '__main__':
+    import time
+    from PIL import ImageDraw
+    from pdf_generator import generate_soumission_pdf
+
+    # Toile du navigateur (iPad: 600 x 150 px CSS, à 2x), quelques traits
+    traits = [[(360, 440), (600, 180), (840, 420), (1120, 140), (1440, 400), (1720, 260)]]
+    img = Image.new('RGBA', (1200, 300), (0, 0, 0, 0))
+    ImageDraw.Draw(img).line([(x // 2, y // 2) for x, y in traits[0]], fill=(27, 42, 74, 255), width=4)
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    brute = buffer.getvalue()
+    payload_png = 'data:image/png;base64,' + base64.b64encode(brute).decode()
+    payload_traits = {'traits': _encoder_traits(traits)}
+
+    started = time.perf_counter()
+    compacte = prepare_signature(payload_png)['signature']
+    preparation_png = (time.perf_counter() - started) * 1e3
+    started = time.perf_counter()
+    vecteur = prepare_signature(payload_traits)['signature']
+    preparation_traits = (time.perf_counter() - started) * 1e3
+
+    data = {'numero': 'BCS-BANC', 'date': '2026-01-15', 'langue_client': 'fr', 'client_nom': 'Marie Tremblay',
+            'type_service': 'Régulier (sans contrat)', 'nombre_heures': 3}
+
+    def rendu(sig):
+        best, taille = float('inf'), 0
+        for _ in range(10):
+            out = io.BytesIO()
+            started = time.perf_counter()
+            generate_soumission_pdf(data, out, io.BytesIO(sig) if isinstance(sig, bytes) else sig)
+            best = min(best, time.perf_counter() - started)
+            taille = len(out.getvalue())
+        return best * 1e3, taille
+
+    print(f"Envoi PNG:        {len(payload_png):>6} car.  (préparation {preparation_png:.1f} ms)")
+    print(f"Envoi vectoriel:  {len(str(payload_traits)):>6} car.  (préparation {preparation_traits:.2f} ms)")
+    for nom, sig in (('PNG brute', brute), ('PNG préparée', compacte), ('vectorielle', vecteur)):
+        ms, taille = rendu(sig)
+        print(f"PDF, signature {nom:<13} {ms:>6.1f} ms  {taille:>6} octets")
@@ -5,10 +5,14 @@ Supporte français et anglais
 
 from openai import OpenAI
 from config import Config
+from http_pool import make_client
 import tempfile
 import os
 
-client = OpenAI(api_key=Config.OPENAI_API_KEY) if Config.OPENAI_API_KEY else None
+client = OpenAI(
+    api_key=Config.OPENAI_API_KEY,
+    http_client=make_client(timeout=120.0)
+) if Config.OPENAI_API_KEY else None
 
 
 def transcribe_audio(audio_file, language="fr"):
@@ -0,0 +1,211 @@
+"""
+BIEN CHEZ SOI - Simulation de changement de tarifs sur l'historique
+Reprix en lot toutes les soumissions (Notion ou copie locale) avec une grille
+candidate, puis rapporte les écarts par type de service et par mois.
+Peut ensuite reporter les nouveaux montants dans Notion pour les soumissions
+encore ouvertes (Brouillon / Envoyée), à débit limité.
+
+Usage:
+    python what_if_repricing.py --card nouvelle_grille.json
+    python what_if_repricing.py --card nouvelle_grille.json --mirror soumissions.jsonl
+    python what_if_repricing.py --card nouvelle_grille.json --write-back
+
+Contrat corporatif et Forfait récurrent: le type de contrat et le forfait ne sont
+pas enregistrés dans Notion, ces soumissions sont donc non recalculables: elles
+sont comptées à part dans le rapport et jamais reportées.
+
+Copie locale (--mirror / --save-mirror): une ligne JSON par soumission, mêmes
+clés que notion_service.iter_soumissions (id, type_service, nombre_heures,
+nombre_personnes, addon_*, total, statut, created, ...). Le report vers Notion
+utilise les id de pages: il fonctionne aussi depuis une copie --save-mirror.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import notion_service
+from config import Config
+from pricing_batch import columns_from_records, price_batch
+from pricing_engine import load_rate_card
+
+STATUTS_OUVERTS = ('Brouillon', 'Envoyée')
+NOTION_REQUESTS_PER_SECOND = 3  # limite moyenne de l'API Notion
+MAX_RETRIES = 3
+AMOUNT_FIELDS = ('prix_base', 'sous_total', 'tps', 'tvq', 'total')
+# Champ de tarification requis par type, absent des soumissions lues dans Notion
+CHAMPS_REQUIS = {'Contrat corporatif': 'type_contrat', 'Forfait récurrent': 'forfait_recurrent'}
+
+
+def load_mirror(path):
+    """Lit une copie locale des soumissions (JSONL)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_mirror(rows, path):
+    """Écrit les soumissions en JSONL (copie locale réutilisable)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+
+def recalculable(row):
+    """Faux si le prix dépend d'un champ que la soumission n'a pas (contrat, forfait)"""
+    champ = CHAMPS_REQUIS.get(row.get('type_service'))
+    return champ is None or row.get(champ) is not None
+
+
+def reprice(rows, tables):
+    """
+    Reprix les soumissions avec la grille donnée (calcul vectorisé).
+
+    Returns:
+        list: [{'row': dict, 'totals': {prix_base, sous_total, tps, tvq, total}}]
+    """
+    if not rows:
+        return []
+    result = price_batch(**columns_from_records(rows), tables=tables)
+    return [
+        {'row': row, 'totals': {key: float(result[key][i]) for key in AMOUNT_FIELDS}}
+        for i, row in enumerate(rows)
+    ]
+
+
+def _add(bucket, ancien, nouveau):
+    bucket['count'] += 1
+    bucket['ancien_total'] += ancien
+    bucket['nouveau_total'] += nouveau
+
+
+def _finish(bucket):
+    bucket['ancien_total'] = round(bucket['ancien_total'], 2)
+    bucket['nouveau_total'] = round(bucket['nouveau_total'], 2)
+    bucket['delta'] = round(bucket['nouveau_total'] - bucket['ancien_total'], 2)
+    bucket['delta_pct'] = (
+        round(bucket['delta'] / bucket['ancien_total'] * 100, 2) if bucket['ancien_total'] else None
+    )
+    return bucket
+
+
+def build_report(repriced, version, non_recalculables=()):
+    """
+    Écarts entre les totaux enregistrés et les totaux reprix.
+
+    Returns:
+        dict: {'version', 'global', 'par_type': {type: bucket}, 'par_mois': {AAAA-MM: bucket},
+               'non_recalculables': {'count', 'par_type': {type: count}}}
+              bucket = {count, ancien_total, nouveau_total, delta, delta_pct}
+    """
+    def new_bucket():
+        return {'count': 0, 'ancien_total': 0.0, 'nouveau_total': 0.0}
+
+    total, par_type, par_mois = new_bucket(), {}, {}
+    ignores = {}
+    for row in non_recalculables:
+        ignores[row.get('type_service')] = ignores.get(row.get('type_service'), 0) + 1
+    for entry in repriced:
+        row = entry['row']
+        ancien = row.get('total') or 0.0
+        nouveau = entry['totals']['total']
+        _add(total, ancien, nouveau)
+        _add(par_type.setdefault(row.get('type_service') or 'Inconnu', new_bucket()), ancien, nouveau)
+        _add(par_mois.setdefault((row.get('created') or '')[:7] or 'Inconnu', new_bucket()), ancien, nouveau)
+
+    return {
+        'version': version,
+        'global': _finish(total),
+        'par_type': {key: _finish(b) for key, b in sorted(par_type.items())},
+        'par_mois': {key: _finish(b) for key, b in sorted(par_mois.items())},
+        'non_recalculables': {'count': len(non_recalculables), 'par_type': dict(sorted(ignores.items()))},
+    }
+
+
+def write_back(repriced, statuts=STATUTS_OUVERTS, rate=NOTION_REQUESTS_PER_SECOND):
+    """
+    Reporte les nouveaux montants dans Notion pour les soumissions ouvertes
+    dont les montants changent. Les requêtes sont espacées (rate par seconde)
+    et réessayées avec attente croissante si Notion limite le débit.
+    Les soumissions non recalculables ne sont jamais reportées.
+
+    Returns:
+        dict: {'updated': int, 'unchanged': int, 'skipped': int, 'non_recalculables': int,
+               'errors': [{'id', 'error'}]}
+    """
+    summary = {'updated': 0, 'unchanged': 0, 'skipped': 0, 'non_recalculables': 0, 'errors': []}
+    interval = 1.0 / rate
+    next_slot = time.monotonic()
+
+    for entry in repriced:
+        row, totals = entry['row'], entry['totals']
+        if not recalculable(row):
+            summary['non_recalculables'] += 1
+            continue
+        if row.get('statut') not in statuts or not row.get('id'):
+            summary['skipped'] += 1
+            continue
+        if all(row.get(key) == totals[key] for key in AMOUNT_FIELDS):
+            summary['unchanged'] += 1
+            continue
+
+        for attempt in range(MAX_RETRIES + 1):
+            wait = next_slot - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            next_slot = time.monotonic() + interval
+            result = notion_service.update_soumission_prix(row['id'], totals)
+            if result['success'] or result.get('code') != 'rate_limited':
+                break
+            next_slot += interval * 2 ** (attempt + 1)
+
+        if result['success']:
+            summary['updated'] += 1
+        else:
+            summary['errors'].append({'id': row['id'], 'error': result['error']})
+
+    return summary
+
+
+def run(card_path, mirror=None, save_mirror_path=None, write=False):
+    """
+    Simulation complète: chargement, reprix, rapport et report optionnel.
+
+    Returns:
+        dict: {'success': bool, 'report': dict, 'write_back': dict ou None}
+    """
+    tables = load_rate_card(card_path)
+
+    if mirror:
+        rows = load_mirror(mirror)
+    else:
+        if not notion_service.notion or not Config.NOTION_SOUMISSIONS_DB:
+            return {'success': False, 'error': 'Notion non configuré. Utilisez --mirror ou configurez .env.'}
+        rows = list(notion_service.iter_soumissions())
+        if save_mirror_path:
+            save_mirror(rows, save_mirror_path)
+
+    non_recalculables = [row for row in rows if not recalculable(row)]
+    repriced = reprice([row for row in rows if recalculable(row)], tables)
+    summary = {
+        'success': True,
+        'report': build_report(repriced, tables.version, non_recalculables),
+        'write_back': None,
+    }
+    if write:
+        summary['write_back'] = write_back(repriced)
+    return summary
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Simulation de nouveaux tarifs sur les soumissions BCS')
+    arg_parser.add_argument('--card', required=True, help='Grille candidate (JSON, format rate_card.json)')
+    arg_parser.add_argument('--mirror', help='Copie locale JSONL au lieu de Notion')
+    arg_parser.add_argument('--save-mirror', help='Enregistrer les soumissions lues dans Notion (JSONL)')
+    arg_parser.add_argument('--write-back', action='store_true',
+                            help='Reporter les nouveaux montants dans Notion (Brouillon / Envoyée)')
+    args = arg_parser.parse_args()
+
+    summary = run(args.card, args.mirror, args.save_mirror, args.write_back)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    sys.exit(0 if summary['success'] else 1)